@@ -0,0 +1,317 @@
+"""Latency of the public API hot paths.
+
+Every benchmark times each call on its own and reports p50, p99 and max in
+microseconds, from the best of --rounds rounds, and with --processes from the
+best of that many fresh processes. By default the calls go to the in-process
+emulator, so only the cost of pyjrk itself is measured; --hardware uses the
+first connected Jrk instead, or the one given with --serial, and is skipped
+when there is none.
+
+    python benchmarks/bench_api.py --output results.json
+    python benchmarks/bench_api.py --processes 5 \
+        --baseline benchmarks/baseline_emulator.json
+
+With --baseline the run fails when the p50 of a benchmark is more than
+--tolerance (a fraction, 25% by default) and --min-delta-us above its
+baseline, and above --floor-us if given. Every run also times a fixed
+calibration workload, and the baseline is scaled by the ratio of the two
+calibrations, so a baseline recorded on another machine still applies.
+--save-baseline writes the results as the new baseline; record it with
+--processes 5. The comparison against benchmarks/baseline_emulator.json runs
+in tests/test_bench_api.py.
+
+Run it with pyjrk installed, or with PYTHONPATH=src from a checkout.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from ctypes import byref, memmove, sizeof
+
+# Compiled profiles of this run go to a scratch cache, not the user cache
+os.environ.setdefault("PYJRK_PROFILE_CACHE", tempfile.mkdtemp(prefix="pyjrk-bench-"))
+
+from pyjrk.pyjrk import PyJrk  # noqa: E402
+from pyjrk.pyjrk_profile import clear_profile_cache  # noqa: E402
+from pyjrk.pyjrk_structures import jrk_variables  # noqa: E402
+
+CONFIG_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "config", "config.yml"
+)
+EMULATED_SERIAL_NUMBER = "00000001"
+
+
+def measure(func, iterations, warmup=100):
+    for _ in range(warmup):
+        func()
+    perf_counter_ns = time.perf_counter_ns
+    samples = [0] * iterations
+    for i in range(iterations):
+        start = perf_counter_ns()
+        func()
+        samples[i] = perf_counter_ns() - start
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "p50_us": samples[iterations // 2] / 1e3,
+        "p99_us": samples[min(iterations - 1, iterations * 99 // 100)] / 1e3,
+        "max_us": samples[-1] / 1e3,
+    }
+
+
+def calibration_workload():
+    """Return a fixed mix of interpreter work and a ctypes structure copy, the
+    two costs that dominate the emulated hot paths."""
+    source = jrk_variables()
+    destination = jrk_variables()
+    size = sizeof(jrk_variables)
+
+    def workload():
+        memmove(byref(destination), byref(source), size)
+        return [i for i in range(50)]
+
+    return workload
+
+
+def open_backend(args, logger):
+    """Return (backend, serial number) or None when no device is available."""
+    if not args.hardware:
+        from pyjrk.pyjrk_emulator import JrkEmulator
+
+        emulator = JrkEmulator()
+        emulator.add_device(EMULATED_SERIAL_NUMBER)
+        return emulator.drivers, EMULATED_SERIAL_NUMBER
+
+    try:
+        serial_numbers = PyJrk(logger).list_connected_device_serial_numbers()
+    except OSError as e:
+        print(f"Hardware run skipped, drivers not available: {e}")
+        return None
+    if args.serial:
+        serial_numbers = [s for s in serial_numbers if s == args.serial]
+    if not serial_numbers:
+        print("Hardware run skipped, no Jrk connected.")
+        return None
+    return None, serial_numbers[0]
+
+
+def run_benchmarks(backend, serial_number, logger, iterations, rounds):
+    """Return the results of every benchmark and the best p50 of the
+    calibration workload, in microseconds."""
+    jrk = PyJrk(logger, backend)
+    if jrk.connect_to_serial_number(serial_number):
+        raise RuntimeError(f"Could not connect to {serial_number}")
+    variables = jrk.variables
+    ram_settings = jrk.ram_settings
+    pid_period = ram_settings.pid_period
+
+    def settings_round_trip():
+        ram_settings.pid_period = pid_period
+        ram_settings.invalidate()
+        return ram_settings.pid_period
+
+    def load_config_disk_cache():
+        clear_profile_cache()
+        ram_settings._applied_profile = None
+        ram_settings.load_config(CONFIG_FILE)
+
+    connect_jrk = PyJrk(logger, backend)
+    benchmarks = {
+        "set_target": lambda: jrk.set_target(2048),
+        "variable_read": lambda: variables.feedback,
+        "snapshot": variables.snapshot,
+        "read_partial": lambda: variables.read_partial(("feedback", "duty_cycle")),
+        "settings_get_cached": lambda: ram_settings.pid_period,
+        "settings_round_trip": settings_round_trip,
+        "load_config": lambda: ram_settings.load_config(CONFIG_FILE),
+        "load_config_disk_cache": load_config_disk_cache,
+        "connect_to_serial_number": lambda: connect_jrk.connect_to_serial_number(
+            serial_number
+        ),
+        "construction": lambda: PyJrk(logger, backend),
+    }
+    # Slow paths get fewer iterations so the suite stays quick
+    slow = {"load_config_disk_cache": 10, "connect_to_serial_number": 10}
+    results = {}
+    # Calibration rounds are spread over the run, so their best is taken
+    # from the same machine states as the benchmarks
+    calibration = calibration_workload()
+    calibration_us = []
+    try:
+        for name, func in benchmarks.items():
+            calibration_us.append(measure(calibration, iterations)["p50_us"])
+            count = max(iterations // slow.get(name, 1), 10)
+            results[name] = min(
+                (measure(func, count, warmup=min(100, count)) for _ in range(rounds)),
+                key=lambda result: result["p50_us"],
+            )
+    finally:
+        jrk.stop_motor()
+        jrk.close()
+        connect_jrk.close()
+    return results, min(calibration_us)
+
+
+def run_report(args, logger):
+    """Run the benchmarks in this process and return the report, or None when
+    no device is available."""
+    opened = open_backend(args, logger)
+    if opened is None:
+        return None
+    backend, serial_number = opened
+    results, calibration_us = run_benchmarks(
+        backend, serial_number, logger, args.iterations, args.rounds
+    )
+    return {
+        "backend": "hardware" if args.hardware else "emulator",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "calibration_us": calibration_us,
+        "benchmarks": results,
+    }
+
+
+def run_processes(args):
+    """Run the benchmarks in args.processes fresh processes, one after the
+    other, and return the best result of every benchmark.
+
+    A process can settle in a slow mode for a benchmark, e.g. from where its
+    objects landed in memory, which no number of rounds inside it undoes.
+    """
+    child_args = [
+        "--iterations",
+        str(args.iterations),
+        "--rounds",
+        str(args.rounds),
+    ]
+    if args.hardware:
+        child_args.append("--hardware")
+    if args.serial:
+        child_args += ["--serial", args.serial]
+
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="pyjrk-bench-") as directory:
+        for index in range(args.processes):
+            output = os.path.join(directory, f"{index}.json")
+            subprocess.run(
+                [sys.executable, __file__, "--output", output, *child_args],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            if not os.path.exists(output):
+                return None
+            with open(output) as f:
+                reports.append(json.load(f))
+
+    report = dict(reports[0])
+    report["calibration_us"] = min(r["calibration_us"] for r in reports)
+    report["benchmarks"] = {
+        name: min((r["benchmarks"][name] for r in reports), key=lambda x: x["p50_us"])
+        for name in reports[0]["benchmarks"]
+    }
+    return report
+
+
+def print_report(report):
+    for name, result in report["benchmarks"].items():
+        print(
+            f"{name:<26}p50 {result['p50_us']:9.2f} us"
+            f"   p99 {result['p99_us']:9.2f} us"
+            f"   max {result['max_us']:9.2f} us"
+        )
+    print(f"{'calibration':<26}p50 {report['calibration_us']:9.2f} us")
+
+
+def compare(results, baseline, tolerance, min_delta_us, floor_us=0.0, scale=1.0):
+    """Return the benchmarks whose p50 regressed beyond tolerance and by more
+    than min_delta_us, which keeps sub-microsecond noise from failing runs.
+    The baseline p50 is multiplied by scale first, and a p50 under floor_us
+    is never a regression."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if reference is None:
+            continue
+        reference_us = reference["p50_us"] * scale
+        limit = max(
+            reference_us * (1 + tolerance), reference_us + min_delta_us, floor_us
+        )
+        if result["p50_us"] > limit:
+            regressions.append(
+                f"{name}: p50 {result['p50_us']:.2f} us > "
+                f"{limit:.2f} us (baseline {reference_us:.2f} us)"
+            )
+    return regressions
+
+
+def calibration_scale(report, baseline):
+    """Return how much slower this run's machine is than the baseline's, from
+    their calibration times, or 1.0 when either has none."""
+    if not baseline.get("calibration_us") or not report.get("calibration_us"):
+        return 1.0
+    return report["calibration_us"] / baseline["calibration_us"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hardware", action="store_true", help="use a real Jrk")
+    parser.add_argument("--serial", help="serial number of the Jrk to use")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-us", type=float, default=1.0)
+    parser.add_argument("--floor-us", type=float, default=0.0)
+    parser.add_argument("--save-baseline", help="write the results as a baseline")
+    args = parser.parse_args()
+
+    logger = logging.getLogger("PyJrk.bench")
+    logger.setLevel(logging.CRITICAL)
+
+    if args.processes > 1:
+        report = run_processes(args)
+    else:
+        report = run_report(args, logger)
+    if report is None:
+        return 0
+    print_report(report)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("backend") != report["backend"]:
+            print(f"Baseline is for the {baseline.get('backend')} backend, skipped.")
+            return 0
+        scale = calibration_scale(report, baseline)
+        print(f"Baseline scaled by {scale:.2f} for this machine.")
+        regressions = compare(
+            report["benchmarks"],
+            baseline,
+            args.tolerance,
+            args.min_delta_us,
+            args.floor_us,
+            scale,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regression beyond {args.tolerance:.0%} of the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Per-call overhead of the ctypes dispatch used for Jrk commands.
+
+The jrk2 library is not needed: the C library's labs() stands in for a command
+such as jrk_set_target, so only the Python side of each call is measured.
+
+    python benchmarks/bench_dispatch.py
+
+Run it with pyjrk installed, or with PYTHONPATH=src from a checkout.
+"""
+
+import timeit
+from ctypes import CDLL, c_long
+from functools import partial
+
+from pyjrk.pyjrk_native import resolve_constant
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+
+CALLS = 200_000
+
+
+class Before:
+    """String lookup, string test and explicit conversion on every call."""
+
+    def __init__(self):
+        self.jrklib = CDLL(None)
+        self.set_target = partial(self._command_with_value, "abs", c_long)
+
+    def _command_with_value(self, cmd_name, value_c_type, value):
+        if "JRK" in str(value):
+            value = jc[value]
+        return getattr(self.jrklib, "l" + cmd_name)(value_c_type(value))
+
+
+class After:
+    """Function resolved once with declared prototype, constant via IntEnum."""
+
+    def __init__(self):
+        func = CDLL(None).labs
+        func.restype = c_long
+        func.argtypes = [c_long]
+        self.set_target = partial(self._command_with_value, func)
+
+    def _command_with_value(self, func, value):
+        return func(resolve_constant(value))
+
+
+def measure(label, set_target, value):
+    seconds = min(timeit.repeat(lambda: set_target(value), number=CALLS, repeat=5))
+    per_call_ns = seconds / CALLS * 1e9
+    print(f"{label:<28}{per_call_ns:8.0f} ns/call")
+    return per_call_ns
+
+
+if __name__ == "__main__":
+    before, after = Before(), After()
+    for value in (2048, "JRK_MAX_ALLOWED_DUTY_CYCLE"):
+        print(f"value={value!r}")
+        b = measure("  before", before.set_target, value)
+        a = measure("  after", after.set_target, value)
+        print(f"  speedup {b / a:.2f}x")
@@ -0,0 +1,85 @@
+"""Aggregate variables sample rate of many devices, threads vs processes.
+
+Polls --devices emulated controllers as fast as possible for --duration
+seconds, once with one thread per device in this process and once with a
+JrkProcessPool worker per device, and prints the total samples per second
+of each mode. The process pool should scale with the number of cores while
+the threads share one GIL.
+
+    python benchmarks/bench_process_pool.py --devices 8 --latency 0.0001
+
+Run it with pyjrk installed, or with PYTHONPATH=src from a checkout.
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from functools import partial
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_emulator import emulated_backend
+from pyjrk.pyjrk_process import JrkProcessPool
+
+
+def run_threads(serial_numbers, latency, duration, logger):
+    backend = emulated_backend(*serial_numbers, latency=latency)
+    counts = [0] * len(serial_numbers)
+    stop_event = threading.Event()
+
+    def poll(index, serial_number):
+        jrk = PyJrk(logger, backend)
+        jrk.connect_to_serial_number(serial_number)
+        update = jrk.variables._update_jrk_variables
+        while not stop_event.is_set():
+            update()
+            counts[index] += 1
+        jrk.close()
+
+    threads = [
+        threading.Thread(target=poll, args=(index, serial_number))
+        for index, serial_number in enumerate(serial_numbers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration
+
+
+def run_processes(serial_numbers, latency, duration, logger):
+    backend_factory = partial(emulated_backend, *serial_numbers, latency=latency)
+    with JrkProcessPool(
+        serial_numbers, rate_hz=0, logger=logger, backend_factory=backend_factory
+    ) as pool:
+        start = {s: pool[s].variables.sample_count for s in pool}
+        time.sleep(duration)
+        return (
+            sum(pool[s].variables.sample_count - start[s] for s in pool) / duration
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="emulated seconds per call"
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger("PyJrk.bench")
+    logger.setLevel(logging.CRITICAL)
+    serial_numbers = [f"{index:08d}" for index in range(args.devices)]
+
+    print(f"{args.devices} devices, {os.cpu_count()} cores")
+    for name, run in (("threads", run_threads), ("processes", run_processes)):
+        rate = run(serial_numbers, args.latency, args.duration, logger)
+        print(f"{name:<12}{rate:12.0f} samples/s")
+
+
+if __name__ == "__main__":
+    main()
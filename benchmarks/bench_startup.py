@@ -0,0 +1,66 @@
+"""Import and construction cost of pyjrk.
+
+Import time is measured in fresh interpreters and reported on top of the bare
+interpreter startup. Construction time needs the jrk2 drivers and is skipped
+when they can not be loaded.
+
+    python benchmarks/bench_startup.py
+
+Run it with pyjrk installed, or with PYTHONPATH=src from a checkout.
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+RUNS = 20
+CONSTRUCTIONS = 1000
+
+
+def interpreter_time(code):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_import():
+    baseline = interpreter_time("pass")
+    for module in ("pyjrk", "pyjrk.pyjrk"):
+        elapsed = interpreter_time(f"import {module}") - baseline
+        print(f"import {module:<24}{elapsed * 1e3:8.2f} ms")
+    lazy = subprocess.run(
+        [sys.executable, "-c", "import sys, pyjrk; sys.exit('yaml' in sys.modules)"]
+    )
+    print(f"{'yaml imported lazily':<31}{'no' if lazy.returncode else 'yes'}")
+
+
+def bench_construction():
+    import logging
+
+    from pyjrk.pyjrk import PyJrk
+    from pyjrk.pyjrk_native import load_drivers
+
+    try:
+        start = time.perf_counter()
+        load_drivers()
+        first_load = time.perf_counter() - start
+    except OSError as e:
+        print(f"PyJrk() skipped, drivers not available: {e}")
+        return
+    print(f"{'first driver load':<31}{first_load * 1e3:8.2f} ms")
+    logger = logging.getLogger("PyJrk.bench")
+    logger.setLevel(logging.WARNING)
+    seconds = min(
+        timeit.repeat(lambda: PyJrk(logger), number=CONSTRUCTIONS, repeat=5)
+    )
+    print(f"{'PyJrk()':<31}{seconds / CONSTRUCTIONS * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    bench_import()
+    bench_construction()
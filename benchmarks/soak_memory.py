@@ -0,0 +1,90 @@
+"""Soak test: resident memory must stay flat over millions of native reads.
+
+Reads the variables and the RAM/EEPROM settings of a connected Jrk in a loop
+and fails if the resident set size grows by more than --max-growth-kib after
+the warm-up reads. With --emulated the reads go to an emulated device, so
+leaks of the Python side of the allocations are caught without hardware;
+tests/test_soak_memory.py runs it that way.
+
+    python benchmarks/soak_memory.py --reads 2000000 [--serial-number SN]
+    python benchmarks/soak_memory.py --emulated --reads 200000
+"""
+
+import argparse
+import logging
+import os
+import resource
+import sys
+
+from pyjrk import PyJrk
+from pyjrk.pyjrk_emulator import JrkEmulator
+
+
+def rss_kib():
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        # Peak RSS only, still enough to detect unbounded growth
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def soak(jrk: PyJrk, reads, warmup, report_every):
+    operations = [
+        jrk.variables._update_jrk_variables,
+        jrk.ram_settings.refresh,
+        jrk.eeprom_settings.refresh,
+    ]
+    for i in range(warmup):
+        operations[i % len(operations)]()
+    baseline = rss_kib()
+    print(f"baseline rss {baseline} KiB after {warmup} warm-up reads")
+
+    peak = baseline
+    for i in range(1, reads + 1):
+        operations[i % len(operations)]()
+        if i % report_every == 0:
+            rss = rss_kib()
+            peak = max(peak, rss)
+            print(f"{i:>10} reads  rss {rss} KiB  (+{rss - baseline} KiB)")
+    return peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serial-number")
+    parser.add_argument(
+        "--emulated", action="store_true", help="soak an emulated device"
+    )
+    parser.add_argument("--reads", type=int, default=2_000_000)
+    parser.add_argument("--warmup", type=int, default=10_000)
+    parser.add_argument("--report-every", type=int, default=100_000)
+    parser.add_argument("--max-growth-kib", type=int, default=1024)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("PyJrk.soak")
+    logger.setLevel(logging.WARNING)
+    backend = None
+    if args.emulated:
+        emulator = JrkEmulator()
+        emulator.add_device(args.serial_number or "00000001")
+        backend = emulator.drivers
+    jrk = PyJrk(logger, backend)
+    serial_numbers = jrk.list_connected_device_serial_numbers()
+    serial_number = args.serial_number or next(iter(serial_numbers), None)
+    if serial_number is None or jrk.connect_to_serial_number(serial_number):
+        print("No Jrk device available, soak test skipped")
+        return 0
+
+    with jrk:
+        growth = soak(jrk, args.reads, args.warmup, args.report_every)
+    if growth > args.max_growth_kib:
+        print(f"FAIL: rss grew by {growth} KiB (limit {args.max_growth_kib} KiB)")
+        return 1
+    print(f"OK: rss grew by {growth} KiB (limit {args.max_growth_kib} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,48 @@
 import logging
-import os
-import platform
+import struct
+import threading
+import time
+from contextlib import nullcontext
 from ctypes import *
 from functools import partial
 from typing import Callable
 
-from pyjrk.pyjrk_base import JED, LoggerProtocol, PyJrkSettingsBase
+from pyjrk.pyjrk_base import (
+    JED,
+    LoggerProtocol,
+    PyJrkSettingsBase,
+    SettingsVersion,
+    _claim,
+    _dispatch_to_instance,
+)
+from pyjrk.pyjrk_errors import ErrorFlagsPublisher, decode_error_flags
+from pyjrk.pyjrk_native import load_drivers, resolve_constant
 from pyjrk.pyjrk_properties import PyJrkVariablesProperties
 from pyjrk.pyjrk_protocol import jrk_constant as jc
+from pyjrk.pyjrk_stats import InstrumentedLibrary, NativeCallStats
 from pyjrk.pyjrk_structures import *
 
 
+# USB vendor ID of the Jrk G2 controllers, as reported by udev
+POLOLU_VENDOR_ID = "1ffb"
+
+
+class _JrkDeviceList:
+    """Owner of a list returned by jrk_list_connected_devices. Every jrk_device
+    handed out from it keeps a reference to its owner, so the list is only
+    freed once none of them is in use."""
+
+    def __init__(self, jrklib, list_p):
+        self._jrklib = jrklib
+        self._list_p = list_p
+
+    def __del__(self):
+        try:
+            self._jrklib.jrk_list_free(self._list_p)
+        except Exception:
+            pass
+
+
 class PyJrk:
     # Type annotations for dynamically created methods
     set_target: Callable[[int], int]
@@ -19,20 +51,48 @@ class PyJrk:
     force_duty_cycle: Callable[[], int]
     reinitialize: Callable[[int], int]
 
-    def __init__(self, logger: LoggerProtocol = None):
+    def __init__(self, logger: LoggerProtocol = None, backend=None, stats=False):
         self._logger = logger if logger else self._initialize_default_logger()
+        # (usblib, jrklib) driver handles to use instead of the native drivers,
+        # e.g. JrkEmulator.drivers
+        self._backend = backend
+        # Native call statistics, only collected when stats is enabled
+        self._stats = NativeCallStats() if stats else None
         self._load_drivers()
 
         self.device = None
         self.handle = None
+        self._handle_ref = None
+        # Held while the handle is used, closed or replaced, so that hotplug
+        # events can reconnect from another thread
+        self._lock = threading.RLock()
+        # Library allocations owned by this object, freed by close()
+        self._device_p = POINTER(jrk_device)()
+        self._handle_p = POINTER(jrk_handle)()
+        # Serial number -> jrk_device entries of the latest device list, None
+        # until the bus is enumerated or after a hotplug event
+        self._device_index = None
+        self._listed_devices = None
+        self._serial_number = None
+        # Reconnection: time the connected device was seen going away, and
+        # how long it was unavailable before the last reconnect()
+        self.auto_reconnect = False
+        # Time an add event keeps retrying, while udev finishes the device node
+        self.hotplug_reconnect_timeout = 2.0
+        self.down_since = None
+        self.last_downtime = None
+        # Shared by the settings views to invalidate their caches together
+        self._settings_version = SettingsVersion()
+        # Duration of the last exchange(), in seconds
+        self.last_exchange_rtt = None
         self.eeprom_settings: PyJrkEEPROMSettings = None
         self.ram_settings: PyJrkRAMSettings = None
         self.variables: PyJrkVariables = None
         self._commands = [
             ("set_target", c_uint16),
             ("stop_motor", None),
-            ("force_duty_cycle_target", c_uint16),
-            ("force_duty_cycle", c_uint16),
+            ("force_duty_cycle_target", c_int16),
+            ("force_duty_cycle", c_int16),
             ("reinitialize", c_uint8),
         ]
         self._create_jrk_command_attributes()
@@ -42,6 +102,9 @@ class PyJrk:
         self._log_level = logging.DEBUG
         _logger = logging.getLogger("PyJrk")
         _logger.setLevel(self._log_level)
+        if _logger.handlers:
+            # Already configured by a previous PyJrk
+            return _logger
         _formatter = logging.Formatter(
             "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
         )
@@ -62,103 +125,359 @@ class PyJrk:
         self._logger.setLevel(level)
 
     def _load_drivers(self):
-        # Driver Locations (x64)
-        file_path = os.path.dirname(os.path.abspath(__file__))
-        if platform.system() == "Windows":
-            # Windows DLL paths
-            self.usblib = windll.LoadLibrary(
-                file_path + "\\drivers\\x64\\libusbp-1.dll"
-            )  # type: ignore
-            self.jrklib = windll.LoadLibrary(
-                file_path + "\\drivers\\x64\\libpololu-jrk2-1.dll"
-            )  # type: ignore
-        elif platform.system() == "Linux":
-            # Linux shared library paths
-            self.usblib = CDLL(file_path + "/drivers/linux/libusbp-1.so")
-            self.jrklib = CDLL(file_path + "/drivers/linux/libpololu-jrk2-1.so")
+        if self._backend is not None:
+            self.usblib, self.jrklib = self._backend
+        else:
+            self.usblib, self.jrklib = load_drivers()
+        if self._stats is not None:
+            self.usblib = InstrumentedLibrary(self.usblib, self._stats)
+            self.jrklib = InstrumentedLibrary(self.jrklib, self._stats)
         self._logger.debug("JRK Drivers loaded")
 
+    def stats(self):
+        """Return the call count, error count and latency histogram of every
+        C function called by this object, keyed by function name. Empty
+        unless the object was created with stats=True."""
+        if self._stats is None:
+            return {}
+        return self._stats.snapshot()
+
+    def reset_stats(self):
+        if self._stats is not None:
+            self._stats.reset()
+
+    def exchange(self, target) -> JrkVariablesSnapshot:
+        """Set the target and read all the variables, returning them as a
+        snapshot, or None if a transfer failed. The time the two took is
+        stored in last_exchange_rtt, in seconds.
+
+        The library only offers blocking control transfers, so over USB this
+        is one transfer for the target and one for the whole variables block
+        instead of one per variable read. PyJrkSerial.exchange pipelines both.
+        """
+        start = time.perf_counter()
+        if self.set_target(target):
+            return None
+        variables = self.variables
+        variables.invalidate()
+        if variables._refresh_jrk_variables():
+            return None
+        self.last_exchange_rtt = time.perf_counter() - start
+        return jrk_variables_to_snapshot(variables._jrk_variables)
+
+    def publish_state(self, name=None, rate_hz=0, replace=False):
+        """Publish every variables read of this device in a named shared
+        memory segment, state_segment_name(serial number) by default, and
+        return the JrkStatePublisher. Local processes read it with
+        JrkStateReader; close the publisher to stop. Raises FileExistsError
+        if the segment exists, unless replace is set (see JrkStatePublisher)."""
+        from pyjrk.pyjrk_shm import JrkStatePublisher, state_segment_name
+
+        return JrkStatePublisher(
+            self.variables,
+            name if name else state_segment_name(self._serial_number),
+            rate_hz,
+            replace,
+        )
+
+    def play_trajectory(self, targets, times, **kwargs):
+        """Send targets[i] at times[i] seconds from now on absolute deadlines
+        and return a TrajectoryResult. Requires the numpy extra; keyword
+        arguments are passed to pyjrk_trajectory.TrajectoryPlayer."""
+        from pyjrk.pyjrk_trajectory import play_trajectory
+
+        return play_trajectory(self, targets, times, **kwargs)
+
     def _create_jrk_command_attributes(self):
+        # Bound per instance so that every PyJrk keeps commanding its own device.
+        # The C functions are resolved once; their prototypes convert the values.
         for cmd_name, value_c_type in self._commands:
-            if bool(value_c_type):
+            jrk_func = getattr(self.jrklib, "jrk_" + cmd_name)
+            if cmd_name == "reinitialize":
+                # Reloads the RAM settings, so the cached settings are stale
+                setattr(self, cmd_name, partial(self._jrk_reinitialize, jrk_func))
+            elif bool(value_c_type):
                 setattr(
-                    self.__class__,
-                    cmd_name,
-                    partial(self._jrk_command_with_value, cmd_name, value_c_type),
+                    self, cmd_name, partial(self._jrk_command_with_value, jrk_func)
                 )
             else:
-                setattr(self.__class__, cmd_name, partial(self._jrk_command, cmd_name))
+                setattr(self, cmd_name, partial(self._jrk_command, jrk_func))
+
+    def _jrk_command(self, jrk_func, *args):
+        with self._lock:
+            if self._handle_ref is None:
+                self._logger.error("Device is not connected.")
+                return 1
+            return self._jrk_call(jrk_func, self._handle_ref, *args)
+
+    def _jrk_command_with_value(self, jrk_func, value):
+        return self._jrk_command(jrk_func, resolve_constant(value))
 
     @JED
-    def _jrk_command(self, cmd_name):
-        e_p = getattr(self.jrklib, "jrk_" + cmd_name)(byref(self.handle))
+    def _jrk_call(self, jrk_func, *args):
+        e_p = jrk_func(*args)
         return e_p
 
+    def _jrk_reinitialize(self, jrk_func, value):
+        e = self._jrk_command_with_value(jrk_func, value)
+        self._settings_version.bump()
+        return e
+
     @JED
-    def _jrk_command_with_value(self, cmd_name, value_c_type, value):
-        if "JRK" in str(value):
-            value = jc[value]
-        e_p = getattr(self.jrklib, "jrk_" + cmd_name)(
-            byref(self.handle), value_c_type(value)
-        )
+    def _list_connected_devices(self):
+        dev_pp = POINTER(POINTER(jrk_device))()
+        devcnt = c_size_t(0)
+        e_p = self.jrklib.jrk_list_connected_devices(byref(dev_pp), byref(devcnt))
+        if not e_p:
+            device_list = _JrkDeviceList(self.jrklib, dev_pp)
+            index = {}
+            for i in range(0, devcnt.value):
+                device = dev_pp[i][0]
+                # Keeps the list alive as long as the entry is referenced
+                device._device_list = device_list
+                index[device.serial_number.decode("utf-8")] = device
+            self._listed_devices = index
         return e_p
 
     @JED
-    def _list_connected_devices(self):
-        self._devcnt = c_size_t(0)
-        self._dev_pp = POINTER(POINTER(jrk_device))()
-        e_p = self.jrklib.jrk_list_connected_devices(
-            byref(self._dev_pp), byref(self._devcnt)
-        )
+    def _jrk_device_copy(self, device):
+        device_p = POINTER(jrk_device)()
+        e_p = self.jrklib.jrk_device_copy(byref(device), byref(device_p))
+        if not e_p:
+            self._device_p = device_p
+            self.device = device_p[0]
         return e_p
 
     @JED
     def _jrk_handle_open(self):
         handle_p = POINTER(jrk_handle)()
         e_p = self.jrklib.jrk_handle_open(byref(self.device), byref(handle_p))
-        self.handle = handle_p[0]
+        if not e_p:
+            self._handle_p = handle_p
+            self.handle = handle_p[0]
+            self._handle_ref = byref(self.handle)
         return e_p
 
-    def list_connected_device_serial_numbers(self):
-        self._list_connected_devices()
-        jrk_list = []
-        if not self._devcnt.value:
+    def close(self):
+        """Close the device handle and free every library allocation it owns."""
+        with self._lock:
+            self._bind_views(None)
+            if self._handle_p:
+                self.jrklib.jrk_handle_close(self._handle_p)
+            if self._device_p:
+                self.jrklib.jrk_device_free(self._device_p)
+            self._device_index = None
+            self._listed_devices = None
+            self._handle_p = POINTER(jrk_handle)()
+            self._device_p = POINTER(jrk_device)()
+            self.handle = None
+            self._handle_ref = None
+            self.device = None
+            self._serial_number = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def device_index(self, refresh=False):
+        """Return the jrk_device entries of the connected devices keyed by
+        serial number. The bus is only enumerated on the first call, when
+        refresh is set, or after a hotplug event marked the index stale.
+
+        The entries stay valid after the index is refreshed; the list they
+        come from is freed once none of them is referenced any more."""
+        with self._lock:
+            if refresh or self._device_index is None:
+                if self._list_connected_devices():
+                    return {}
+                self._device_index = self._listed_devices
+            return self._device_index
+
+    def list_connected_device_serial_numbers(self, refresh=False):
+        jrk_list = list(self.device_index(refresh))
+        if not jrk_list:
             self._logger.warning("No Jrk devices connected.")
-        for i in range(0, self._devcnt.value):
-            jrkdev = self._dev_pp[0][i]
-            jrk_list.append(jrkdev.serial_number.decode("utf-8"))
         return jrk_list
 
+    def connected_devices(self, refresh=False):
+        """Return the jrk_device entries keyed by serial number, see
+        device_index()."""
+        return dict(self.device_index(refresh))
+
+    def _bind_views(self, handle):
+        # Views bound to None fail their calls instead of using a closed handle
+        for view in (self.variables, self.eeprom_settings, self.ram_settings):
+            if view is not None:
+                view._device_handle = handle
+
+    def _open_device(self, device):
+        # Called with the handle lock held
+        self._bind_views(None)
+        if self._handle_p:
+            self.jrklib.jrk_handle_close(self._handle_p)
+            self._handle_p = POINTER(jrk_handle)()
+            self.handle = None
+            self._handle_ref = None
+        if device is not self.device:
+            if self._device_p:
+                self.jrklib.jrk_device_free(self._device_p)
+                self._device_p = POINTER(jrk_device)()
+                self.device = None
+            if self._jrk_device_copy(device):
+                return 1
+        return self._jrk_handle_open()
+
+    def connect_to_device(self, device):
+        """Open a handle to a jrk_device that was already enumerated. The device
+        is copied, so the entry may be dropped afterwards."""
+        with self._lock:
+            if self._open_device(device):
+                return 1
+            self._serial_number = self.device.serial_number.decode("utf-8")
+            self.down_since = None
+            self.variables = PyJrkVariables(
+                self.handle, (self.usblib, self.jrklib), self._logger
+            )
+            self.eeprom_settings = PyJrkEEPROMSettings(
+                self.handle,
+                (self.usblib, self.jrklib),
+                self._logger,
+                self._settings_version,
+            )
+            self.ram_settings = PyJrkRAMSettings(
+                self.handle,
+                (self.usblib, self.jrklib),
+                self._logger,
+                self._settings_version,
+            )
+            for view in (self.variables, self.eeprom_settings, self.ram_settings):
+                view._handle_lock = self._lock
+            return 0
+
     def connect_to_serial_number(self, serial_number):
-        self._list_connected_devices()
-        for i in range(0, self._devcnt.value):
-            if serial_number == self._dev_pp[0][i].serial_number.decode("utf-8"):
-                self.device = self._dev_pp[0][i]
-                self._jrk_handle_open()
-                self.variables = PyJrkVariables(
-                    self.handle, (self.usblib, self.jrklib), self._logger
-                )
-                self.eeprom_settings = PyJrkEEPROMSettings(
-                    self.handle, (self.usblib, self.jrklib), self._logger
-                )
-                self.ram_settings = PyJrkRAMSettings(
-                    self.handle, (self.usblib, self.jrklib), self._logger
-                )
-                return 0
-        if not self.device:
+        device = self.device_index().get(serial_number)
+        if device is None:
+            # The index may predate the device, so look at the bus once more
+            device = self.device_index(refresh=True).get(serial_number)
+        if device is None:
             self._logger.error("Serial number device not found.")
             return 1
+        return self.connect_to_device(device)
+
+    def reconnect(self, timeout=0.0, interval=0.1):
+        """Reopen the handle of the connected device and rebind variables,
+        eeprom_settings and ram_settings to it, retrying every interval
+        seconds until timeout. The device copy kept by this object is tried
+        first; the bus is only enumerated again if that fails.
+
+        On success the time since the device was seen going away, or since
+        the call if that is unknown, is stored in last_downtime and the
+        settings caches are invalidated, since a replugged device reloads its
+        RAM settings from EEPROM. Returns 0 on success and 1 otherwise; until
+        then the calls of the views fail with "Device is not connected."
+        """
+        if self._serial_number is None:
+            self._logger.error("No device to reconnect to.")
+            return 1
+        start = time.monotonic()
+        if self.down_since is None:
+            self.down_since = start
+        while True:
+            # Released between attempts so the views fail fast meanwhile
+            with self._lock:
+                if self._try_reopen():
+                    self._bind_views(self.handle)
+                    self.variables.invalidate()
+                    self._settings_version.bump()
+                    break
+            if time.monotonic() - start >= timeout:
+                self._logger.error(f"Could not reconnect to {self._serial_number}.")
+                return 1
+            time.sleep(interval)
+
+        self.last_downtime = time.monotonic() - self.down_since
+        self.down_since = None
+        self._logger.info(
+            f"Reconnected to {self._serial_number} after {self.last_downtime:.3f} s"
+        )
+        return 0
+
+    def _try_reopen(self):
+        if self.device is not None and not self._open_device(self.device):
+            return True
+        device = self.device_index(refresh=True).get(self._serial_number)
+        return device is not None and not self._open_device(device)
+
+    def notify_hotplug(self, serial_number=None, added=True):
+        """Report a USB hotplug event; serial_number is the device that was
+        added or removed, if known. Marks the device index stale, notes when
+        the connected device goes away and, with auto_reconnect set,
+        reconnects to it when it comes back, retrying for up to
+        hotplug_reconnect_timeout seconds."""
+        with self._lock:
+            self._device_index = None
+            if serial_number is None or serial_number != self._serial_number:
+                return
+            if not added:
+                if self.down_since is None:
+                    self.down_since = time.monotonic()
+                return
+        if self.auto_reconnect:
+            self.reconnect(self.hotplug_reconnect_timeout, interval=0.05)
+
+    def watch_hotplug(self):
+        """Call notify_hotplug on the USB events of Pololu devices, using
+        udev. Requires the hotplug extra; returns the pyudev observer, call
+        stop() on it to stop watching."""
+        import pyudev
+
+        context = pyudev.Context()
+        monitor = pyudev.Monitor.from_netlink(context)
+        monitor.filter_by("usb", "usb_device")
+
+        def handle_event(action, device):
+            if device.get("ID_VENDOR_ID") != POLOLU_VENDOR_ID:
+                return
+            if action in ("add", "remove"):
+                self.notify_hotplug(device.get("ID_SERIAL_SHORT"), action == "add")
+
+        observer = pyudev.MonitorObserver(monitor, handle_event, name="PyJrkHotplug")
+        observer.start()
+        return observer
 
 
 class PyJrkVariables(PyJrkVariablesProperties):
-    def __init__(self, device_handle, driver_handles, logger: LoggerProtocol):
+    # Full reads clear error_flags_halting like the original library calls do.
+    # Set to False so that reads leave the latched errors alone.
+    clear_error_flags_halting = True
+    # Lock guarding the device handle, set by the PyJrk owning it
+    _handle_lock = None
+
+    def __init__(
+        self, device_handle, driver_handles, logger: LoggerProtocol, ttl_ms=0
+    ):
         self._device_handle = device_handle
         self.usblib, self.jrklib = driver_handles
         self._logger = logger
 
-        self._jrk_variables_p = POINTER(jrk_variables)()
         self._jrk_variables = jrk_variables()
 
+        # Freshness window: reads within ttl_ms of the last transfer reuse it.
+        # 0 disables caching, so every read performs its own transfer.
+        self.ttl_ms = ttl_ms
+        self._last_update_time = None
+
+        # Raw variables block used by partial reads, indexed by JRK_VAR_* offsets
+        self._jrk_variables_buffer = (c_uint8 * jc["JRK_VARIABLES_SIZE"])()
+        self._partial_read_plans = {}
+
+        # Subscribers notified when the error flags of a read change
+        self._error_flags_publisher = ErrorFlagsPublisher()
+        # JrkStatePublisher sharing every read with other processes, if any
+        self._state_publisher = None
+
         self.pin_info = []
         for i in range(0, jc["JRK_CONTROL_PIN_COUNT"]):
             self.pin_info.append(type("pinfo_" + str(i), (object,), {})())
@@ -169,7 +488,7 @@ class PyJrkVariables(PyJrkVariablesProperties):
         for field_name, field_type in jrk_variables._fields_:
             if not field_name == "pin_info":
                 prop = property(
-                    fget=partial(self._get_jrk_readonly_property, field_name)
+                    fget=_dispatch_to_instance("_get_jrk_readonly_property", field_name)
                 )
                 setattr(self.__class__, field_name, prop)
 
@@ -182,106 +501,315 @@ class PyJrkVariables(PyJrkVariablesProperties):
 
     @JED
     def _update_jrk_variables(self):
+        jrk_variables_p = POINTER(jrk_variables)()
         e_p = self.jrklib.jrk_get_variables(
-            byref(self._device_handle), byref(self._jrk_variables_p), c_bool(True)
+            byref(self._device_handle),
+            byref(jrk_variables_p),
+            self.clear_error_flags_halting
+            << jc["JRK_GET_VARIABLES_FLAG_CLEAR_ERROR_FLAGS_HALTING"],
         )
-        self._jrk_variables = self._jrk_variables_p[0]
+        # _jrk_variables is owned by Python and keeps its address between reads
+        _claim(self.jrklib, jrk_variables_p, self._jrk_variables, "jrk_variables_free")
         return e_p
 
-    def _get_jrk_readonly_property(self, field_name, _):
-        self._update_jrk_variables()
-        value = getattr(self._jrk_variables, field_name)
-        if field_name == "error_flags_halting" or field_name == "error_flags_occurred":
-            error_list = self._convert_error_bitmask(value)
-            self._logger.debug(error_list)
-        return value
+    def _refresh_jrk_variables(self):
+        """Update the variables unless the last transfer is within ttl_ms."""
+        now = time.monotonic()
+        if (
+            self.ttl_ms
+            and self._last_update_time is not None
+            and (now - self._last_update_time) * 1000 < self.ttl_ms
+        ):
+            return 0
+        return self._read_jrk_variables(now)
+
+    def _read_jrk_variables(self, now=None):
+        """Update the variables with one transfer, ignoring ttl_ms, and share
+        the read with the state publisher and the error flag subscribers."""
+        if now is None:
+            now = time.monotonic()
+        e = self._update_jrk_variables()
+        self._last_update_time = None if e else now
+        if self._state_publisher is not None:
+            if e:
+                self._state_publisher.publish_error()
+            else:
+                self._state_publisher.publish(self._jrk_variables, now)
+        if not e and self._error_flags_publisher:
+            self._error_flags_publisher.publish(
+                self._jrk_variables.error_flags_halting,
+                self._jrk_variables.error_flags_occurred,
+                now,
+            )
+        return e
+
+    def invalidate(self):
+        """Force the next read to perform a new transfer."""
+        self._last_update_time = None
+
+    def snapshot(self) -> JrkVariablesSnapshot:
+        """Read all the variables with a single transfer (subject to ttl_ms) and
+        return them as an immutable record, including all pin_info entries.
+        Returns None if the transfer failed, rather than stale values."""
+        if self._refresh_jrk_variables():
+            return None
+        return jrk_variables_to_snapshot(self._jrk_variables)
+
+    @JED
+    def _get_variable_segment(self, offset, length):
+        e_p = self.jrklib.jrk_get_variable_segment(
+            byref(self._device_handle),
+            c_size_t(offset),
+            c_size_t(length),
+            byref(self._jrk_variables_buffer, offset),
+            c_uint16(0),
+        )
+        return e_p
+
+    def _get_variable_segments(self, segments):
+        for offset, length in segments:
+            if self._get_variable_segment(offset, length):
+                return 1
+        return 0
+
+    def _get_partial_read_plan(self, field_names, max_gap):
+        key = (field_names, max_gap)
+        plan = self._partial_read_plans.get(key)
+        if plan is not None:
+            return plan
+
+        decoders = []
+        ranges = []
+        for field_name in field_names:
+            if field_name not in jrk_variables_layout:
+                raise ValueError(f"{field_name} can not be read as a partial range")
+            offset, c_type, mask = jrk_variables_layout[field_name]
+            fmt = struct.Struct("<" + c_type._type_)
+            decoders.append((field_name, fmt, offset, mask))
+            ranges.append((offset, offset + fmt.size))
+
+        # Coalesce the byte ranges into the fewest contiguous segments
+        segments = []
+        for start, end in sorted(ranges):
+            if segments and start <= segments[-1][1] + max_gap:
+                segments[-1][1] = max(segments[-1][1], end)
+            else:
+                segments.append([start, end])
+        plan = ([(start, end - start) for start, end in segments], decoders)
+        self._partial_read_plans[key] = plan
+        return plan
+
+    def read_partial(self, field_names, max_gap=0):
+        """Read only the requested variables and return them as a dict keyed by
+        the jrk_variables field names.
+
+        The requested fields are coalesced into the smallest contiguous offset
+        ranges of the variables block and each range is fetched with its own
+        transfer. Ranges separated by max_gap bytes or less are merged into one.
+        Reads performed this way never clear the error flags.
+        """
+        segments, decoders = self._get_partial_read_plan(tuple(field_names), max_gap)
+        if self._get_variable_segments(segments):
+            return None
+        values = {}
+        for field_name, fmt, offset, mask in decoders:
+            value = fmt.unpack_from(self._jrk_variables_buffer, offset)[0]
+            values[field_name] = value & mask if mask is not None else value
+        return values
+
+    def read_error_flags(self):
+        """Read error_flags_halting and error_flags_occurred with one transfer
+        that clears neither, and return them as a (halting, occurred) tuple
+        of JrkErrorFlags. Returns None if the read failed."""
+        values = self.read_partial(("error_flags_halting", "error_flags_occurred"))
+        if values is None:
+            return None
+        halting = values["error_flags_halting"]
+        occurred = values["error_flags_occurred"]
+        if self._error_flags_publisher:
+            self._error_flags_publisher.publish(halting, occurred)
+        return decode_error_flags(halting), decode_error_flags(occurred)
+
+    def subscribe_error_flags(self, callback):
+        """Call callback(JrkErrorEvent) whenever a read of this object sees
+        error_flags_halting or error_flags_occurred change. Returns a function
+        that removes the subscription."""
+        return self._error_flags_publisher.subscribe(callback)
+
+    def field_reader(self, field_name):
+        """Return a function reading one variable with a single segment
+        transfer, or returning None if the transfer failed. The value is read
+        through a fixed view of the variables block, so repeated reads build
+        no containers; used by high-rate loops."""
+        segments, _ = self._get_partial_read_plan((field_name,), 0)
+        offset, c_type, mask = jrk_variables_layout[field_name]
+        view = c_type.from_buffer(self._jrk_variables_buffer, offset)
+        get_variable_segments = self._get_variable_segments
+
+        if mask is None:
+
+            def read():
+                if get_variable_segments(segments):
+                    return None
+                return view.value
+
+        else:
+
+            def read():
+                if get_variable_segments(segments):
+                    return None
+                return view.value & mask
+
+        return read
+
+    def _get_jrk_readonly_property(self, field_name):
+        self._refresh_jrk_variables()
+        return getattr(self._jrk_variables, field_name)
 
     def _get_pin_readonly_property(self, field_name, pin_num, _):
-        self._update_jrk_variables()
+        self._refresh_jrk_variables()
         return getattr(self._jrk_variables.pin_info[pin_num], field_name)
 
-    def _convert_error_bitmask(self, e_bit_mask):
-        ecodes = [
-            "JRK_ERROR_AWAITING_COMMAND",
-            "JRK_ERROR_NO_POWER",
-            "JRK_ERROR_MOTOR_DRIVER",
-            "JRK_ERROR_INPUT_INVALID",
-            "JRK_ERROR_INPUT_DISCONNECT",
-            "JRK_ERROR_FEEDBACK_DISCONNECT",
-            "JRK_ERROR_SOFT_OVERCURRENT",
-            "JRK_ERROR_SERIAL_SIGNAL",
-            "JRK_ERROR_SERIAL_OVERRUN",
-            "JRK_ERROR_SERIAL_BUFFER_FULL",
-            "JRK_ERROR_SERIAL_CRC",
-            "JRK_ERROR_SERIAL_PROTOCOL",
-            "JRK_ERROR_SERIAL_TIMEOUT",
-            "JRK_ERROR_HARD_OVERCURRENT",
-        ]
-        error_list = []
-        for code in ecodes:
-            if (e_bit_mask >> jc[code]) & 1:
-                error_list.append(code)
-        return error_list
-
 
 class PyJrkEEPROMSettings(PyJrkSettingsBase):
-    def __init__(self, device_handle, driver_handles, logger: LoggerProtocol):
-        super().__init__(device_handle, driver_handles, logger)
+    def __init__(
+        self,
+        device_handle,
+        driver_handles,
+        logger: LoggerProtocol,
+        settings_version: SettingsVersion = None,
+    ):
+        super().__init__(device_handle, driver_handles, logger, settings_version)
 
     def _initialize_settings(self):
         """Get current settings from eeprom and fill the _local_settings"""
-        self._get_eeprom_settings()
-        self._local_settings = self._device_settings_p[0]
+        self._refresh_device_settings(force=True)
+        self._local_settings = jrk_settings.from_buffer_copy(self._device_settings)
 
     def _convert_structure_to_properties(self):
         for field_name, field_type in jrk_settings._fields_:
             prop = property(
-                fget=partial(self._get_jrk_setting_from_device, field_name),
-                fset=partial(self._set_jrk_setting_with_option, field_name),
+                fget=_dispatch_to_instance("_get_jrk_setting_from_device", field_name),
+                fset=_dispatch_to_instance("_set_jrk_setting_with_option", field_name),
             )
             setattr(self.__class__, field_name, prop)
 
-    def _get_jrk_setting_from_device(self, field_name: str, _):
-        self._get_eeprom_settings()
-        return getattr(self._device_settings, field_name)
+    def _read_device_settings(self):
+        return self._get_eeprom_settings()
 
     def apply(self):
         self._settings_fix()
-        self._set_eeprom_settings()
-        self._reinitialize()
+        if self._set_eeprom_settings():
+            self.invalidate()
+            return 1
+        # Reinitializing reloads the RAM settings, staling their cache too
+        e = self._reinitialize()
+        self._cache_written_settings()
+        return e
+
+    def apply_changes(self):
+        """Write only the EEPROM settings that differ from the device.
+
+        The local and device settings are encoded into their EEPROM images and
+        only the differing bytes are written, one JRK_CMD_SET_EEPROM_SETTING
+        each. The device is reinitialized only if something was written.
+        Returns the list of written offsets, or None if the transfer failed.
+        """
+        self._settings_fix()
+        if self._refresh_device_settings(force=True):
+            return None
+        local_image = jrk_settings_to_buffer(self._local_settings)
+        device_image = jrk_settings_to_buffer(self._device_settings)
+
+        written = []
+        # Byte 0 is JRK_SETTING_NOT_INITIALIZED, which is never written
+        for offset in range(1, len(local_image)):
+            if local_image[offset] == device_image[offset]:
+                continue
+            if self._set_eeprom_setting_byte(offset, local_image[offset]):
+                self.invalidate()
+                return None
+            written.append(offset)
+
+        if written:
+            self._logger.debug(
+                f"EEPROM settings written at offsets {[hex(o) for o in written]}"
+            )
+            self._reinitialize()
+            self._cache_written_settings()
+        return written
+
+    def _set_eeprom_setting_byte(self, offset, value):
+        """Write one byte of the EEPROM settings. The library does the same for
+        every byte in jrk_set_eeprom_settings but does not export it."""
+        with self._handle_lock or nullcontext():
+            if self._device_handle is None:
+                self._logger.error("Device is not connected.")
+                return 1
+            e_p = self.usblib.libusbp_control_transfer(
+                self._device_handle.usb_handle,
+                0x40,
+                jc["JRK_CMD_SET_EEPROM_SETTING"],
+                value,
+                offset,
+                None,
+                0,
+                None,
+            )
+        if e_p:
+            self._logger.error(self.usblib.libusbp_error_get_message(e_p).decode())
+            self.usblib.libusbp_error_free(e_p)
+            return 1
+        return 0
 
     def print(self):
         settings_str = c_char_p()
         self._get_eeprom_settings()
-        self._settings_to_string(settings_str)
+        if self._settings_to_string(settings_str):
+            return
         self._logger.debug(f"Device EEPROM settings:\n{settings_str.value.decode()}")
+        self.jrklib.jrk_string_free(settings_str)
 
 
 class PyJrkRAMSettings(PyJrkSettingsBase):
-    def __init__(self, device_handle, driver_handles, logger: LoggerProtocol):
-        super().__init__(device_handle, driver_handles, logger)
+    def __init__(
+        self,
+        device_handle,
+        driver_handles,
+        logger: LoggerProtocol,
+        settings_version: SettingsVersion = None,
+    ):
+        super().__init__(device_handle, driver_handles, logger, settings_version)
         self.auto_apply = True
 
     def _initialize_settings(self):
         """Get current settings from eeprom, fill the _local_settings with them
         and set the ram settings to the current eeprom settings"""
         self._get_eeprom_settings()
-        self._local_settings = self._device_settings_p[0]
-        self._set_ram_settings()
+        self._local_settings = jrk_settings.from_buffer_copy(self._device_settings)
+        if self._set_ram_settings():
+            self.invalidate()
+        else:
+            self._cache_written_settings()
 
-    def _get_jrk_setting_from_device(self, field_name: str, _):
-        self._get_ram_settings()
-        return getattr(self._device_settings, field_name)
+    def _read_device_settings(self):
+        return self._get_ram_settings()
 
     def apply(self):
         self._settings_fix()
-        self._set_ram_settings()
+        if self._set_ram_settings():
+            self.invalidate()
+            return 1
+        self._cache_written_settings()
+        return 0
 
     def print(self):
         settings_str = c_char_p()
         self._get_ram_settings()
-        self._settings_to_string(settings_str)
+        if self._settings_to_string(settings_str):
+            return
         self._logger.debug(f"Device RAM settings:\n{settings_str.value.decode()}")
+        self.jrklib.jrk_string_free(settings_str)
 
 
 if __name__ == "__main__":
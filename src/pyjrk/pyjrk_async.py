@@ -0,0 +1,120 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_base import LoggerProtocol, PyJrkSettingsBase
+from pyjrk.pyjrk_structures import JrkVariablesSnapshot
+
+
+class AsyncPyJrk:
+    """asyncio front-end for a single PyJrk device.
+
+    Every call runs on a dedicated single-thread executor owned by this object,
+    so calls to one device keep their order while calls to different devices
+    run in parallel. Every coroutine accepts an optional timeout in seconds.
+    A timeout stops the wait but not the native call, which still completes on
+    the executor before the next queued call starts.
+    """
+
+    def __init__(self, jrk: PyJrk = None, logger: LoggerProtocol = None):
+        self._jrk = jrk if jrk else PyJrk(logger)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="AsyncPyJrk"
+        )
+        self.ram_settings = AsyncPyJrkSettings(self, "ram_settings")
+        self.eeprom_settings = AsyncPyJrkSettings(self, "eeprom_settings")
+
+    @property
+    def jrk(self) -> PyJrk:
+        return self._jrk
+
+    async def _call(self, func, *args, timeout=None):
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, partial(func, *args))
+        return await asyncio.wait_for(future, timeout)
+
+    async def list_connected_device_serial_numbers(self, timeout=None):
+        return await self._call(
+            self._jrk.list_connected_device_serial_numbers, timeout=timeout
+        )
+
+    async def connect_to_serial_number(self, serial_number, timeout=None):
+        return await self._call(
+            self._jrk.connect_to_serial_number, serial_number, timeout=timeout
+        )
+
+    # Commands
+    async def set_target(self, target, timeout=None):
+        return await self._call(self._jrk.set_target, target, timeout=timeout)
+
+    async def stop_motor(self, timeout=None):
+        return await self._call(self._jrk.stop_motor, timeout=timeout)
+
+    async def force_duty_cycle_target(self, duty_cycle, timeout=None):
+        return await self._call(
+            self._jrk.force_duty_cycle_target, duty_cycle, timeout=timeout
+        )
+
+    async def force_duty_cycle(self, duty_cycle, timeout=None):
+        return await self._call(self._jrk.force_duty_cycle, duty_cycle, timeout=timeout)
+
+    async def reinitialize(self, flags, timeout=None):
+        return await self._call(self._jrk.reinitialize, flags, timeout=timeout)
+
+    # Variables
+    async def snapshot(self, timeout=None) -> JrkVariablesSnapshot:
+        return await self._call(self._jrk.variables.snapshot, timeout=timeout)
+
+    async def read_partial(self, field_names, max_gap=0, timeout=None):
+        return await self._call(
+            self._jrk.variables.read_partial, field_names, max_gap, timeout=timeout
+        )
+
+    async def get_variable(self, field_name, timeout=None):
+        return await self._call(
+            getattr, self._jrk.variables, field_name, timeout=timeout
+        )
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class AsyncPyJrkSettings:
+    """Awaitable access to the RAM or EEPROM settings of an AsyncPyJrk."""
+
+    def __init__(self, device: AsyncPyJrk, settings_name: str):
+        self._device = device
+        self._settings_name = settings_name
+
+    @property
+    def _settings(self) -> PyJrkSettingsBase:
+        return getattr(self._device.jrk, self._settings_name)
+
+    def _set_settings(self, settings: dict):
+        with self._settings.batch() as device_settings:
+            for field_name, value in settings.items():
+                setattr(device_settings, field_name, value)
+
+    async def get(self, field_name, timeout=None):
+        return await self._device._call(
+            getattr, self._settings, field_name, timeout=timeout
+        )
+
+    async def set(self, settings: dict, timeout=None):
+        """Set several settings at once and apply them with a single write."""
+        return await self._device._call(self._set_settings, settings, timeout=timeout)
+
+    async def apply(self, timeout=None):
+        return await self._device._call(self._settings.apply, timeout=timeout)
+
+    async def load_config(self, config_file, timeout=None):
+        return await self._device._call(
+            self._settings.load_config, config_file, timeout=timeout
+        )
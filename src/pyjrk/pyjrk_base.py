@@ -1,11 +1,11 @@
 import logging
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from ctypes import *
-from functools import partial, wraps
+from functools import wraps
 from typing import Protocol, runtime_checkable
 
-import yaml
-
+from pyjrk.pyjrk_profile import load_profile
 from pyjrk.pyjrk_properties import PyJrkSettingsProperties
 from pyjrk.pyjrk_protocol import jrk_constant as jc
 from pyjrk.pyjrk_structures import *
@@ -15,12 +15,26 @@ from pyjrk.pyjrk_structures import *
 def JED(func):
     @wraps(func)
     def func_wrapper(*args, **kwargs):
-        _e_p = func(*args, **kwargs)
+        # Views of a PyJrk share its handle lock, so the handle can not be
+        # closed or replaced by another thread during the call
+        handle_lock = getattr(args[0], "_handle_lock", None) if args else None
+        if handle_lock is None:
+            _e_p = func(*args, **kwargs)
+        else:
+            with handle_lock:
+                if args[0]._device_handle is None:
+                    logging.getLogger("PyJrk").error("Device is not connected.")
+                    return 1
+                _e_p = func(*args, **kwargs)
         if bool(_e_p):
             _e = cast(_e_p, POINTER(jrk_error))
             # TODO pass logger to here
             _logger = logging.getLogger("PyJrk")
             _logger.error(_e.contents.message)
+            # The error was allocated by the library that returned it
+            jrklib = getattr(args[0], "jrklib", None) if args else None
+            if jrklib is not None:
+                jrklib.jrk_error_free(_e_p)
             return 1
         else:
             return 0
@@ -28,6 +42,40 @@ def JED(func):
     return func_wrapper
 
 
+def _claim(jrklib, source_p, destination, free_func_name):
+    """Copy a structure allocated by the library into Python-owned storage and
+    free the library allocation with its matching *_free function."""
+    if not source_p:
+        return
+    memmove(byref(destination), source_p, sizeof(destination))
+    getattr(jrklib, free_func_name)(source_p)
+
+
+def _dispatch_to_instance(method_name, *args):
+    """Return a function calling method_name(*args, ...) on the instance it is
+    given. Used for class-level properties so that every instance reads its own
+    device instead of the one that created the property."""
+
+    def dispatcher(instance, *call_args):
+        return getattr(instance, method_name)(*args, *call_args)
+
+    return dispatcher
+
+
+class SettingsVersion:
+    """Version counter shared by the settings views of one device.
+
+    Bumping it marks every cached copy of the device settings as stale, e.g.
+    after a reinitialize reloads the RAM settings from EEPROM.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def bump(self):
+        self.value += 1
+
+
 @runtime_checkable
 class LoggerProtocol(Protocol):
     def info(self, message: str, *args, **kwargs) -> None: ...
@@ -39,7 +87,16 @@ class LoggerProtocol(Protocol):
 class PyJrkSettingsBase(ABC, PyJrkSettingsProperties):
     """Base class for PyJrk_Settings with static property definitions for IDE support."""
 
-    def __init__(self, device_handle, driver_handles, logger: LoggerProtocol):
+    # Lock guarding the device handle, set by the PyJrk owning it
+    _handle_lock = None
+
+    def __init__(
+        self,
+        device_handle,
+        driver_handles,
+        logger: LoggerProtocol,
+        settings_version: SettingsVersion = None,
+    ):
         self._device_handle = device_handle
         self.usblib, self.jrklib = driver_handles
         self._logger = logger
@@ -47,10 +104,19 @@ class PyJrkSettingsBase(ABC, PyJrkSettingsProperties):
         # local vs device - local settings on pc, device settings on jrk
         self._local_settings = jrk_settings()
         self._device_settings = jrk_settings()
-        self._device_settings_p = POINTER(jrk_settings)()
+
+        # _device_settings is a cache, valid while _cached_version matches the
+        # version shared with the other settings views of the device
+        self._settings_version = (
+            settings_version if settings_version else SettingsVersion()
+        )
+        self._cached_version = None
 
         self._convert_structure_to_properties()
         self.auto_apply = False
+        self._batch_depth = 0
+        # (digest, settings version, local settings) after the last load_config
+        self._applied_profile = None
 
         self._initialize_settings()
 
@@ -58,18 +124,112 @@ class PyJrkSettingsBase(ABC, PyJrkSettingsProperties):
     def _initialize_settings(self): ...
 
     @abstractmethod
-    def _get_jrk_setting_from_device(self, field_name: str, _): ...
+    def _read_device_settings(self):
+        """Read the settings from the device into _device_settings."""
+        ...
+
+    def _refresh_device_settings(self, force=False):
+        if force or self._cached_version != self._settings_version.value:
+            version = self._settings_version.value
+            if self._read_device_settings():
+                self._cached_version = None
+                return 1
+            self._cached_version = version
+        return 0
+
+    def _cache_written_settings(self):
+        """Serve reads of the settings that were just written from a local copy."""
+        memmove(
+            byref(self._device_settings),
+            byref(self._local_settings),
+            sizeof(jrk_settings),
+        )
+        self._cached_version = self._settings_version.value
+
+    def _get_jrk_setting_from_device(self, field_name: str):
+        self._refresh_device_settings()
+        return getattr(self._device_settings, field_name)
+
+    def invalidate(self):
+        """Drop the cached device settings; the next read goes to the device."""
+        self._cached_version = None
 
-    def _set_jrk_setting_with_option(self, field_name, _, value):
+    def refresh(self):
+        """Read the device settings again, ignoring the cache."""
+        return self._refresh_device_settings(force=True)
+
+    def to_dict(self, refresh=False):
+        """Return every device setting, reading them at most once."""
+        self._refresh_device_settings(force=refresh)
+        return {
+            field_name: getattr(self._device_settings, field_name)
+            for field_name, _ in jrk_settings._fields_
+        }
+
+    def _set_jrk_setting_with_option(self, field_name, value):
         setattr(self._local_settings, field_name, value)
-        if self.auto_apply:
+        if self.auto_apply and not self._batch_depth:
+            self.apply()
+
+    @contextmanager
+    def batch(self):
+        """Collect setting assignments and commit them with a single apply.
+
+        Inside the block assignments only change _local_settings. On exit the
+        settings are fixed and written once, or not at all if nothing changed.
+        If the block raises, _local_settings is rolled back and nothing is
+        written. Nested batches commit with the outermost one.
+        """
+        if self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+            return
+
+        before = bytes(self._local_settings)
+        self._batch_depth = 1
+        try:
+            yield self
+        except BaseException:
+            memmove(byref(self._local_settings), before, sizeof(jrk_settings))
+            raise
+        finally:
+            self._batch_depth = 0
+        if bytes(self._local_settings) != before:
             self.apply()
 
+    def update(self, settings: dict):
+        """Set several settings and write them with a single apply.
+
+        Returns the result of apply(), 0 without a write if nothing changed
+        (or an enclosing batch will write them), and 1 without changing
+        anything if a name is not a setting.
+        """
+        unknown = [name for name in settings if not hasattr(jrk_settings, name)]
+        if unknown:
+            self._logger.error(f"Unknown settings: {', '.join(unknown)}")
+            return 1
+        before = bytes(self._local_settings)
+        self._batch_depth += 1
+        try:
+            for field_name, value in settings.items():
+                setattr(self, field_name, value)
+        except BaseException:
+            memmove(byref(self._local_settings), before, sizeof(jrk_settings))
+            raise
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth or bytes(self._local_settings) == before:
+            return 0
+        return self.apply()
+
     def _convert_structure_to_properties(self):
         for field_name, field_type in jrk_settings._fields_:
             prop = property(
-                fget=partial(self._get_jrk_setting_from_device, field_name),
-                fset=partial(self._set_jrk_setting_with_option, field_name),
+                fget=_dispatch_to_instance("_get_jrk_setting_from_device", field_name),
+                fset=_dispatch_to_instance("_set_jrk_setting_with_option", field_name),
             )
             setattr(self.__class__, field_name, prop)
 
@@ -80,40 +240,52 @@ class PyJrkSettingsBase(ABC, PyJrkSettingsProperties):
     def print(self): ...
 
     def load_config(self, config_file):
-        with open(config_file, "r") as ymlfile:
-            cfg = yaml.safe_load(ymlfile)
-
-        cfg_settings = cfg["jrk_settings"]
-
-        jrk_settings_list = [
-            setting_name for setting_name, setting_type in jrk_settings._fields_
-        ]
-
-        for setting in cfg_settings:
-            if setting in jrk_settings_list:
-                if "JRK" in str(cfg_settings[setting]):
-                    value = jc[cfg_settings[setting]]
-                else:
-                    value = cfg_settings[setting]
-                setattr(self._local_settings, setting, value)
+        """Load the settings of a YAML configuration file into _local_settings.
 
+        The file is compiled once into a JrkProfile (see load_profile) and
+        loading it is a copy of its settings image. Loading the same profile
+        again is skipped while neither the local nor the device settings have
+        changed since.
+        """
+        profile = load_profile(config_file)
+        if self._applied_profile == (
+            profile.digest,
+            self._settings_version.value,
+            bytes(self._local_settings),
+        ):
+            return
+
+        self.invalidate()
+        profile.apply_to(self._local_settings)
         if self.auto_apply:
             self.apply()
+            if self._cached_version != self._settings_version.value:
+                # The write failed, so the profile is not applied
+                self._applied_profile = None
+                return
+        self._applied_profile = (
+            profile.digest,
+            self._settings_version.value,
+            bytes(self._local_settings),
+        )
 
     ## Wrapped methods from C API
     @JED
     def _get_eeprom_settings(self):
         """Gets the current settings stored in the device's EEPROM memory and write them
-        to _device_settings_p.
+        to _device_settings.
 
         This method reads the current settings from the device's EEPROM and stores
         them in _device_settings. This function is always called before calling a
         getting a setting from the device via properties in order to refresh the settings.
         """
+        device_settings_p = POINTER(jrk_settings)()
         e_p = self.jrklib.jrk_get_eeprom_settings(
-            byref(self._device_handle), byref(self._device_settings_p)
+            byref(self._device_handle), byref(device_settings_p)
+        )
+        _claim(
+            self.jrklib, device_settings_p, self._device_settings, "jrk_settings_free"
         )
-        self._device_settings = self._device_settings_p[0]
         return e_p
 
     @JED
@@ -132,15 +304,18 @@ class PyJrkSettingsBase(ABC, PyJrkSettingsProperties):
     @JED
     def _get_ram_settings(self):
         """Gets the current settings stored in the device's RAM memory and write them
-        to _device_settings_p.
+        to _device_settings.
 
         This method reads the current settings from the device's RAM and stores
         them in _device_settings.
         """
+        device_settings_p = POINTER(jrk_settings)()
         e_p = self.jrklib.jrk_get_ram_settings(
-            byref(self._device_handle), byref(self._device_settings_p)
+            byref(self._device_handle), byref(device_settings_p)
+        )
+        _claim(
+            self.jrklib, device_settings_p, self._device_settings, "jrk_settings_free"
         )
-        self._device_settings = self._device_settings_p[0]
         return e_p
 
     @JED
@@ -160,6 +335,7 @@ class PyJrkSettingsBase(ABC, PyJrkSettingsProperties):
     def _jrk_restore_defaults(self):
         """ "Restore factory default settings to EEPROM"""
         e_p = self.jrklib.jrk_restore_defaults(byref(self._device_handle))
+        self._settings_version.bump()
         return e_p
 
     @JED
@@ -174,6 +350,7 @@ class PyJrkSettingsBase(ABC, PyJrkSettingsProperties):
     @JED
     def _reinitialize(self):
         e_p = self.jrklib.jrk_reinitialize(byref(self._device_handle))
+        self._settings_version.bump()
         return e_p
 
     @JED
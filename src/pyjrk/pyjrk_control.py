@@ -0,0 +1,248 @@
+import threading
+import time
+from array import array
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_timing import DEFAULT_SPIN_TIME, wait_until
+
+# Commands a control loop can drive, with the range of their values
+CONTROL_OUTPUTS = {
+    "force_duty_cycle_target": (-600, 600),
+    "force_duty_cycle": (-600, 600),
+    "set_target": (0, 4095),
+}
+
+
+class PIDController:
+    """PID controller usable as a ControlLoop controller.
+
+    The derivative acts on the feedback rather than the error, so setpoint
+    changes do not kick the output, and the integral stops accumulating
+    while the output is saturated. output_offset is added to the output,
+    e.g. 2048 when driving set_target.
+    """
+
+    def __init__(
+        self,
+        kp,
+        ki=0.0,
+        kd=0.0,
+        setpoint=0,
+        output_min=-600,
+        output_max=600,
+        output_offset=0,
+    ):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.setpoint = setpoint
+        self.output_min = output_min
+        self.output_max = output_max
+        self.output_offset = output_offset
+        self.reset()
+
+    def reset(self):
+        self._integral = 0.0
+        self._last_feedback = None
+
+    def __call__(self, feedback, dt):
+        error = self.setpoint - feedback
+        derivative = 0.0
+        if self._last_feedback is not None and dt > 0:
+            derivative = (feedback - self._last_feedback) / dt
+        self._last_feedback = feedback
+
+        integral = self._integral + error * dt
+        output = (
+            self.output_offset
+            + self.kp * error
+            + self.ki * integral
+            - self.kd * derivative
+        )
+        if output > self.output_max:
+            output = self.output_max
+        elif output < self.output_min:
+            output = self.output_min
+        else:
+            self._integral = integral
+        return int(round(output))
+
+
+class ControlLoop:
+    """Closes an outer control loop on the host at a fixed rate.
+
+    Every period the loop reads feedback_field with a single variable segment
+    transfer, calls controller(feedback, dt) and sends the returned value
+    with the output command; a controller returning None skips the write.
+    dt is the measured time since the previous feedback read. Deadlines are
+    absolute, waited for by sleeping and then spinning.
+
+    The per-iteration work reuses preallocated buffers and bound functions.
+    Periods and latencies (feedback read to output written) of the latest
+    history iterations are kept for stats(). The motor is stopped when the
+    loop ends, and the loop ends on the first failed transfer when
+    stop_on_error is set.
+    """
+
+    def __init__(
+        self,
+        jrk: PyJrk,
+        controller,
+        rate_hz=1000.0,
+        feedback_field="scaled_feedback",
+        output="force_duty_cycle_target",
+        spin_time=DEFAULT_SPIN_TIME,
+        stop_on_error=True,
+        history=4096,
+    ):
+        if output not in CONTROL_OUTPUTS:
+            raise ValueError(f"output must be one of {', '.join(CONTROL_OUTPUTS)}")
+        self._jrk = jrk
+        self._logger = jrk._logger
+        self.controller = controller
+        self.period = 1.0 / rate_hz
+        self.spin_time = spin_time
+        self.stop_on_error = stop_on_error
+        self._read_feedback = jrk.variables.field_reader(feedback_field)
+        self._write_output = getattr(jrk, output)
+        self._output_min, self._output_max = CONTROL_OUTPUTS[output]
+
+        self.history = history
+        self._periods = array("d", bytes(8 * history))
+        self._latencies = array("d", bytes(8 * history))
+
+        self.iteration_count = 0
+        self.error_count = 0
+        # Iterations that took longer than one period
+        self.overruns = 0
+        # Deadlines skipped entirely because the loop fell behind
+        self.missed_deadlines = 0
+        self.last_feedback = None
+        self.last_output = None
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def run(self, iterations=None, duration=None):
+        """Run the loop in the calling thread until stop(), or until the
+        given number of iterations or seconds have elapsed. A stop() issued
+        before run() is called ends it before its first iteration."""
+        period = self.period
+        spin_time = self.spin_time
+        history = self.history
+        periods = self._periods
+        latencies = self._latencies
+        read_feedback = self._read_feedback
+        write_output = self._write_output
+        controller = self.controller
+        output_min = self._output_min
+        output_max = self._output_max
+        stop_event = self._stop_event
+        perf_counter = time.perf_counter
+
+        start_count = self.iteration_count
+        end_time = None if duration is None else perf_counter() + duration
+        next_deadline = perf_counter()
+        previous_read = None
+        try:
+            while not stop_event.is_set():
+                if iterations is not None and (
+                    self.iteration_count - start_count >= iterations
+                ):
+                    break
+                if end_time is not None and next_deadline >= end_time:
+                    break
+                wait_until(next_deadline, spin_time)
+
+                read_time = perf_counter()
+                feedback = read_feedback()
+                if feedback is None:
+                    self.error_count += 1
+                    if self.stop_on_error:
+                        break
+                else:
+                    dt = period if previous_read is None else read_time - previous_read
+                    output = controller(feedback, dt)
+                    self.last_feedback = feedback
+                    if output is not None:
+                        if output > output_max:
+                            output = output_max
+                        elif output < output_min:
+                            output = output_min
+                        if write_output(output):
+                            self.error_count += 1
+                            if self.stop_on_error:
+                                break
+                        self.last_output = output
+                end = perf_counter()
+
+                slot = self.iteration_count % history
+                latencies[slot] = end - read_time
+                periods[slot] = (
+                    period if previous_read is None else read_time - previous_read
+                )
+                previous_read = read_time
+                self.iteration_count += 1
+
+                if end - read_time > period:
+                    self.overruns += 1
+                next_deadline += period
+                if end > next_deadline:
+                    skipped = int((end - next_deadline) // period) + 1
+                    self.missed_deadlines += skipped
+                    next_deadline += skipped * period
+        finally:
+            self._jrk.stop_motor()
+            # Cleared only once the loop is over, so no stop() is lost
+            stop_event.clear()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # Cleared before the thread exists, so a stop() right after is kept
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="PyJrkControlLoop", daemon=True
+        )
+        self._thread.start()
+        self._logger.debug(f"Control loop started at {1.0 / self.period:g} Hz")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._logger.debug("Control loop stopped")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @staticmethod
+    def _summary(samples):
+        if not samples:
+            return {"mean": 0.0, "min": 0.0, "p99": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "mean": sum(ordered) / len(ordered),
+            "min": ordered[0],
+            "p99": ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)],
+            "max": ordered[-1],
+        }
+
+    def stats(self):
+        """Return the iteration, error, overrun and missed deadline counts and
+        the period and latency statistics of the latest iterations, in
+        seconds."""
+        count = min(self.iteration_count, self.history)
+        return {
+            "iterations": self.iteration_count,
+            "errors": self.error_count,
+            "overruns": self.overruns,
+            "missed_deadlines": self.missed_deadlines,
+            "period": self._summary(self._periods[:count]),
+            "latency": self._summary(self._latencies[:count]),
+        }
@@ -0,0 +1,717 @@
+import threading
+import time
+from ctypes import *
+
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+from pyjrk.pyjrk_structures import *
+
+# Factory settings of an emulated device, the same as config/config.yml
+DEFAULT_SETTINGS = {
+    "input_mode": jc["JRK_INPUT_MODE_SERIAL"],
+    "input_error_maximum": 4095,
+    "input_maximum": 4095,
+    "input_neutral_minimum": 2048,
+    "input_neutral_maximum": 2048,
+    "output_neutral": 2048,
+    "output_maximum": 4095,
+    "input_scaling_degree": jc["JRK_SCALING_DEGREE_LINEAR"],
+    "input_analog_samples_exponent": 7,
+    "feedback_mode": jc["JRK_FEEDBACK_MODE_NONE"],
+    "feedback_error_maximum": 4095,
+    "feedback_maximum": 4095,
+    "feedback_analog_samples_exponent": 7,
+    "serial_mode": jc["JRK_SERIAL_MODE_USB_DUAL_PORT"],
+    "serial_baud_rate": 9600,
+    "serial_device_number": 11,
+    "pid_period": 10,
+    "integral_limit": 1000,
+    "pwm_frequency": 20,
+    "current_samples_exponent": 7,
+    "hard_overcurrent_threshold": 1,
+    "max_duty_cycle_while_feedback_out_of_range": 600,
+    "max_acceleration_forward": 600,
+    "max_acceleration_reverse": 600,
+    "max_deceleration_forward": 600,
+    "max_deceleration_reverse": 600,
+    "max_duty_cycle_forward": 600,
+    "max_duty_cycle_reverse": 600,
+    "encoded_hard_current_limit_forward": 86,
+    "encoded_hard_current_limit_reverse": 86,
+    "fbt_method": jc["JRK_FBT_METHOD_PULSE_COUNTING"],
+    "fbt_timing_clock": jc["JRK_FBT_TIMING_CLOCK_1_5"],
+    "fbt_timing_timeout": 100,
+    "fbt_samples": 1,
+}
+
+MAX_DUTY_CYCLE = 600
+# Longest stretch of time simulated at once; older history is skipped
+_MAX_STEPS_PER_UPDATE = 10000
+
+
+def _clamp(value, low, high):
+    return low if value < low else high if value > high else value
+
+
+class EmulatedJrk:
+    """One emulated Jrk G2 controller.
+
+    The EEPROM is kept as the raw settings image the device stores, so full
+    and single byte EEPROM writes behave like on the device, and the RAM
+    settings are reloaded from it on reinitialize. The motor is simulated in
+    whole PID periods, lazily, whenever the device is accessed:
+
+    - the duty cycle target comes from the target in open loop (feedback mode
+      none) or from the PID coefficients of the RAM settings, and is limited
+      by max_duty_cycle_forward/reverse;
+    - the duty cycle follows it within the acceleration and deceleration
+      limits;
+    - the motor is a first-order system whose speed, in feedback units per
+      second, settles at max_speed * duty_cycle / 600 with time_constant
+      seconds, and the feedback is its position.
+
+    Any halting error stops the motor. clock returns the time in seconds and
+    can be replaced by a virtual clock for deterministic runs.
+    """
+
+    def __init__(
+        self,
+        serial_number,
+        product=jc["JRK_PRODUCT_UMC04A_30V"],
+        firmware_version=0x0100,
+        settings: dict = None,
+        max_speed=2000.0,
+        time_constant=0.05,
+        initial_position=2048.0,
+        clock=time.monotonic,
+    ):
+        self.serial_number = serial_number
+        self.product = product
+        self.firmware_version = firmware_version
+        self.max_speed = max_speed
+        self.time_constant = time_constant
+        self.clock = clock
+        self.lock = threading.RLock()
+        # Unplugged devices are left out of enumeration and fail every call
+        self.connected = True
+
+        factory_settings = self._new_settings()
+        for field_name, value in {**DEFAULT_SETTINGS, **(settings or {})}.items():
+            setattr(factory_settings, field_name, value)
+        self.eeprom = jrk_settings_to_buffer(factory_settings)
+        self.ram_settings = self._new_settings()
+
+        self.variables = jrk_variables()
+        self.position = float(initial_position)
+        self.velocity = 0.0
+        self._boot_time = self.clock()
+        self._reset()
+
+    def _new_settings(self):
+        settings = jrk_settings()
+        settings.product = self.product
+        settings.firmware_version = self.firmware_version
+        return settings
+
+    def _reset(self):
+        """Power-up state: RAM settings from EEPROM, motor off, awaiting a
+        command."""
+        jrk_settings_from_buffer(self.eeprom, self.ram_settings)
+        variables = self.variables
+        variables.target = 2048
+        variables.input = 2048
+        variables.duty_cycle_target = variables.duty_cycle = 0
+        variables.integral = 0
+        variables.force_mode = jc["JRK_FORCE_MODE_NONE"]
+        variables.vin_voltage = 12000
+        variables.device_reset = 0
+        variables.encoded_hard_current_limit = (
+            self.ram_settings.encoded_hard_current_limit_forward
+        )
+        for pin in variables.pin_info:
+            pin.analog_reading = 0xFFFF
+        self._forced_duty_cycle = 0
+        self._last_error = 0
+        self._latched_errors = 0
+        self._active_errors = 1 << jc["JRK_ERROR_AWAITING_COMMAND"]
+        self._occurred_errors = self._active_errors
+        self._last_step_time = self.clock()
+        self._update_error_variables()
+
+    # Errors
+    def _update_error_variables(self):
+        self.variables.error_flags_halting = self._latched_errors | self._active_errors
+        self.variables.error_flags_occurred = self._occurred_errors
+
+    def inject_error(self, code, latched=True):
+        """Raise an error, e.g. jc["JRK_ERROR_MOTOR_DRIVER"]. A latched error
+        stays until the halting flags are cleared; an active one until
+        clear_error."""
+        with self.lock:
+            self.update()
+            bit = 1 << code
+            if latched:
+                self._latched_errors |= bit
+            else:
+                self._active_errors |= bit
+            self._occurred_errors |= bit
+            self._update_error_variables()
+
+    def clear_error(self, code):
+        with self.lock:
+            self.update()
+            self._active_errors &= ~(1 << code)
+            self._update_error_variables()
+
+    # Commands
+    def set_target(self, target):
+        with self.lock:
+            self.update()
+            self.variables.target = _clamp(target, 0, 4095)
+            self.variables.force_mode = jc["JRK_FORCE_MODE_NONE"]
+            self._active_errors &= ~(1 << jc["JRK_ERROR_AWAITING_COMMAND"])
+            self._update_error_variables()
+
+    def stop_motor(self):
+        with self.lock:
+            self.update()
+            self._active_errors |= 1 << jc["JRK_ERROR_AWAITING_COMMAND"]
+            self._occurred_errors |= 1 << jc["JRK_ERROR_AWAITING_COMMAND"]
+            self._update_error_variables()
+
+    def force_duty_cycle_target(self, duty_cycle):
+        self._force(duty_cycle, jc["JRK_FORCE_MODE_DUTY_CYCLE_TARGET"])
+
+    def force_duty_cycle(self, duty_cycle):
+        self._force(duty_cycle, jc["JRK_FORCE_MODE_DUTY_CYCLE"])
+
+    def _force(self, duty_cycle, force_mode):
+        with self.lock:
+            self.update()
+            self._forced_duty_cycle = _clamp(
+                duty_cycle, -MAX_DUTY_CYCLE, MAX_DUTY_CYCLE
+            )
+            self.variables.force_mode = force_mode
+            self._active_errors &= ~(1 << jc["JRK_ERROR_AWAITING_COMMAND"])
+            self._update_error_variables()
+
+    def reinitialize(self):
+        with self.lock:
+            self.update()
+            jrk_settings_from_buffer(self.eeprom, self.ram_settings)
+            self.variables.integral = 0
+            self._last_error = 0
+
+    # Settings
+    def get_eeprom_settings(self) -> jrk_settings:
+        with self.lock:
+            settings = self._new_settings()
+            jrk_settings_from_buffer(self.eeprom, settings)
+            return settings
+
+    def set_eeprom_settings(self, settings: jrk_settings):
+        with self.lock:
+            settings = jrk_settings.from_buffer_copy(settings)
+            settings.product = self.product
+            self.eeprom[1:] = jrk_settings_to_buffer(settings)[1:]
+
+    def set_eeprom_setting_byte(self, offset, value):
+        with self.lock:
+            self.eeprom[offset] = value
+
+    def restore_defaults(self):
+        with self.lock:
+            settings = self._new_settings()
+            for field_name, value in DEFAULT_SETTINGS.items():
+                setattr(settings, field_name, value)
+            self.eeprom = jrk_settings_to_buffer(settings)
+
+    def get_ram_settings(self) -> jrk_settings:
+        with self.lock:
+            return jrk_settings.from_buffer_copy(self.ram_settings)
+
+    def set_ram_settings(self, settings: jrk_settings):
+        with self.lock:
+            self.update()
+            product = self.ram_settings.product
+            firmware_version = self.ram_settings.firmware_version
+            memmove(byref(self.ram_settings), byref(settings), sizeof(jrk_settings))
+            self.ram_settings.product = product
+            self.ram_settings.firmware_version = firmware_version
+
+    # Variables
+    def get_variables(self, flags=0) -> jrk_variables:
+        """Copy of the variables; flags are the JRK_GET_VARIABLES_FLAG_* bits."""
+        with self.lock:
+            self.update()
+            variables = jrk_variables.from_buffer_copy(self.variables)
+            if flags & (1 << jc["JRK_GET_VARIABLES_FLAG_CLEAR_ERROR_FLAGS_HALTING"]):
+                self._latched_errors = 0
+            if flags & (1 << jc["JRK_GET_VARIABLES_FLAG_CLEAR_ERROR_FLAGS_OCCURRED"]):
+                self._occurred_errors = 0
+            clear_chopping = jc[
+                "JRK_GET_VARIABLES_FLAG_CLEAR_CURRENT_CHOPPING_OCCURRENCE_COUNT"
+            ]
+            if flags & (1 << clear_chopping):
+                self.variables.current_chopping_occurrence_count = 0
+            self._update_error_variables()
+            return variables
+
+    def get_variables_buffer(self) -> bytearray:
+        """The variables as the raw block read with JRK_CMD_GET_VARIABLES."""
+        with self.lock:
+            self.update()
+            return jrk_variables_to_buffer(self.variables)
+
+    # Motor model
+    def update(self):
+        """Simulate every PID period elapsed since the last update."""
+        with self.lock:
+            period = max(self.ram_settings.pid_period, 1) / 1000.0
+            now = self.clock()
+            steps = int((now - self._last_step_time) / period)
+            if steps <= 0:
+                return
+            self._last_step_time += steps * period
+            for _ in range(min(steps, _MAX_STEPS_PER_UPDATE)):
+                self._step(period)
+            self.variables.up_time = int((now - self._boot_time) * 1000) & 0xFFFFFFFF
+
+    def _scaled_feedback(self, feedback):
+        settings = self.ram_settings
+        low, high = settings.feedback_minimum, settings.feedback_maximum
+        if high <= low:
+            return 0
+        scaled = (feedback - low) * 4095 // (high - low)
+        if settings.feedback_invert:
+            scaled = 4095 - scaled
+        return _clamp(scaled, 0, 4095)
+
+    def _pid(self, scaled_feedback):
+        settings = self.ram_settings
+        variables = self.variables
+        error = scaled_feedback - variables.target
+        integral = _clamp(
+            variables.integral + error,
+            -settings.integral_limit,
+            settings.integral_limit,
+        )
+        variables.integral = integral
+        proportional = settings.proportional_multiplier / (
+            1 << settings.proportional_exponent
+        )
+        integral_coefficient = settings.integral_multiplier / (
+            1 << (settings.integral_exponent + settings.integral_divider_exponent)
+        )
+        derivative = settings.derivative_multiplier / (
+            1 << settings.derivative_exponent
+        )
+        duty_cycle_target = -(
+            proportional * error
+            + integral_coefficient * integral
+            + derivative * (error - self._last_error)
+        )
+        self._last_error = error
+        return int(duty_cycle_target)
+
+    def _limit_change(self, duty_cycle, duty_cycle_target):
+        settings = self.ram_settings
+        if duty_cycle_target > duty_cycle:
+            if duty_cycle >= 0:
+                limit = settings.max_acceleration_forward
+            else:
+                limit = settings.max_deceleration_reverse
+            return min(duty_cycle_target, duty_cycle + max(limit, 1))
+        if duty_cycle_target < duty_cycle:
+            if duty_cycle > 0:
+                limit = settings.max_deceleration_forward
+            else:
+                limit = settings.max_acceleration_reverse
+            return max(duty_cycle_target, duty_cycle - max(limit, 1))
+        return duty_cycle
+
+    def _step(self, period):
+        settings = self.ram_settings
+        variables = self.variables
+
+        feedback = int(_clamp(self.position, 0, 4095))
+        if settings.feedback_mode == jc["JRK_FEEDBACK_MODE_NONE"]:
+            variables.feedback = 0
+            scaled_feedback = 0
+        else:
+            variables.feedback = feedback
+            scaled_feedback = self._scaled_feedback(feedback)
+        variables.scaled_feedback = scaled_feedback
+        variables.pin_info[jc["JRK_PIN_NUM_FBA"]].analog_reading = feedback * 16
+
+        if self._latched_errors | self._active_errors:
+            duty_cycle_target = duty_cycle = 0
+            variables.integral = 0
+        elif variables.force_mode == jc["JRK_FORCE_MODE_DUTY_CYCLE"]:
+            duty_cycle_target = duty_cycle = self._forced_duty_cycle
+        else:
+            if variables.force_mode == jc["JRK_FORCE_MODE_DUTY_CYCLE_TARGET"]:
+                duty_cycle_target = self._forced_duty_cycle
+            elif settings.feedback_mode == jc["JRK_FEEDBACK_MODE_NONE"]:
+                duty_cycle_target = (variables.target - 2048) * MAX_DUTY_CYCLE // 2048
+            else:
+                duty_cycle_target = self._pid(scaled_feedback)
+            duty_cycle_target = _clamp(
+                duty_cycle_target,
+                -settings.max_duty_cycle_reverse,
+                settings.max_duty_cycle_forward,
+            )
+            duty_cycle = self._limit_change(variables.duty_cycle, duty_cycle_target)
+
+        variables.duty_cycle_target = _clamp(duty_cycle_target, -32768, 32767)
+        variables.duty_cycle = duty_cycle
+        variables.last_duty_cycle = duty_cycle
+        variables.current = abs(duty_cycle) * 5
+        variables.current_low_res = min(variables.current // 256, 255)
+        variables.pid_period_count = (variables.pid_period_count + 1) & 0xFFFF
+
+        applied = -duty_cycle if settings.motor_invert else duty_cycle
+        speed = self.max_speed * applied / MAX_DUTY_CYCLE
+        self.velocity += (speed - self.velocity) * min(period / self.time_constant, 1.0)
+        self.position = _clamp(self.position + self.velocity * period, 0.0, 4095.0)
+
+
+def _address(value):
+    """Address passed by a pointer, byref() or integer argument."""
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    return cast(value, c_void_p).value or 0
+
+
+def _value(value):
+    return getattr(value, "value", value)
+
+
+def _delay(seconds):
+    # sleep() is too coarse for sub-millisecond latencies, so the end is spun
+    deadline = time.perf_counter() + seconds
+    if seconds > 0.002:
+        time.sleep(seconds - 0.001)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class _EmulatedLibrary:
+    """Shared plumbing of the emulated C libraries: allocations kept alive by
+    address, errors returned as jrk_error pointers and injected latency."""
+
+    def __init__(self, emulator):
+        self._emulator = emulator
+        self._allocations = {}
+        self._lock = threading.Lock()
+        # Every emulated C function waits for the configured latency first
+        for func_name in dir(type(self)):
+            if func_name.startswith(("jrk_", "libusbp_")):
+                setattr(
+                    self,
+                    func_name,
+                    self._with_latency(func_name, getattr(self, func_name)),
+                )
+
+    def _with_latency(self, func_name, func):
+        def func_wrapper(*args):
+            self._latency(func_name)
+            return func(*args)
+
+        return func_wrapper
+
+    def _keep(self, obj, *dependencies):
+        address = addressof(obj)
+        with self._lock:
+            self._allocations[address] = (obj, dependencies)
+        return address
+
+    def _release(self, pointer):
+        with self._lock:
+            self._allocations.pop(_address(pointer), None)
+
+    def _store(self, out_pointer, obj, *dependencies):
+        """Allocate obj on behalf of the caller and write its address to the
+        pointer variable the caller passed by reference."""
+        address = self._keep(obj, *dependencies)
+        memmove(_address(out_pointer), byref(c_void_p(address)), sizeof(c_void_p))
+
+    def _error(self, message):
+        message = create_string_buffer(message.encode())
+        error = jrk_error()
+        error.message = cast(message, c_char_p)
+        return self._keep(error, message)
+
+    def _latency(self, func_name):
+        latency = self._emulator.latency
+        if callable(latency):
+            latency = latency(func_name)
+        elif isinstance(latency, dict):
+            latency = latency.get(func_name, 0)
+        if latency:
+            _delay(latency)
+
+
+class EmulatedJrkLibrary(_EmulatedLibrary):
+    """Stand-in for the jrk2 C library backed by EmulatedJrk devices.
+
+    It implements the functions PyJrk calls, with the same arguments, and
+    returns NULL or a jrk_error address like the library does.
+    """
+
+    def __init__(self, emulator):
+        self._handles = {}
+        super().__init__(emulator)
+
+    def _device(self, handle_ref):
+        device = self._handles.get(_address(handle_ref))
+        if device is None or not device.connected:
+            return None
+        return device
+
+    def _run(self, handle_ref, method_name, *args):
+        device = self._device(handle_ref)
+        if device is None:
+            return self._error("Device disconnected.")
+        getattr(device, method_name)(*args)
+        return None
+
+    # Errors
+    def jrk_error_free(self, error_p):
+        self._release(error_p)
+
+    def jrk_error_get_message(self, error_p):
+        return cast(_address(error_p), POINTER(jrk_error)).contents.message
+
+    def jrk_string_free(self, string):
+        self._release(string)
+
+    # Devices
+    def jrk_list_connected_devices(self, list_pp, count_p):
+        devices = [
+            self._new_device(device)
+            for device in self._emulator.devices.values()
+            if device.connected
+        ]
+        device_list = (POINTER(jrk_device) * (len(devices) + 1))(
+            *[pointer(device) for device in devices]
+        )
+        self._store(list_pp, device_list, devices)
+        memmove(_address(count_p), byref(c_size_t(len(devices))), sizeof(c_size_t))
+        return None
+
+    def _new_device(self, device: EmulatedJrk):
+        serial_number = create_string_buffer(device.serial_number.encode())
+        jrkdev = jrk_device()
+        jrkdev.serial_number = cast(serial_number, c_char_p)
+        jrkdev.os_id = cast(serial_number, c_char_p)
+        jrkdev.firmware_version = device.firmware_version
+        jrkdev.product = device.product
+        # The serial number buffer lives as long as the device structure
+        jrkdev._serial_number = serial_number
+        return jrkdev
+
+    def jrk_list_free(self, list_p):
+        self._release(list_p)
+
+    def jrk_device_copy(self, device_ref, device_pp):
+        source = cast(_address(device_ref), POINTER(jrk_device)).contents
+        device = self._emulator.devices.get(source.serial_number.decode())
+        if device is None:
+            return self._error("Device not found.")
+        copy = self._new_device(device)
+        self._store(device_pp, copy)
+        return None
+
+    def jrk_device_free(self, device_p):
+        self._release(device_p)
+
+    # Handles
+    def jrk_handle_open(self, device_ref, handle_pp):
+        source = cast(_address(device_ref), POINTER(jrk_device)).contents
+        device = self._emulator.devices.get(source.serial_number.decode())
+        if device is None or not device.connected:
+            return self._error("Device not found.")
+        usb_handle = libusbp_generic_handle()
+        jrkdev = self._new_device(device)
+        handle = jrk_handle()
+        handle.usb_handle = pointer(usb_handle)
+        handle.device = pointer(jrkdev)
+        self._store(handle_pp, handle, usb_handle, jrkdev)
+        self._handles[addressof(handle)] = device
+        self._emulator._usb_handles[addressof(usb_handle)] = device
+        return None
+
+    def jrk_handle_close(self, handle_p):
+        address = _address(handle_p)
+        self._handles.pop(address, None)
+        handle = cast(address, POINTER(jrk_handle)).contents
+        self._emulator._usb_handles.pop(_address(handle.usb_handle), None)
+        self._release(address)
+
+    # Settings
+    def jrk_settings_free(self, settings_p):
+        self._release(settings_p)
+
+    def jrk_settings_fix(self, settings_ref, warnings_p):
+        return None
+
+    def jrk_settings_to_string(self, settings_ref, string_p):
+        settings = cast(_address(settings_ref), POINTER(jrk_settings)).contents
+        text = "".join(
+            f"{field_name}: {getattr(settings, field_name)}\n"
+            for field_name, _ in jrk_settings._fields_
+        )
+        self._store(string_p, create_string_buffer(text.encode()))
+        return None
+
+    def _get_settings(self, handle_ref, settings_pp, method_name):
+        device = self._device(handle_ref)
+        if device is None:
+            return self._error("Device disconnected.")
+        self._store(settings_pp, getattr(device, method_name)())
+        return None
+
+    def _set_settings(self, handle_ref, settings_ref, method_name):
+        settings = cast(_address(settings_ref), POINTER(jrk_settings)).contents
+        return self._run(handle_ref, method_name, settings)
+
+    def jrk_get_eeprom_settings(self, handle_ref, settings_pp):
+        return self._get_settings(handle_ref, settings_pp, "get_eeprom_settings")
+
+    def jrk_set_eeprom_settings(self, handle_ref, settings_ref):
+        return self._set_settings(handle_ref, settings_ref, "set_eeprom_settings")
+
+    def jrk_get_ram_settings(self, handle_ref, settings_pp):
+        return self._get_settings(handle_ref, settings_pp, "get_ram_settings")
+
+    def jrk_set_ram_settings(self, handle_ref, settings_ref):
+        return self._set_settings(handle_ref, settings_ref, "set_ram_settings")
+
+    def jrk_restore_defaults(self, handle_ref):
+        return self._run(handle_ref, "restore_defaults")
+
+    def jrk_reinitialize(self, handle_ref, *args):
+        return self._run(handle_ref, "reinitialize")
+
+    def jrk_reinitialize_and_reset_errors(self, handle_ref):
+        return self._run(handle_ref, "reinitialize")
+
+    # Variables
+    def jrk_variables_free(self, variables_p):
+        self._release(variables_p)
+
+    def jrk_get_variables(self, handle_ref, variables_pp, flags):
+        device = self._device(handle_ref)
+        if device is None:
+            return self._error("Device disconnected.")
+        self._store(variables_pp, device.get_variables(_value(flags)))
+        return None
+
+    def jrk_get_variable_segment(self, handle_ref, index, length, output, flags):
+        device = self._device(handle_ref)
+        if device is None:
+            return self._error("Device disconnected.")
+        index, length = _value(index), _value(length)
+        if length == 0:
+            return self._error("Failed to read variables: length is zero.")
+        if index + length > jc["JRK_VARIABLES_SIZE"]:
+            return self._error("Failed to read variables: invalid index or length.")
+        device.get_variables(_value(flags))
+        block = bytes(device.get_variables_buffer()[index : index + length])
+        memmove(_address(output), block, length)
+        return None
+
+    # Commands
+    def jrk_set_target(self, handle_ref, target):
+        return self._run(handle_ref, "set_target", _value(target))
+
+    def jrk_stop_motor(self, handle_ref):
+        return self._run(handle_ref, "stop_motor")
+
+    def jrk_force_duty_cycle_target(self, handle_ref, duty_cycle):
+        return self._run(handle_ref, "force_duty_cycle_target", _value(duty_cycle))
+
+    def jrk_force_duty_cycle(self, handle_ref, duty_cycle):
+        return self._run(handle_ref, "force_duty_cycle", _value(duty_cycle))
+
+
+class _usbp_error(Structure):
+    _fields_ = [("message", c_char_p)]
+
+
+class EmulatedUsbLibrary(_EmulatedLibrary):
+    """Stand-in for the libusbp functions PyJrk calls directly."""
+
+    def libusbp_control_transfer(
+        self, usb_handle, request_type, request, value, index, data, length, transferred
+    ):
+        device = self._emulator._usb_handles.get(_address(usb_handle))
+        if device is None or not device.connected:
+            return self._usbp_error("Device disconnected.")
+        if request_type == 0x40 and request == jc["JRK_CMD_SET_EEPROM_SETTING"]:
+            if not 0 < index < jc["JRK_SETTINGS_SIZE"]:
+                return self._usbp_error("Invalid EEPROM setting offset.")
+            device.set_eeprom_setting_byte(index, value & 0xFF)
+            return None
+        return self._usbp_error(f"Unsupported control transfer 0x{request:02X}.")
+
+    def _usbp_error(self, message):
+        message = create_string_buffer(message.encode())
+        error = _usbp_error()
+        error.message = cast(message, c_char_p)
+        return self._keep(error, message)
+
+    def libusbp_error_get_message(self, error_p):
+        return cast(_address(error_p), POINTER(_usbp_error)).contents.message
+
+    def libusbp_error_free(self, error_p):
+        self._release(error_p)
+
+
+class JrkEmulator:
+    """A set of emulated Jrk G2 controllers and the driver handles that reach
+    them, to be passed to PyJrk as its backend:
+
+        emulator = JrkEmulator()
+        emulator.add_device("00000001")
+        jrk = PyJrk(backend=emulator.drivers)
+
+    latency is added to every emulated call, in seconds. It can be a number,
+    a dict of C function name -> seconds, or a function of the name.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.devices: dict[str, EmulatedJrk] = {}
+        self._usb_handles = {}
+        self.usblib = EmulatedUsbLibrary(self)
+        self.jrklib = EmulatedJrkLibrary(self)
+
+    @property
+    def drivers(self):
+        """The (usblib, jrklib) driver handles of the emulator."""
+        return self.usblib, self.jrklib
+
+    def add_device(self, serial_number, **kwargs) -> EmulatedJrk:
+        """Plug in a new emulated device; kwargs are passed to EmulatedJrk."""
+        device = EmulatedJrk(serial_number, **kwargs)
+        self.devices[serial_number] = device
+        return device
+
+    def unplug(self, serial_number):
+        self.devices[serial_number].connected = False
+
+    def plug(self, serial_number):
+        self.devices[serial_number].connected = True
+
+
+def emulated_backend(*serial_numbers, latency=0.0):
+    """Return the driver handles of a new JrkEmulator with one device per
+    serial number. Picklable through functools.partial, so it can build the
+    backend of another process, e.g. JrkProcessPool(backend_factory=...)."""
+    emulator = JrkEmulator(latency)
+    for serial_number in serial_numbers:
+        emulator.add_device(serial_number)
+    return emulator.drivers
@@ -0,0 +1,105 @@
+import threading
+import time
+from enum import IntFlag
+from functools import lru_cache
+from typing import NamedTuple
+
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+
+
+class JrkErrorFlags(IntFlag):
+    """Bits of error_flags_halting and error_flags_occurred."""
+
+    AWAITING_COMMAND = 1 << jc["JRK_ERROR_AWAITING_COMMAND"]
+    NO_POWER = 1 << jc["JRK_ERROR_NO_POWER"]
+    MOTOR_DRIVER = 1 << jc["JRK_ERROR_MOTOR_DRIVER"]
+    INPUT_INVALID = 1 << jc["JRK_ERROR_INPUT_INVALID"]
+    INPUT_DISCONNECT = 1 << jc["JRK_ERROR_INPUT_DISCONNECT"]
+    FEEDBACK_DISCONNECT = 1 << jc["JRK_ERROR_FEEDBACK_DISCONNECT"]
+    SOFT_OVERCURRENT = 1 << jc["JRK_ERROR_SOFT_OVERCURRENT"]
+    SERIAL_SIGNAL = 1 << jc["JRK_ERROR_SERIAL_SIGNAL"]
+    SERIAL_OVERRUN = 1 << jc["JRK_ERROR_SERIAL_OVERRUN"]
+    SERIAL_BUFFER_FULL = 1 << jc["JRK_ERROR_SERIAL_BUFFER_FULL"]
+    SERIAL_CRC = 1 << jc["JRK_ERROR_SERIAL_CRC"]
+    SERIAL_PROTOCOL = 1 << jc["JRK_ERROR_SERIAL_PROTOCOL"]
+    SERIAL_TIMEOUT = 1 << jc["JRK_ERROR_SERIAL_TIMEOUT"]
+    HARD_OVERCURRENT = 1 << jc["JRK_ERROR_HARD_OVERCURRENT"]
+
+
+# Every known error bit
+_ALL_ERRORS = sum(int(flag) for flag in JrkErrorFlags)
+
+
+@lru_cache(maxsize=None)
+def decode_error_flags(mask) -> JrkErrorFlags:
+    """Return the error bitmask as JrkErrorFlags, ignoring unknown bits."""
+    return JrkErrorFlags(mask & _ALL_ERRORS)
+
+
+class JrkErrorEvent(NamedTuple):
+    """A change of error_flags_halting or error_flags_occurred.
+
+    timestamp is the time.monotonic() of the read that saw the change, and
+    set and cleared hold the bits that changed since the previous read.
+    """
+
+    timestamp: float
+    field_name: str
+    flags: JrkErrorFlags
+    set: JrkErrorFlags
+    cleared: JrkErrorFlags
+
+
+class ErrorFlagsPublisher:
+    """Compares the error flags of each read with the previous one and calls
+    the subscribers with a JrkErrorEvent for every field that changed.
+
+    The first read only sets the reference, unless flags are already set, in
+    which case they are reported as set.
+    """
+
+    _FIELD_NAMES = ("error_flags_halting", "error_flags_occurred")
+
+    def __init__(self):
+        self._subscribers = []
+        self._last = {field_name: 0 for field_name in self._FIELD_NAMES}
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, callback):
+        """Call callback(event) on every change and return a function that
+        removes the subscription."""
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not callback]
+
+        return unsubscribe
+
+    def publish(self, halting, occurred, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        events = []
+        with self._lock:
+            subscribers = self._subscribers
+            for field_name, value in zip(self._FIELD_NAMES, (halting, occurred)):
+                previous = self._last[field_name]
+                if value == previous:
+                    continue
+                self._last[field_name] = value
+                events.append(
+                    JrkErrorEvent(
+                        timestamp,
+                        field_name,
+                        decode_error_flags(value),
+                        decode_error_flags(value & ~previous),
+                        decode_error_flags(previous & ~value),
+                    )
+                )
+        for event in events:
+            for callback in subscribers:
+                callback(event)
@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_base import LoggerProtocol
+
+
+class JrkFleet:
+    """Manages many Jrk controllers from one process.
+
+    The bus is enumerated once and every requested serial number gets its own
+    PyJrk with its own handle and command bindings. Operations on the whole
+    fleet run in parallel on a thread pool with one worker per device and
+    return their results keyed by serial number. backend and stats are passed
+    to every device PyJrk, e.g. backend=JrkEmulator.drivers.
+    """
+
+    def __init__(
+        self,
+        serial_numbers=None,
+        logger: LoggerProtocol = None,
+        max_workers=None,
+        backend=None,
+        stats=False,
+    ):
+        self._enumerator = PyJrk(logger, backend)
+        self._logger = self._enumerator._logger
+
+        connected = self._enumerator.connected_devices()
+        if serial_numbers is None:
+            serial_numbers = list(connected)
+
+        self.devices: dict[str, PyJrk] = {}
+        for serial_number in serial_numbers:
+            if serial_number not in connected:
+                self._logger.error(f"Serial number device {serial_number} not found.")
+                continue
+            jrk = PyJrk(self._logger, backend, stats)
+            if jrk.connect_to_device(connected[serial_number]):
+                self._logger.error(f"Could not open device {serial_number}.")
+                continue
+            self.devices[serial_number] = jrk
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(len(self.devices), 1),
+            thread_name_prefix="JrkFleet",
+        )
+
+    @property
+    def serial_numbers(self):
+        return list(self.devices)
+
+    def __getitem__(self, serial_number) -> PyJrk:
+        return self.devices[serial_number]
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def stats(self):
+        """Return PyJrk.stats() of every device keyed by serial number."""
+        return {
+            serial_number: jrk.stats() for serial_number, jrk in self.devices.items()
+        }
+
+    def map(self, func, serial_numbers=None):
+        """Call func(jrk) for every device in parallel and return the results
+        keyed by serial number."""
+        if serial_numbers is None:
+            serial_numbers = self.serial_numbers
+        futures = {
+            serial_number: self._executor.submit(func, self.devices[serial_number])
+            for serial_number in serial_numbers
+        }
+        return {
+            serial_number: future.result() for serial_number, future in futures.items()
+        }
+
+    def map_values(self, func, values: dict):
+        """Call func(jrk, value) for every serial number -> value item in parallel."""
+        futures = {
+            serial_number: self._executor.submit(
+                func, self.devices[serial_number], value
+            )
+            for serial_number, value in values.items()
+        }
+        return {
+            serial_number: future.result() for serial_number, future in futures.items()
+        }
+
+    # Commands
+    def set_target(self, targets: dict):
+        return self.map_values(lambda jrk, target: jrk.set_target(target), targets)
+
+    def stop_motor(self, serial_numbers=None):
+        return self.map(lambda jrk: jrk.stop_motor(), serial_numbers)
+
+    # Variables
+    def snapshots(self, serial_numbers=None):
+        """Return the variables snapshot of every device, None for the devices
+        that could not be read."""
+        return self.map(lambda jrk: jrk.variables.snapshot(), serial_numbers)
+
+    def read_partial(self, field_names, serial_numbers=None, max_gap=0):
+        return self.map(
+            lambda jrk: jrk.variables.read_partial(field_names, max_gap),
+            serial_numbers,
+        )
+
+    # Settings
+    def apply_ram_settings(self, settings: dict, per_device=False):
+        """Apply the same settings dict to the RAM settings of every device and
+        return the apply result of each, 0 on success. With per_device, settings
+        maps serial numbers to the settings dict of each device instead."""
+        return self._apply_settings_to_devices("ram_settings", settings, per_device)
+
+    def apply_eeprom_settings(self, settings: dict, per_device=False):
+        """Same as apply_ram_settings but for the EEPROM settings."""
+        return self._apply_settings_to_devices("eeprom_settings", settings, per_device)
+
+    def _apply_settings_to_devices(self, settings_name, settings: dict, per_device):
+        if not per_device:
+            settings = {serial_number: settings for serial_number in self.devices}
+        return self.map_values(
+            lambda jrk, device_settings: getattr(jrk, settings_name).update(
+                device_settings
+            ),
+            settings,
+        )
+
+    def load_config(
+        self, config_file, settings_name="ram_settings", serial_numbers=None
+    ):
+        return self.map(
+            lambda jrk: getattr(jrk, settings_name).load_config(config_file),
+            serial_numbers,
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for jrk in self.devices.values():
+            jrk.close()
+        self._enumerator.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
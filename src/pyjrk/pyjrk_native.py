@@ -0,0 +1,193 @@
+import os
+import platform
+import threading
+from ctypes import *
+from enum import IntEnum
+
+from pyjrk.pyjrk_protocol import jrk_constant
+from pyjrk.pyjrk_structures import *
+
+# Namespace of every jrk_constant, resolved once. Constants sharing a value
+# (e.g. JRK_CMD_STOP_MOTOR_SERIAL and JRK_CMD_START_BOOTLOADER) become aliases.
+JrkConstant = IntEnum("JrkConstant", jrk_constant)
+
+# Every jrk_error * is returned as a plain address so it is never truncated
+_jrk_error_p = c_void_p
+_jrk_handle_p = POINTER(jrk_handle)
+_jrk_device_p = POINTER(jrk_device)
+_jrk_settings_p = POINTER(jrk_settings)
+_jrk_variables_p = POINTER(jrk_variables)
+
+# name -> (restype, argtypes) for the jrk2 C API
+JRK_PROTOTYPES = {
+    # Errors
+    "jrk_error_free": (None, [_jrk_error_p]),
+    "jrk_error_copy": (_jrk_error_p, [_jrk_error_p]),
+    "jrk_error_has_code": (c_bool, [_jrk_error_p, c_uint32]),
+    "jrk_error_get_message": (c_char_p, [_jrk_error_p]),
+    "jrk_string_free": (None, [c_void_p]),
+    # Devices
+    "jrk_list_connected_devices": (
+        _jrk_error_p,
+        [POINTER(POINTER(_jrk_device_p)), POINTER(c_size_t)],
+    ),
+    "jrk_list_free": (None, [POINTER(_jrk_device_p)]),
+    "jrk_device_copy": (_jrk_error_p, [_jrk_device_p, POINTER(_jrk_device_p)]),
+    "jrk_device_free": (None, [_jrk_device_p]),
+    "jrk_device_get_product": (c_uint32, [_jrk_device_p]),
+    "jrk_device_get_serial_number": (c_char_p, [_jrk_device_p]),
+    "jrk_device_get_os_id": (c_char_p, [_jrk_device_p]),
+    "jrk_device_get_firmware_version": (c_uint16, [_jrk_device_p]),
+    # Handles
+    "jrk_handle_open": (_jrk_error_p, [_jrk_device_p, POINTER(_jrk_handle_p)]),
+    "jrk_handle_close": (None, [_jrk_handle_p]),
+    "jrk_handle_get_device": (_jrk_device_p, [_jrk_handle_p]),
+    "jrk_get_firmware_version_string": (c_char_p, [_jrk_handle_p]),
+    # Settings
+    "jrk_settings_create": (_jrk_error_p, [POINTER(_jrk_settings_p)]),
+    "jrk_settings_copy": (_jrk_error_p, [_jrk_settings_p, POINTER(_jrk_settings_p)]),
+    "jrk_settings_free": (None, [_jrk_settings_p]),
+    "jrk_settings_fix": (_jrk_error_p, [_jrk_settings_p, POINTER(c_char_p)]),
+    "jrk_settings_to_string": (_jrk_error_p, [_jrk_settings_p, POINTER(c_char_p)]),
+    "jrk_get_eeprom_settings": (
+        _jrk_error_p,
+        [_jrk_handle_p, POINTER(_jrk_settings_p)],
+    ),
+    "jrk_set_eeprom_settings": (_jrk_error_p, [_jrk_handle_p, _jrk_settings_p]),
+    "jrk_get_ram_settings": (_jrk_error_p, [_jrk_handle_p, POINTER(_jrk_settings_p)]),
+    "jrk_set_ram_settings": (_jrk_error_p, [_jrk_handle_p, _jrk_settings_p]),
+    "jrk_restore_defaults": (_jrk_error_p, [_jrk_handle_p]),
+    "jrk_reinitialize": (_jrk_error_p, [_jrk_handle_p]),
+    "jrk_reinitialize_and_reset_errors": (_jrk_error_p, [_jrk_handle_p]),
+    # Variables
+    "jrk_variables_copy": (
+        _jrk_error_p,
+        [_jrk_variables_p, POINTER(_jrk_variables_p)],
+    ),
+    "jrk_variables_free": (None, [_jrk_variables_p]),
+    "jrk_get_variables": (
+        _jrk_error_p,
+        [_jrk_handle_p, POINTER(_jrk_variables_p), c_uint16],
+    ),
+    # Commands
+    "jrk_set_target": (_jrk_error_p, [_jrk_handle_p, c_uint16]),
+    "jrk_stop_motor": (_jrk_error_p, [_jrk_handle_p]),
+    "jrk_force_duty_cycle_target": (_jrk_error_p, [_jrk_handle_p, c_int16]),
+    "jrk_force_duty_cycle": (_jrk_error_p, [_jrk_handle_p, c_int16]),
+    "jrk_start_bootloader": (_jrk_error_p, [_jrk_handle_p]),
+    # Low-level access to the variables and settings segments
+    "jrk_get_variable_segment": (
+        _jrk_error_p,
+        [_jrk_handle_p, c_size_t, c_size_t, c_void_p, c_uint16],
+    ),
+    "jrk_get_ram_setting_segment": (
+        _jrk_error_p,
+        [_jrk_handle_p, c_size_t, c_size_t, c_void_p],
+    ),
+    "jrk_set_ram_setting_segment": (
+        _jrk_error_p,
+        [_jrk_handle_p, c_size_t, c_size_t, c_void_p],
+    ),
+}
+
+# name -> (restype, argtypes) for the libusbp functions called directly
+LIBUSBP_PROTOTYPES = {
+    "libusbp_error_free": (None, [c_void_p]),
+    "libusbp_error_get_message": (c_char_p, [c_void_p]),
+    "libusbp_control_transfer": (
+        c_void_p,
+        [
+            c_void_p,
+            c_uint8,
+            c_uint8,
+            c_uint16,
+            c_uint16,
+            c_void_p,
+            c_uint16,
+            POINTER(c_size_t),
+        ],
+    ),
+}
+
+
+class NativeLibrary:
+    """A C library with every prototype of its prototypes table declared once.
+
+    Each declared function is stored as a plain instance attribute, so calls
+    skip the CDLL attribute lookup and ctypes converts arguments using the
+    declared argtypes instead of guessing. Functions missing from the loaded
+    library are left out; other attributes fall through to the library.
+    """
+
+    prototypes = {}
+
+    def __init__(self, library):
+        self._library = library
+        for func_name, (restype, argtypes) in self.prototypes.items():
+            try:
+                func = getattr(library, func_name)
+            except AttributeError:
+                continue
+            func.restype = restype
+            func.argtypes = argtypes
+            setattr(self, func_name, func)
+
+    def __getattr__(self, name):
+        return getattr(self._library, name)
+
+
+class JrkLibrary(NativeLibrary):
+    """The jrk2 C library with the prototypes of JRK_PROTOTYPES."""
+
+    prototypes = JRK_PROTOTYPES
+
+
+class UsbpLibrary(NativeLibrary):
+    """The libusbp C library with the prototypes of LIBUSBP_PROTOTYPES."""
+
+    prototypes = LIBUSBP_PROTOTYPES
+
+
+def resolve_constant(value):
+    """Resolve a JRK_* constant name to its value; other values pass through."""
+    if isinstance(value, str):
+        return JrkConstant[value]
+    return value
+
+
+_drivers = None
+_drivers_lock = threading.Lock()
+
+
+def _load_drivers():
+    # Driver Locations (x64)
+    file_path = os.path.dirname(os.path.abspath(__file__))
+    if platform.system() == "Windows":
+        # Windows DLL paths
+        usblib = windll.LoadLibrary(
+            file_path + "\\drivers\\x64\\libusbp-1.dll"
+        )  # type: ignore
+        jrklib = windll.LoadLibrary(
+            file_path + "\\drivers\\x64\\libpololu-jrk2-1.dll"
+        )  # type: ignore
+    elif platform.system() == "Linux":
+        # Linux shared library paths
+        usblib = CDLL(file_path + "/drivers/linux/libusbp-1.so")
+        jrklib = CDLL(file_path + "/drivers/linux/libpololu-jrk2-1.so")
+    else:
+        raise OSError(f"Unsupported platform {platform.system()}")
+    return UsbpLibrary(usblib), JrkLibrary(jrklib)
+
+
+def load_drivers():
+    """Return the (usblib, jrklib) driver handles, loading them on first use.
+
+    The libraries are loaded and their prototypes declared once per process;
+    every PyJrk shares the same handles.
+    """
+    global _drivers
+    if _drivers is None:
+        with _drivers_lock:
+            if _drivers is None:
+                _drivers = _load_drivers()
+    return _drivers
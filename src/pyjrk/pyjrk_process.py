@@ -0,0 +1,293 @@
+import logging
+import multiprocessing
+import threading
+import time
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_base import LoggerProtocol
+from pyjrk.pyjrk_shm import (
+    JrkSharedState,
+    JrkSharedVariables,
+    SharedSeqlock,
+    publish_error,
+    publish_variables,
+)
+from pyjrk.pyjrk_structures import JrkVariablesSnapshot
+
+
+class JrkWorkerError(Exception):
+    """A call could not be performed by a device worker process."""
+
+
+def _resolve(jrk, path):
+    target = jrk
+    for name in path.split("."):
+        target = getattr(target, name)
+    return target
+
+
+def _handle_request(jrk, request):
+    op, path, args = request
+    try:
+        if op == "call":
+            return ("ok", _resolve(jrk, path)(*args))
+        if op == "get":
+            value = _resolve(jrk, path)
+            # Bound methods can not be pickled, so only their kind is sent
+            return ("callable", None) if callable(value) else ("ok", value)
+        if op == "set":
+            owner, _, name = path.rpartition(".")
+            setattr(_resolve(jrk, owner) if owner else jrk, name, args[0])
+            return ("ok", None)
+        return ("error", f"Unknown operation {op}")
+    except Exception as e:
+        return ("error", f"{type(e).__name__}: {e}")
+
+
+def _worker_main(serial_number, shm_name, conn, rate_hz, backend_factory, log_level):
+    """Entry point of a device worker process.
+
+    Owns the device handle, publishes every variables read into the shared
+    state and serves the requests of the proxy between reads.
+    """
+    logging.basicConfig(
+        level=log_level,
+        format="%(asctime)s - %(name)s - %(processName)s - %(levelname)s - %(message)s",
+    )
+    jrk = PyJrk(
+        logging.getLogger("PyJrk"), backend_factory() if backend_factory else None
+    )
+    if jrk.connect_to_serial_number(serial_number):
+        conn.send(("error", f"Could not open device {serial_number}."))
+        return
+    shared = SharedSeqlock(JrkSharedState, shm_name)
+    variables = jrk.variables
+
+    def sample():
+        e = variables._update_jrk_variables()
+        timestamp = time.monotonic()
+        if e:
+            publish_error(shared)
+        else:
+            publish_variables(shared, variables._jrk_variables, timestamp)
+        return timestamp
+
+    # Published before the reply, so a started device always has a sample
+    sample()
+    conn.send(("ok", None))
+
+    period = 1.0 / rate_hz if rate_hz else 0.0
+    next_deadline = time.monotonic()
+    try:
+        while True:
+            timeout = next_deadline - time.monotonic()
+            if conn.poll(timeout if timeout > 0 else 0):
+                request = conn.recv()
+                if request is None:
+                    break
+                reply = _handle_request(jrk, request)
+                try:
+                    conn.send(reply)
+                except OSError:
+                    raise
+                except Exception as e:
+                    # The value could not be pickled, e.g. a context manager
+                    conn.send(("error", f"Could not send the result: {e!r}"))
+                continue
+
+            timestamp = sample()
+            next_deadline += period
+            if timestamp > next_deadline:
+                next_deadline = timestamp
+    except (EOFError, OSError, KeyboardInterrupt):
+        # The parent went away
+        pass
+    finally:
+        jrk.close()
+        shared.close()
+
+
+class _RemoteAttribute:
+    """Forwards attribute reads, writes and method calls under a path of the
+    worker's PyJrk, e.g. ram_settings."""
+
+    def __init__(self, proxy, path):
+        object.__setattr__(self, "_proxy", proxy)
+        object.__setattr__(self, "_path", path)
+
+    def __getattr__(self, name):
+        path = f"{self._path}.{name}"
+        status, value = self._proxy._send("get", path)
+        if status == "callable":
+            return lambda *args: self._proxy._request("call", path, args)
+        return value
+
+    def __setattr__(self, name, value):
+        self._proxy._request("set", f"{self._path}.{name}", (value,))
+
+
+class JrkProcessProxy:
+    """PyJrk interface of a device owned by a worker process.
+
+    Commands and settings are forwarded over a pipe and return what the
+    worker's PyJrk returns; variables are read from shared memory.
+    """
+
+    def __init__(self, serial_number, process, conn, shared: SharedSeqlock):
+        self.serial_number = serial_number
+        self._process = process
+        self._conn = conn
+        self._shared = shared
+        self._lock = threading.Lock()
+        self.variables = JrkSharedVariables(shared)
+        self.ram_settings = _RemoteAttribute(self, "ram_settings")
+        self.eeprom_settings = _RemoteAttribute(self, "eeprom_settings")
+
+    def _send(self, op, path, args=()):
+        """Send a request and return the (status, value) reply of the worker.
+        Raises JrkWorkerError if the request failed."""
+        with self._lock:
+            try:
+                self._conn.send((op, path, args))
+                status, value = self._conn.recv()
+            except (EOFError, OSError) as e:
+                raise JrkWorkerError(f"Worker of {self.serial_number} is gone: {e}")
+        if status == "error":
+            raise JrkWorkerError(value)
+        return status, value
+
+    def _request(self, op, path, args=()):
+        return self._send(op, path, args)[1]
+
+    # Commands
+    def set_target(self, target):
+        return self._request("call", "set_target", (target,))
+
+    def stop_motor(self):
+        return self._request("call", "stop_motor")
+
+    def force_duty_cycle_target(self, duty_cycle):
+        return self._request("call", "force_duty_cycle_target", (duty_cycle,))
+
+    def force_duty_cycle(self, duty_cycle):
+        return self._request("call", "force_duty_cycle", (duty_cycle,))
+
+    def reinitialize(self, flags):
+        return self._request("call", "reinitialize", (flags,))
+
+    def exchange(self, target) -> JrkVariablesSnapshot:
+        return self._request("call", "exchange", (target,))
+
+    def stats(self):
+        return self._request("call", "stats")
+
+    def close(self):
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+        self._conn.close()
+        self._shared.close()
+
+
+class JrkProcessPool:
+    """Runs every device in its own worker process.
+
+    Each worker owns its device handle, reads the variables at rate_hz (as
+    fast as possible when 0) and publishes them in shared memory, so sampling
+    many devices scales with the number of cores instead of contending for
+    the GIL. devices maps serial numbers to JrkProcessProxy objects.
+
+    Workers are started with the spawn method so no USB state is inherited.
+    backend_factory, if given, is called in each worker to build its driver
+    handles and must be picklable, e.g. partial(emulated_backend, "1234").
+    """
+
+    def __init__(
+        self,
+        serial_numbers=None,
+        rate_hz=1000.0,
+        logger: LoggerProtocol = None,
+        backend_factory=None,
+        log_level=logging.WARNING,
+        start_method="spawn",
+    ):
+        if serial_numbers is None:
+            enumerator = PyJrk(logger, backend_factory() if backend_factory else None)
+            serial_numbers = enumerator.list_connected_device_serial_numbers()
+            enumerator.close()
+        self._logger = logger if logger else logging.getLogger("PyJrk")
+        context = multiprocessing.get_context(start_method)
+
+        self.devices: dict[str, JrkProcessProxy] = {}
+        starting = []
+        for serial_number in serial_numbers:
+            shared = SharedSeqlock(JrkSharedState)
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(
+                    serial_number,
+                    shared.name,
+                    child_conn,
+                    rate_hz,
+                    backend_factory,
+                    log_level,
+                ),
+                name=f"JrkWorker-{serial_number}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            starting.append(
+                JrkProcessProxy(serial_number, process, parent_conn, shared)
+            )
+
+        for proxy in starting:
+            try:
+                status, message = proxy._conn.recv()
+            except EOFError:
+                status, message = "error", "Worker exited during startup."
+            if status != "ok":
+                self._logger.error(f"{proxy.serial_number}: {message}")
+                proxy.close()
+                continue
+            self.devices[proxy.serial_number] = proxy
+
+    @property
+    def serial_numbers(self):
+        return list(self.devices)
+
+    def __getitem__(self, serial_number) -> JrkProcessProxy:
+        return self.devices[serial_number]
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def snapshots(self):
+        """Return the latest variables snapshot of every device keyed by
+        serial number, None for the devices with no sample published yet."""
+        return {
+            serial_number: proxy.variables.snapshot()
+            for serial_number, proxy in self.devices.items()
+        }
+
+    def close(self):
+        for proxy in self.devices.values():
+            proxy.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
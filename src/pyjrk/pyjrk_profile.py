@@ -0,0 +1,168 @@
+import hashlib
+import os
+import threading
+from ctypes import byref, memmove, sizeof
+
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+from pyjrk.pyjrk_structures import jrk_settings
+
+_PROFILE_MAGIC = b"PYJRKPRF"
+_PROFILE_VERSION = 1
+_SETTINGS_SIZE = sizeof(jrk_settings)
+
+
+def _field_mask(field_names):
+    mask = bytearray(_SETTINGS_SIZE)
+    for field_name in field_names:
+        field = getattr(jrk_settings, field_name)
+        mask[field.offset : field.offset + field.size] = b"\xff" * field.size
+    return bytes(mask)
+
+
+# Mask of a profile setting every field; only padding bytes are left out
+_FULL_MASK = _field_mask(field_name for field_name, _ in jrk_settings._fields_)
+
+# Directory of the compiled profiles, keyed by the hash of the YAML file
+DEFAULT_PROFILE_CACHE_DIR = os.environ.get(
+    "PYJRK_PROFILE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "pyjrk", "profiles"),
+)
+
+
+class JrkProfile:
+    """A configuration file compiled into a packed jrk_settings image.
+
+    image holds the settings of the file at their jrk_settings offsets and
+    mask has 0xFF on every byte covered by one of those settings, so applying
+    the profile only overwrites the settings the file mentions. digest
+    identifies the compiled content and is used to skip profiles that are
+    already applied.
+    """
+
+    def __init__(self, image: bytes, mask: bytes):
+        self.image = image
+        self.mask = mask
+        self.digest = hashlib.sha256(image + mask).hexdigest()
+        self._full = mask == _FULL_MASK
+        self._image_int = int.from_bytes(image, "little")
+        self._keep_int = ~int.from_bytes(mask, "little") & (
+            (1 << (8 * _SETTINGS_SIZE)) - 1
+        )
+
+    def apply_to(self, settings: jrk_settings):
+        """Overlay the profile on a jrk_settings structure."""
+        if self._full:
+            memmove(byref(settings), self.image, _SETTINGS_SIZE)
+            return
+        current = int.from_bytes(bytes(settings), "little")
+        merged = (current & self._keep_int) | self._image_int
+        memmove(
+            byref(settings), merged.to_bytes(_SETTINGS_SIZE, "little"), _SETTINGS_SIZE
+        )
+
+    def to_bytes(self):
+        return (
+            _PROFILE_MAGIC
+            + _PROFILE_VERSION.to_bytes(4, "little")
+            + self.image
+            + self.mask
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        header_size = len(_PROFILE_MAGIC) + 4
+        if (
+            len(data) != header_size + 2 * _SETTINGS_SIZE
+            or not data.startswith(_PROFILE_MAGIC)
+            or int.from_bytes(data[len(_PROFILE_MAGIC) : header_size], "little")
+            != _PROFILE_VERSION
+        ):
+            return None
+        image = data[header_size : header_size + _SETTINGS_SIZE]
+        mask = data[header_size + _SETTINGS_SIZE :]
+        return cls(image, mask)
+
+
+def compile_profile(config_source) -> JrkProfile:
+    """Compile the jrk_settings section of a YAML configuration into a
+    JrkProfile. config_source is the YAML text or bytes."""
+    import yaml
+
+    cfg_settings = yaml.safe_load(config_source)["jrk_settings"]
+
+    settings = jrk_settings()
+    field_names = []
+    for field_name, _ in jrk_settings._fields_:
+        if field_name not in cfg_settings:
+            continue
+        value = cfg_settings[field_name]
+        if "JRK" in str(value):
+            value = jc[value]
+        setattr(settings, field_name, value)
+        field_names.append(field_name)
+    return JrkProfile(bytes(settings), _field_mask(field_names))
+
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+
+def load_profile(config_file, cache_dir=DEFAULT_PROFILE_CACHE_DIR) -> JrkProfile:
+    """Return the compiled profile of a YAML configuration file.
+
+    Profiles are cached in memory, keyed by the path and modification time of
+    the file, and on disk in cache_dir, keyed by the hash of the file content,
+    so YAML is only parsed for files that were never compiled before. Pass
+    cache_dir=None to keep the cache in memory only.
+    """
+    path = os.path.abspath(config_file)
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _profiles_lock:
+        cached = _profiles.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path, "rb") as config:
+        source = config.read()
+    source_hash = hashlib.sha256(source).hexdigest()
+
+    profile = None
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, source_hash + ".jrkprofile")
+        try:
+            with open(cache_file, "rb") as compiled:
+                profile = JrkProfile.from_bytes(compiled.read())
+        except OSError:
+            pass
+
+    if profile is None:
+        profile = compile_profile(source)
+        if cache_file is not None:
+            _write_cache_file(cache_file, profile)
+
+    with _profiles_lock:
+        _profiles[path] = (key, profile)
+    return profile
+
+
+def _write_cache_file(cache_file, profile: JrkProfile):
+    # Written to a temporary file first so readers never see a partial profile
+    temp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_file, "wb") as compiled:
+            compiled.write(profile.to_bytes())
+        os.replace(temp_file, cache_file)
+    except OSError:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+
+
+def clear_profile_cache():
+    """Forget the profiles compiled in this process."""
+    with _profiles_lock:
+        _profiles.clear()
@@ -0,0 +1,179 @@
+import operator
+import threading
+import time
+from collections import deque
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_native import resolve_constant
+
+# Commands setting what the motor does; a newer one replaces any pending one
+MOTION_COMMANDS = ("set_target", "force_duty_cycle_target", "force_duty_cycle")
+# Commands that are always sent, in order, ahead of any motion command
+SAFETY_COMMANDS = ("stop_motor", "reinitialize")
+
+
+class JrkCommandQueue:
+    """Non-blocking, coalescing command queue for one device.
+
+    Commands return immediately and a worker thread sends them. The motion
+    commands share a single last-write-wins slot, so when they arrive faster
+    than the device takes them only the newest is sent. stop_motor and
+    reinitialize are never coalesced and are sent before any pending motion
+    command; a motion command queued before stop_motor is dropped so it can
+    not restart the motor.
+
+    Values are converted when a command is queued, so an unknown JRK_*
+    constant name raises KeyError and a non-integer raises TypeError in the
+    caller. Commands return 0 once queued, and 1 without queueing anything
+    after close(). A command failing in the worker is counted in error_count
+    and logged; the worker carries on with the next one.
+    """
+
+    def __init__(self, jrk: PyJrk):
+        self._jrk = jrk
+        self._logger = jrk._logger
+        self._condition = threading.Condition()
+        # (command name, value, enqueue time)
+        self._safety = deque()
+        self._motion = None
+        self._busy = False
+        self._closed = False
+
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.error_count = 0
+        # Time from enqueue to the end of the transfer, in seconds
+        self.last_send_latency = None
+        self.max_send_latency = 0.0
+        self._total_send_latency = 0.0
+
+        self._thread = threading.Thread(
+            target=self._run, name="JrkCommandQueue", daemon=True
+        )
+        self._thread.start()
+
+    @staticmethod
+    def _convert(value):
+        return operator.index(resolve_constant(value))
+
+    def _put_motion(self, command_name, value):
+        value = self._convert(value)
+        with self._condition:
+            if self._closed:
+                self._logger.error(f"Command queue is closed, {command_name} dropped.")
+                return 1
+            if self._motion is not None:
+                self.coalesced_count += 1
+            self._motion = (command_name, value, time.perf_counter())
+            self._condition.notify()
+        return 0
+
+    def _put_safety(self, command_name, value=None):
+        with self._condition:
+            if self._closed:
+                self._logger.error(f"Command queue is closed, {command_name} dropped.")
+                return 1
+            if command_name == "stop_motor" and self._motion is not None:
+                self._motion = None
+                self.coalesced_count += 1
+            self._safety.append((command_name, value, time.perf_counter()))
+            self._condition.notify()
+        return 0
+
+    # Commands
+    def set_target(self, target):
+        return self._put_motion("set_target", target)
+
+    def force_duty_cycle_target(self, duty_cycle):
+        return self._put_motion("force_duty_cycle_target", duty_cycle)
+
+    def force_duty_cycle(self, duty_cycle):
+        return self._put_motion("force_duty_cycle", duty_cycle)
+
+    def stop_motor(self):
+        return self._put_safety("stop_motor")
+
+    def reinitialize(self, flags):
+        return self._put_safety("reinitialize", self._convert(flags))
+
+    @property
+    def depth(self):
+        """Number of commands waiting to be sent."""
+        with self._condition:
+            return len(self._safety) + (self._motion is not None)
+
+    def metrics(self):
+        with self._condition:
+            return {
+                "depth": len(self._safety) + (self._motion is not None),
+                "sent": self.sent_count,
+                "coalesced": self.coalesced_count,
+                "errors": self.error_count,
+                "last_send_latency": self.last_send_latency,
+                "mean_send_latency": (
+                    self._total_send_latency / self.sent_count
+                    if self.sent_count
+                    else None
+                ),
+                "max_send_latency": self.max_send_latency,
+            }
+
+    def flush(self, timeout=None):
+        """Wait until every queued command is sent. Returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._safety and self._motion is None and not self._busy,
+                timeout,
+            )
+
+    def _run(self):
+        jrk = self._jrk
+        condition = self._condition
+        while True:
+            with condition:
+                condition.wait_for(
+                    lambda: self._safety or self._motion is not None or self._closed
+                )
+                if self._safety:
+                    command_name, value, enqueue_time = self._safety.popleft()
+                elif self._motion is not None:
+                    command_name, value, enqueue_time = self._motion
+                    self._motion = None
+                else:
+                    # Closed with nothing left to send
+                    return
+                self._busy = True
+
+            try:
+                command = getattr(jrk, command_name)
+                e = command() if value is None else command(value)
+            except Exception as exc:
+                self._logger.error(f"Command queue: {command_name} failed: {exc!r}")
+                e = 1
+            latency = time.perf_counter() - enqueue_time
+
+            with condition:
+                self._busy = False
+                self.sent_count += 1
+                if e:
+                    self.error_count += 1
+                self.last_send_latency = latency
+                self._total_send_latency += latency
+                if latency > self.max_send_latency:
+                    self.max_send_latency = latency
+                condition.notify_all()
+
+    def close(self):
+        """Send the pending commands and stop the worker thread. Commands
+        queued afterwards are refused."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._logger.debug("Command queue closed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
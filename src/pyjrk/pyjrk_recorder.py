@@ -0,0 +1,287 @@
+import json
+import mmap
+import os
+import re
+import struct
+import time
+from contextlib import nullcontext
+from ctypes import Structure, addressof, c_char, memmove, sizeof
+
+import numpy as np
+
+from pyjrk.pyjrk import PyJrkVariables
+from pyjrk.pyjrk_structures import jrk_variables
+
+# File layout
+#   fixed header: magic, version, header size, record size, record count
+#   JSON layout description, zero padded up to header size
+#   records: float64 host monotonic timestamp + raw jrk_variables block
+RECORDING_MAGIC = b"PYJRKREC"
+RECORDING_VERSION = 1
+RECORDING_EXTENSION = ".jrkrec"
+_FIXED_HEADER = struct.Struct("<8sIIIQ")
+_RECORD_COUNT_OFFSET = 20
+_TIMESTAMP = struct.Struct("<d")
+_HEADER_ALIGNMENT = 64
+
+
+def _describe_structure(structure: type[Structure]):
+    """Describe the fields of a ctypes structure from pyjrk_structures as JSON
+    friendly dicts with the byte offset and struct format of every field."""
+    fields = []
+    for field_name, field_type in structure._fields_:
+        descriptor = getattr(structure, field_name)
+        field = {"name": field_name, "offset": descriptor.offset}
+        if hasattr(field_type, "_length_"):
+            field["count"] = field_type._length_
+            field["fields"] = _describe_structure(field_type._type_)
+            field["size"] = sizeof(field_type._type_)
+        else:
+            field["format"] = "<" + field_type._type_
+        fields.append(field)
+    return fields
+
+
+def _layout_to_dtype(fields, itemsize, base_offset=0):
+    names, formats, offsets = [], [], []
+    for field in fields:
+        names.append(field["name"])
+        offsets.append(base_offset + field["offset"])
+        if "fields" in field:
+            element = _layout_to_dtype(field["fields"], field["size"])
+            formats.append((element, (field["count"],)))
+        else:
+            formats.append(field["format"])
+    return np.dtype(
+        {"names": names, "formats": formats, "offsets": offsets, "itemsize": itemsize}
+    )
+
+
+def _build_header():
+    layout = {
+        "structure": jrk_variables.__name__,
+        "timestamp": {"offset": 0, "format": _TIMESTAMP.format},
+        "variables_offset": _TIMESTAMP.size,
+        "variables_size": sizeof(jrk_variables),
+        "fields": _describe_structure(jrk_variables),
+    }
+    layout_bytes = json.dumps(layout).encode("utf-8")
+    header_size = _FIXED_HEADER.size + 4 + len(layout_bytes)
+    header_size += -header_size % _HEADER_ALIGNMENT
+    record_size = _TIMESTAMP.size + sizeof(jrk_variables)
+    header = bytearray(header_size)
+    _FIXED_HEADER.pack_into(
+        header, 0, RECORDING_MAGIC, RECORDING_VERSION, header_size, record_size, 0
+    )
+    struct.pack_into("<I", header, _FIXED_HEADER.size, len(layout_bytes))
+    header[_FIXED_HEADER.size + 4 : _FIXED_HEADER.size + 4 + len(layout_bytes)] = (
+        layout_bytes
+    )
+    return bytes(header), record_size
+
+
+class PyJrkRecorder:
+    """Streams raw jrk_variables blocks and timestamps to memory mapped files.
+
+    Files grow in chunks of chunk_size bytes and a new file is started once
+    max_file_size would be exceeded. Files are named
+    <prefix>_<index><RECORDING_EXTENSION> inside directory. Every record is
+    copied straight from the ctypes structure; no field is decoded in Python.
+    Numbering continues after the recordings already in directory, which are
+    never overwritten.
+    """
+
+    def __init__(
+        self,
+        directory,
+        prefix="jrk",
+        max_file_size=1 << 30,
+        chunk_size=16 << 20,
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self._header, self.record_size = _build_header()
+        self.max_file_size = max_file_size
+        self.chunk_size = max(chunk_size, self.record_size)
+        if max_file_size < len(self._header) + self.record_size:
+            raise ValueError("max_file_size can not hold a single record")
+
+        self.file_index = _last_file_index(directory, prefix)
+        self.path = None
+        self._file = None
+        self._mmap = None
+        self._view = None
+        self._address = 0
+        self._capacity = 0
+        self._write_offset = 0
+        self.record_count = 0
+        self.total_record_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._open_next_file()
+
+    def _open_next_file(self):
+        self._close_file()
+        while True:
+            self.file_index += 1
+            self.path = os.path.join(
+                self.directory,
+                f"{self.prefix}_{self.file_index:04d}{RECORDING_EXTENSION}",
+            )
+            try:
+                self._file = open(self.path, "x+b")
+                break
+            except FileExistsError:
+                # Created by another recorder since the directory was listed
+                continue
+        self._file.write(self._header)
+        self._file.flush()
+        self._write_offset = len(self._header)
+        self.record_count = 0
+        self._map(len(self._header) + self.chunk_size)
+
+    def _map(self, size):
+        size = min(size, self.max_file_size)
+        self._unmap()
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._view = (c_char * size).from_buffer(self._mmap)
+        self._address = addressof(self._view)
+        self._capacity = size
+
+    def _unmap(self):
+        if self._mmap is not None:
+            # The ctypes view exports the mmap buffer and must go first
+            self._view = None
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._unmap()
+        self._file.truncate(self._write_offset)
+        self._file.close()
+        self._file = None
+
+    def record(self, variables: jrk_variables, timestamp=None):
+        """Append one jrk_variables block. The timestamp defaults to the current
+        host monotonic time."""
+        if self._write_offset + self.record_size > self._capacity:
+            if self._write_offset + self.record_size > self.max_file_size:
+                self._open_next_file()
+            else:
+                self._map(self._capacity + self.chunk_size)
+
+        if timestamp is None:
+            timestamp = time.monotonic()
+        _TIMESTAMP.pack_into(self._mmap, self._write_offset, timestamp)
+        memmove(
+            self._address + self._write_offset + _TIMESTAMP.size,
+            addressof(variables),
+            sizeof(jrk_variables),
+        )
+        self._write_offset += self.record_size
+        self.record_count += 1
+        self.total_record_count += 1
+        struct.pack_into("<Q", self._mmap, _RECORD_COUNT_OFFSET, self.record_count)
+
+    def record_variables(self, variables: PyJrkVariables):
+        """Read the variables with one transfer and append them. The read is
+        shared with the error flag subscribers and state publisher of
+        variables, like any other full read."""
+        with variables._handle_lock or nullcontext():
+            e = variables._read_jrk_variables()
+            if not e:
+                self.record(variables._jrk_variables)
+        return e
+
+    def flush(self):
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def close(self):
+        self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_recording_dtype(path):
+    """Return the structured dtype, header size and record count of a recording."""
+    with open(path, "rb") as f:
+        fixed = f.read(_FIXED_HEADER.size + 4)
+        magic, version, header_size, record_size, record_count = (
+            _FIXED_HEADER.unpack_from(fixed)
+        )
+        if magic != RECORDING_MAGIC:
+            raise ValueError(f"{path} is not a pyjrk recording")
+        if version != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version {version}")
+        (layout_size,) = struct.unpack_from("<I", fixed, _FIXED_HEADER.size)
+        layout = json.loads(f.read(layout_size).decode("utf-8"))
+
+    variables_dtype = _layout_to_dtype(
+        layout["fields"], record_size, layout["variables_offset"]
+    )
+    names = ["timestamp"] + list(variables_dtype.names)
+    formats = [layout["timestamp"]["format"]] + [
+        variables_dtype.fields[name][0] for name in variables_dtype.names
+    ]
+    offsets = [layout["timestamp"]["offset"]] + [
+        variables_dtype.fields[name][1] for name in variables_dtype.names
+    ]
+    dtype = np.dtype(
+        {
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": record_size,
+        }
+    )
+    # A recording that was not closed cleanly still holds its preallocated chunk
+    data_records = (os.path.getsize(path) - header_size) // record_size
+    return dtype, header_size, min(record_count, data_records)
+
+
+def read_recording(path):
+    """Open a recording as a read-only np.memmap structured array."""
+    dtype, header_size, record_count = read_recording_dtype(path)
+    if record_count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(
+        path, dtype=dtype, mode="r", offset=header_size, shape=(record_count,)
+    )
+
+
+def list_recordings(directory, prefix="jrk"):
+    """Return the recording files of a recorder in the order they were written."""
+    return [path for _, path in _indexed_recordings(directory, prefix)]
+
+
+def _indexed_recordings(directory, prefix="jrk"):
+    """Return (file index, path) of the recordings of prefix in directory,
+    sorted by index."""
+    pattern = re.compile(
+        rf"^{re.escape(prefix)}_(\d+){re.escape(RECORDING_EXTENSION)}$"
+    )
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    recordings = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            recordings.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(recordings)
+
+
+def _last_file_index(directory, prefix="jrk"):
+    """Return the highest file index of the recordings in directory, or -1."""
+    recordings = _indexed_recordings(directory, prefix)
+    return recordings[-1][0] if recordings else -1
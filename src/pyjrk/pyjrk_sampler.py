@@ -0,0 +1,149 @@
+import threading
+import time
+from contextlib import nullcontext
+from ctypes import addressof, memmove, sizeof
+
+import numpy as np
+
+from pyjrk.pyjrk import PyJrkVariables
+from pyjrk.pyjrk_structures import jrk_variables
+
+
+def _build_sample_dtype():
+    """Structured dtype of one sample: a host monotonic timestamp followed by the
+    jrk_variables block with the exact layout of its ctypes structure."""
+    variables_dtype = np.dtype(jrk_variables)
+    timestamp_size = np.dtype(np.float64).itemsize
+    names = ["timestamp"]
+    formats = [np.float64]
+    offsets = [0]
+    for field_name, (field_dtype, field_offset) in variables_dtype.fields.items():
+        names.append(field_name)
+        formats.append(field_dtype)
+        offsets.append(timestamp_size + field_offset)
+    return np.dtype(
+        {
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": timestamp_size + variables_dtype.itemsize,
+        }
+    )
+
+
+JRK_SAMPLE_DTYPE = _build_sample_dtype()
+JRK_SAMPLE_VARIABLES_OFFSET = JRK_SAMPLE_DTYPE.fields["input"][1]
+
+
+class PyJrkSampler:
+    """Samples the jrk variables at a fixed rate on a background thread.
+
+    Every sample is copied straight from the jrk_variables structure into a
+    preallocated NumPy ring buffer with dtype JRK_SAMPLE_DTYPE. Each sample is
+    stored twice, capacity slots apart, so the latest N samples are always a
+    contiguous slice that can be returned as a view without copying.
+    """
+
+    def __init__(
+        self, variables: PyJrkVariables, rate_hz: float, capacity=4096, recorder=None
+    ):
+        self._variables = variables
+        # Optional PyJrkRecorder that receives every sample
+        self.recorder = recorder
+        self._logger = variables._logger
+        self.period = 1.0 / rate_hz
+        self.capacity = capacity
+
+        self._ring = np.zeros(2 * capacity, dtype=JRK_SAMPLE_DTYPE)
+        self._ring_address = self._ring.ctypes.data
+        self._sample_size = JRK_SAMPLE_DTYPE.itemsize
+        self._timestamps = self._ring["timestamp"]
+
+        self.sample_count = 0
+        self.error_count = 0
+        # Deadlines skipped entirely because the sampler fell behind
+        self.missed_deadlines = 0
+        # Samples whose transfer took longer than one period
+        self.overruns = 0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="PyJrkSampler", daemon=True
+        )
+        self._thread.start()
+        self._logger.debug(f"Sampler started at {1.0 / self.period:g} Hz")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._logger.debug("Sampler stopped")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        period = self.period
+        variables = self._variables
+        variables_size = sizeof(jrk_variables)
+        next_deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            delay = next_deadline - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+
+            start = time.monotonic()
+            # Copied under the handle lock, so a read on another thread can
+            # not overwrite the variables halfway through the copy
+            with variables._handle_lock or nullcontext():
+                e = variables._read_jrk_variables(start)
+                if not e:
+                    timestamp = time.monotonic()
+                    slot = self.sample_count % self.capacity
+                    for index in (slot, slot + self.capacity):
+                        record_address = self._ring_address + index * self._sample_size
+                        memmove(
+                            record_address + JRK_SAMPLE_VARIABLES_OFFSET,
+                            addressof(variables._jrk_variables),
+                            variables_size,
+                        )
+                        self._timestamps[index] = timestamp
+                    if self.recorder is not None:
+                        self.recorder.record(variables._jrk_variables, timestamp)
+            if e:
+                self.error_count += 1
+            else:
+                self.sample_count += 1
+            end = time.monotonic()
+
+            if end - start > period:
+                self.overruns += 1
+            next_deadline += period
+            if end > next_deadline:
+                skipped = int((end - next_deadline) // period) + 1
+                self.missed_deadlines += skipped
+                next_deadline += skipped * period
+
+    def latest(self, n=None):
+        """Return a view of the latest n samples, oldest first.
+
+        The view is not copied, so it is overwritten once the sampler wraps
+        around the ring buffer. Copy it if it has to outlive capacity samples.
+        """
+        available = min(self.sample_count, self.capacity)
+        n = available if n is None else min(n, available)
+        if n == 0:
+            return self._ring[:0]
+        end = (self.sample_count - 1) % self.capacity + self.capacity + 1
+        return self._ring[end - n : end]
@@ -0,0 +1,588 @@
+import logging
+import os
+import select
+import struct
+import termios
+import threading
+import time
+import tty
+from contextlib import contextmanager
+from ctypes import addressof, memmove
+from functools import wraps
+
+from pyjrk.pyjrk import PyJrkVariables
+from pyjrk.pyjrk_base import LoggerProtocol
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+from pyjrk.pyjrk_structures import (
+    JrkVariablesSnapshot,
+    jrk_variables_from_buffer,
+    jrk_variables_layout,
+    jrk_variables_to_snapshot,
+)
+
+CRC7_POLYNOMIAL = 0x91
+POLOLU_PROTOCOL_START = 0xAA
+# Longest block a single serial Get variables command returns
+MAX_VARIABLES_READ = 15
+
+
+def crc7(data) -> int:
+    """CRC-7 of a serial packet as computed by the Jrk G2."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 1:
+                crc ^= CRC7_POLYNOMIAL
+            crc >>= 1
+    return crc
+
+
+def _encode_14bit(value):
+    """Low 7 bits, then the next 7 bits, of a (two's complement) 14-bit value."""
+    return bytes((value & 0x7F, (value >> 7) & 0x7F))
+
+
+def _decode_14bit(data, signed=False):
+    value = data[0] | (data[1] << 7)
+    if signed and value & 0x2000:
+        value -= 0x4000
+    return value
+
+
+class JrkSerialError(Exception):
+    """A serial transfer failed, e.g. a reply timed out or had a bad CRC."""
+
+
+class JrkSerialBus:
+    """A UART shared by one or more Jrk G2 controllers.
+
+    Packets are written without waiting for the controllers, so commands are
+    pipelined; inside pipeline() they are gathered into a single write.
+    Replies are read in the order their queries were sent. A packet uses the
+    compact protocol when device_number is None and the Pololu protocol
+    otherwise, which lets daisy-chained controllers share the line. crc must
+    match the serial_enable_crc setting of the controllers: it appends a CRC7
+    byte to every packet and expects one after every reply.
+
+    port is a device path or an already open file descriptor.
+    """
+
+    def __init__(
+        self,
+        port,
+        baud_rate=9600,
+        crc=False,
+        enable_14bit_device_number=False,
+        timeout=0.1,
+    ):
+        if isinstance(port, int):
+            self._fd = port
+            self._owns_fd = False
+        else:
+            self._fd = os.open(port, os.O_RDWR | os.O_NOCTTY)
+            self._owns_fd = True
+        self.crc = crc
+        self.enable_14bit_device_number = enable_14bit_device_number
+        self.timeout = timeout
+
+        self._lock = threading.RLock()
+        # Bytes gathered by pipeline(), written when it exits
+        self._pending = None
+        self._configure(baud_rate)
+
+    def _configure(self, baud_rate):
+        if not os.isatty(self._fd):
+            return
+        speed = getattr(termios, f"B{baud_rate}", None)
+        if speed is None:
+            raise ValueError(f"Unsupported baud rate {baud_rate}")
+        tty.setraw(self._fd)
+        attrs = termios.tcgetattr(self._fd)
+        attrs[4] = attrs[5] = speed
+        attrs[6][termios.VMIN] = 0
+        attrs[6][termios.VTIME] = 0
+        termios.tcsetattr(self._fd, termios.TCSANOW, attrs)
+        termios.tcflush(self._fd, termios.TCIOFLUSH)
+
+    def fileno(self):
+        return self._fd
+
+    def close(self):
+        if self._owns_fd and self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def packet(self, device_number, command, data=b""):
+        """Encode a command for one controller, or for every controller on the
+        line with the compact protocol if device_number is None."""
+        if device_number is None:
+            packet = bytearray((command,))
+        else:
+            packet = bytearray((POLOLU_PROTOCOL_START, device_number & 0x7F))
+            if self.enable_14bit_device_number:
+                packet.append((device_number >> 7) & 0x7F)
+            packet.append(command & 0x7F)
+        packet += data
+        if self.crc:
+            packet.append(crc7(packet))
+        return bytes(packet)
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view) :]
+
+    def _read(self, length):
+        deadline = time.monotonic() + self.timeout
+        data = bytearray()
+        while len(data) < length:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self._fd], [], [], remaining)[0]:
+                raise JrkSerialError(
+                    f"Timed out waiting for a reply, got {len(data)} of {length} bytes"
+                )
+            data += os.read(self._fd, length - len(data))
+        return data
+
+    def _discard_input(self):
+        # Drop late or partial replies so the next query starts in sync
+        if os.isatty(self._fd):
+            termios.tcflush(self._fd, termios.TCIFLUSH)
+
+    def send(self, packet):
+        """Send a command without waiting for the controller."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending += packet
+            else:
+                self._write(packet)
+
+    @contextmanager
+    def pipeline(self):
+        """Gather the commands sent inside the block into a single write.
+
+        Queries inside the block are written together with the commands
+        gathered before them. Other threads wait for the block to finish.
+        """
+        with self._lock:
+            if self._pending is not None:
+                yield self
+                return
+            self._pending = bytearray()
+            try:
+                yield self
+            finally:
+                pending, self._pending = self._pending, None
+                if pending:
+                    self._write(pending)
+
+    def query_many(self, queries):
+        """Send (packet, reply_length) queries with a single write and return
+        their replies in order.
+
+        Only the addressed controller replies to a query, but the replies of
+        controllers sharing one TX line may collide, so pipelined queries
+        should address a single controller.
+        """
+        reply_extra = 1 if self.crc else 0
+        with self._lock:
+            data = bytearray()
+            if self._pending:
+                data += self._pending
+                self._pending.clear()
+            for packet, _ in queries:
+                data += packet
+            self._write(data)
+
+            replies = []
+            try:
+                for _, length in queries:
+                    reply = self._read(length + reply_extra)
+                    if self.crc:
+                        if crc7(reply[:-1]) != reply[-1]:
+                            raise JrkSerialError("CRC mismatch in reply")
+                        del reply[-1]
+                    replies.append(bytes(reply))
+            except JrkSerialError:
+                self._discard_input()
+                raise
+            return replies
+
+    def query(self, packet, reply_length):
+        return self.query_many(((packet, reply_length),))[0]
+
+
+def _serial_errors(func):
+    """Log serial errors and return 1, or 0 on success, like JED does for the
+    errors of the C library."""
+
+    @wraps(func)
+    def func_wrapper(self, *args, **kwargs):
+        try:
+            func(self, *args, **kwargs)
+        except (OSError, JrkSerialError) as e:
+            self._logger.error(f"Serial error: {e}")
+            return 1
+        return 0
+
+    return func_wrapper
+
+
+class PyJrkSerial:
+    """Controls a Jrk G2 over a JrkSerialBus with the PyJrk command and
+    variables API.
+
+    device_number is the serial_device_number of the controller on a
+    daisy-chained bus; leave it as None to use the compact protocol with a
+    single controller. Settings can not be changed over serial, use PyJrk
+    over USB to configure the controllers.
+    """
+
+    def __init__(
+        self,
+        bus: JrkSerialBus,
+        device_number=None,
+        logger: LoggerProtocol = None,
+        ttl_ms=0,
+    ):
+        self.bus = bus
+        self.device_number = device_number
+        self._logger = logger if logger else logging.getLogger("PyJrk")
+        self.variables = PyJrkSerialVariables(self, self._logger, ttl_ms)
+        # Duration of the last exchange(), in seconds
+        self.last_exchange_rtt = None
+
+    def _packet(self, command, data=b""):
+        return self.bus.packet(self.device_number, command, data)
+
+    # Commands
+    @_serial_errors
+    def set_target(self, target):
+        self.bus.send(
+            self._packet(
+                jc["JRK_CMD_SET_TARGET_SERIAL"] | (target & 0x1F),
+                bytes(((target >> 5) & 0x7F,)),
+            )
+        )
+
+    @_serial_errors
+    def set_target_low_res_forward(self, magnitude):
+        self.bus.send(
+            self._packet(
+                jc["JRK_CMD_SET_TARGET_LOW_RES_FWD"], bytes((magnitude & 0x7F,))
+            )
+        )
+
+    @_serial_errors
+    def set_target_low_res_reverse(self, magnitude):
+        self.bus.send(
+            self._packet(
+                jc["JRK_CMD_SET_TARGET_LOW_RES_REV"], bytes((magnitude & 0x7F,))
+            )
+        )
+
+    @_serial_errors
+    def stop_motor(self):
+        self.bus.send(self._packet(jc["JRK_CMD_STOP_MOTOR_SERIAL"]))
+
+    @_serial_errors
+    def force_duty_cycle_target(self, duty_cycle):
+        self.bus.send(
+            self._packet(
+                jc["JRK_CMD_FORCE_DUTY_CYCLE_TARGET"], _encode_14bit(duty_cycle)
+            )
+        )
+
+    @_serial_errors
+    def force_duty_cycle(self, duty_cycle):
+        self.bus.send(
+            self._packet(jc["JRK_CMD_FORCE_DUTY_CYCLE"], _encode_14bit(duty_cycle))
+        )
+
+    def exchange(self, target) -> JrkVariablesSnapshot:
+        """Set the target and read all the variables, returning them as a
+        snapshot, or None if the transfer failed. The command and the variable
+        queries go out in a single write, so the exchange waits for one round
+        trip; its duration is stored in last_exchange_rtt, in seconds."""
+        start = time.perf_counter()
+        variables = self.variables
+        with self.bus.pipeline():
+            if self.set_target(target):
+                return None
+            variables.invalidate()
+            if variables._refresh_jrk_variables():
+                return None
+        self.last_exchange_rtt = time.perf_counter() - start
+        return jrk_variables_to_snapshot(variables._jrk_variables)
+
+    def _get_error_flags(self, command):
+        try:
+            reply = self.bus.query(self._packet(command), 2)
+        except (OSError, JrkSerialError) as e:
+            self._logger.error(f"Serial error: {e}")
+            return None
+        return int.from_bytes(reply, "little")
+
+    def get_error_flags_halting(self):
+        """Read and clear the latched error flags that stop the motor. Returns
+        None if the transfer failed."""
+        return self._get_error_flags(jc["JRK_CMD_GET_ERROR_FLAGS_HALTING_SERIAL"])
+
+    def get_error_flags_occurred(self):
+        """Read and clear the error flags that occurred since the last read."""
+        return self._get_error_flags(jc["JRK_CMD_GET_ERROR_FLAGS_OCCURRED_SERIAL"])
+
+
+class PyJrkSerialVariables(PyJrkVariables):
+    """PyJrkVariables read with the serial Get variables command.
+
+    A read is split into blocks of at most MAX_VARIABLES_READ bytes and every
+    block is requested with a single pipelined write.
+    """
+
+    def __init__(self, device: PyJrkSerial, logger: LoggerProtocol, ttl_ms=0):
+        self._device = device
+        super().__init__(None, (None, None), logger, ttl_ms)
+
+    def _read_variable_blocks(self, segments, clear_error_flags_halting=False):
+        device = self._device
+        queries = []
+        starts = []
+        for offset, length in segments:
+            end = offset + length
+            for start in range(offset, end, MAX_VARIABLES_READ):
+                block_length = min(MAX_VARIABLES_READ, end - start)
+                queries.append(
+                    (
+                        device._packet(
+                            jc["JRK_CMD_GET_VARIABLES"], bytes((start, block_length))
+                        ),
+                        block_length,
+                    )
+                )
+                starts.append(start)
+        if clear_error_flags_halting:
+            queries.append(
+                (device._packet(jc["JRK_CMD_GET_ERROR_FLAGS_HALTING_SERIAL"]), 2)
+            )
+
+        replies = device.bus.query_many(queries)
+        buffer_address = addressof(self._jrk_variables_buffer)
+        for start, reply in zip(starts, replies):
+            memmove(buffer_address + start, reply, len(reply))
+        return replies
+
+    @_serial_errors
+    def _update_jrk_variables(self):
+        # Like jrk_get_variables: when clearing, the halting flags come from
+        # the command that reads and clears them
+        replies = self._read_variable_blocks(
+            ((0, jc["JRK_VARIABLES_SIZE"]),),
+            clear_error_flags_halting=self.clear_error_flags_halting,
+        )
+        jrk_variables_from_buffer(self._jrk_variables_buffer, self._jrk_variables)
+        if self.clear_error_flags_halting:
+            self._jrk_variables.error_flags_halting = int.from_bytes(
+                replies[-1], "little"
+            )
+
+    @_serial_errors
+    def _get_variable_segments(self, segments):
+        self._read_variable_blocks(segments)
+
+    def _get_variable_segment(self, offset, length):
+        return self._get_variable_segments(((offset, length),))
+
+
+class JrkSerialDeviceState:
+    """Minimal controller answering the serial protocol from a raw variables
+    block. Targets and forced duty cycles are stored as is, without any motor
+    model."""
+
+    def __init__(self):
+        self.variables = bytearray(jc["JRK_VARIABLES_SIZE"])
+        self._set_error_flags(1 << jc["JRK_ERROR_AWAITING_COMMAND"])
+
+    def _get(self, field_name):
+        offset, c_type, _ = jrk_variables_layout[field_name]
+        return struct.unpack_from("<" + c_type._type_, self.variables, offset)[0]
+
+    def _set(self, field_name, value):
+        offset, c_type, _ = jrk_variables_layout[field_name]
+        struct.pack_into("<" + c_type._type_, self.variables, offset, value)
+
+    def _set_error_flags(self, flags):
+        self._set("error_flags_halting", self._get("error_flags_halting") | flags)
+        self._set("error_flags_occurred", self._get("error_flags_occurred") | flags)
+
+    def _take_error_flags(self, field_name):
+        flags = self._get(field_name)
+        self._set(field_name, 0)
+        return flags.to_bytes(2, "little")
+
+    def set_target(self, target):
+        self._set("target", target)
+        self._set("force_mode", jc["JRK_FORCE_MODE_NONE"])
+        self._set(
+            "error_flags_halting",
+            self._get("error_flags_halting") & ~(1 << jc["JRK_ERROR_AWAITING_COMMAND"]),
+        )
+
+    def force_duty_cycle(self, duty_cycle, force_mode):
+        self._set("duty_cycle_target", duty_cycle)
+        self._set("force_mode", force_mode)
+
+    def serial_command(self, command, data):
+        """Run one decoded command and return its reply, or None."""
+        if (
+            command & jc["JRK_CMD_SET_TARGET_SERIAL_MASK"]
+            == jc["JRK_CMD_SET_TARGET_SERIAL"]
+        ):
+            self.set_target((command & 0x1F) | (data[0] << 5))
+        elif command == jc["JRK_CMD_SET_TARGET_LOW_RES_FWD"]:
+            self.set_target(2048 + 16 * data[0])
+        elif command == jc["JRK_CMD_SET_TARGET_LOW_RES_REV"]:
+            self.set_target(2048 - 16 * data[0])
+        elif command == jc["JRK_CMD_STOP_MOTOR_SERIAL"]:
+            self._set_error_flags(1 << jc["JRK_ERROR_AWAITING_COMMAND"])
+        elif command == jc["JRK_CMD_FORCE_DUTY_CYCLE_TARGET"]:
+            self.force_duty_cycle(
+                _decode_14bit(data, signed=True),
+                jc["JRK_FORCE_MODE_DUTY_CYCLE_TARGET"],
+            )
+        elif command == jc["JRK_CMD_FORCE_DUTY_CYCLE"]:
+            self.force_duty_cycle(
+                _decode_14bit(data, signed=True), jc["JRK_FORCE_MODE_DUTY_CYCLE"]
+            )
+        elif command == jc["JRK_CMD_GET_VARIABLES"]:
+            offset, length = data
+            return bytes(self.variables[offset : offset + length])
+        elif command == jc["JRK_CMD_GET_ERROR_FLAGS_HALTING_SERIAL"]:
+            return self._take_error_flags("error_flags_halting")
+        elif command == jc["JRK_CMD_GET_ERROR_FLAGS_OCCURRED_SERIAL"]:
+            return self._take_error_flags("error_flags_occurred")
+        return None
+
+
+def _command_data_length(command):
+    if (
+        command & jc["JRK_CMD_SET_TARGET_SERIAL_MASK"]
+        == jc["JRK_CMD_SET_TARGET_SERIAL"]
+    ):
+        return 1
+    return {
+        jc["JRK_CMD_SET_TARGET_LOW_RES_FWD"]: 1,
+        jc["JRK_CMD_SET_TARGET_LOW_RES_REV"]: 1,
+        jc["JRK_CMD_STOP_MOTOR_SERIAL"]: 0,
+        jc["JRK_CMD_FORCE_DUTY_CYCLE_TARGET"]: 2,
+        jc["JRK_CMD_FORCE_DUTY_CYCLE"]: 2,
+        jc["JRK_CMD_GET_VARIABLES"]: 2,
+        jc["JRK_CMD_GET_ERROR_FLAGS_HALTING_SERIAL"]: 0,
+        jc["JRK_CMD_GET_ERROR_FLAGS_OCCURRED_SERIAL"]: 0,
+    }.get(command)
+
+
+class JrkSerialResponder:
+    """Answers the Jrk G2 serial protocol on a file descriptor, e.g. the master
+    side of a pty, so that JrkSerialBus can be used without hardware.
+
+    devices maps serial device numbers to objects with a
+    serial_command(command, data) method such as JrkSerialDeviceState. Pololu
+    protocol packets go to the addressed device; compact protocol packets go
+    to every device. Packets with a bad CRC or an unknown command are dropped.
+    """
+
+    def __init__(self, fd, devices: dict, crc=False, enable_14bit_device_number=False):
+        self._fd = fd
+        self.devices = devices
+        self.crc = crc
+        self.enable_14bit_device_number = enable_14bit_device_number
+        self._buffer = bytearray()
+        self._stop_event = threading.Event()
+        self._thread = None
+        if os.isatty(fd):
+            tty.setraw(fd)
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="JrkSerialResponder", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not select.select([self._fd], [], [], 0.05)[0]:
+                continue
+            try:
+                data = os.read(self._fd, 4096)
+            except OSError:
+                return
+            self.feed(data)
+
+    def feed(self, data):
+        """Parse received bytes and write the replies of complete packets."""
+        self._buffer += data
+        buffer = self._buffer
+        while buffer:
+            if buffer[0] == POLOLU_PROTOCOL_START:
+                header_length = 4 if self.enable_14bit_device_number else 3
+                if len(buffer) < header_length:
+                    return
+                device_number = buffer[1]
+                if self.enable_14bit_device_number:
+                    device_number |= buffer[2] << 7
+                command = buffer[header_length - 1] | 0x80
+            elif buffer[0] & 0x80:
+                header_length = 1
+                device_number = None
+                command = buffer[0]
+            else:
+                # Data byte without a command byte
+                del buffer[0]
+                continue
+
+            data_length = _command_data_length(command)
+            if data_length is None:
+                del buffer[0]
+                continue
+            packet_length = header_length + data_length + (1 if self.crc else 0)
+            if len(buffer) < packet_length:
+                return
+            packet = bytes(buffer[:packet_length])
+            del buffer[:packet_length]
+            if self.crc and crc7(packet[:-1]) != packet[-1]:
+                continue
+            data = packet[header_length : header_length + data_length]
+
+            if device_number is None:
+                targets = list(self.devices.values())
+            else:
+                device = self.devices.get(device_number)
+                targets = [] if device is None else [device]
+            for device in targets:
+                reply = device.serial_command(command, data)
+                if reply is not None:
+                    if self.crc:
+                        reply += bytes((crc7(reply),))
+                    os.write(self._fd, reply)
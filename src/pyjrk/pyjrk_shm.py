@@ -0,0 +1,328 @@
+import threading
+import time
+from ctypes import Structure, addressof, c_double, c_uint64, memmove, sizeof
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from pyjrk.pyjrk_properties import PyJrkVariablesProperties
+from pyjrk.pyjrk_structures import (
+    JrkVariablesSnapshot,
+    jrk_variables,
+    jrk_variables_to_snapshot,
+)
+
+
+class JrkSharedState(Structure):
+    """Latest variables of one device as laid out in shared memory.
+
+    sequence is the seqlock counter: odd while the writer updates the block,
+    incremented again once it is done. timestamp is the time.monotonic() of
+    the read that produced variables, in the writer process.
+    """
+
+    _fields_ = [
+        ("sequence", c_uint64),
+        ("timestamp", c_double),
+        ("sample_count", c_uint64),
+        ("error_count", c_uint64),
+        ("variables", jrk_variables),
+    ]
+
+
+_VARIABLES_OFFSET = JrkSharedState.variables.offset
+_VARIABLES_SIZE = sizeof(jrk_variables)
+
+
+def state_segment_name(serial_number):
+    """Name of the shared memory segment a JrkStatePublisher of the device
+    uses by default."""
+    return f"pyjrk_{serial_number}"
+
+
+# Names of the blocks created by this process, which its tracker must keep
+_created_names = set()
+
+
+def _attach(name, untrack):
+    try:
+        return SharedMemory(name=name, track=not untrack)
+    except TypeError:
+        # Before Python 3.13 attaching always registers the block with the
+        # resource tracker, which unlinks it when this process exits
+        shm = SharedMemory(name=name)
+        if untrack and shm.name not in _created_names:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _create(name, size, replace):
+    try:
+        return SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        if not replace or name in _created_names:
+            raise
+    stale = _attach(name, untrack=False)
+    stale.close()
+    stale.unlink()
+    return SharedMemory(name=name, create=True, size=size)
+
+
+class SharedSeqlock:
+    """A ctypes structure in shared memory guarded by a seqlock.
+
+    The structure type must start with a c_uint64 sequence field. One process
+    writes between write_begin() and write_end(); any number of processes read
+    consistent copies with read_into() without ever blocking the writer.
+
+    name=None creates a new block with a generated name. Otherwise the block
+    is created with that name when create is set, or attached to. Creating a
+    name that exists raises FileExistsError, unless replace is set: the
+    existing block is then unlinked first, which is only safe once its
+    creator is gone, e.g. after a crash. untrack keeps an attaching process
+    that does not share the resource tracker of the creator from unlinking
+    the block when it exits.
+    """
+
+    def __init__(
+        self, structure_type, name=None, create=False, untrack=False, replace=False
+    ):
+        self.structure_type = structure_type
+        self.size = sizeof(structure_type)
+        if name is None or create:
+            self._shm = _create(name, self.size, replace)
+            self._owner = True
+            _created_names.add(self._shm.name)
+        else:
+            self._shm = _attach(name, untrack)
+            self._owner = False
+        self.name = self._shm.name
+        self.state = structure_type.from_buffer(self._shm.buf)
+        self._address = addressof(self.state)
+        if self._owner:
+            memmove(self._address, bytes(self.size), self.size)
+
+    def write_begin(self):
+        self.state.sequence += 1
+
+    def write_end(self):
+        self.state.sequence += 1
+
+    def read_into(self, destination, timeout=0.1):
+        """Copy a consistent version of the structure into destination and
+        return its sequence number, or None if the writer kept it busy for
+        timeout seconds."""
+        state = self.state
+        size = self.size
+        source_address = self._address
+        destination_address = addressof(destination)
+        deadline = None
+        while True:
+            sequence = state.sequence
+            if not sequence & 1:
+                memmove(destination_address, source_address, size)
+                if state.sequence == sequence:
+                    return sequence
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                return None
+
+    def close(self):
+        # The ctypes view exports the buffer, so it must go before the block
+        self.state = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            _created_names.discard(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def publish_variables(shared: SharedSeqlock, variables: jrk_variables, timestamp):
+    """Write a variables sample into a SharedSeqlock of JrkSharedState."""
+    state = shared.state
+    shared.write_begin()
+    memmove(
+        shared._address + _VARIABLES_OFFSET, addressof(variables), _VARIABLES_SIZE
+    )
+    state.timestamp = timestamp
+    state.sample_count += 1
+    shared.write_end()
+
+
+def publish_error(shared: SharedSeqlock):
+    """Count a failed read in a SharedSeqlock of JrkSharedState."""
+    shared.write_begin()
+    shared.state.error_count += 1
+    shared.write_end()
+
+
+class JrkSharedVariables(PyJrkVariablesProperties):
+    """Read-only view of the variables published in a SharedSeqlock of
+    JrkSharedState, with the field names of PyJrkVariables. Every property
+    read takes the latest published sample; no transfer is made.
+
+    Reads return None while no sample was published yet, and when the
+    writer kept the block busy past the seqlock timeout.
+    """
+
+    def __init__(self, shared: SharedSeqlock):
+        self._shared = shared
+        self._state = JrkSharedState()
+
+    def _read(self):
+        if self._shared.read_into(self._state) is None:
+            return None
+        return self._state
+
+    def _read_sample(self):
+        state = self._read()
+        if state is None or not state.sample_count:
+            return None
+        return state
+
+    @property
+    def sequence(self):
+        """Seqlock counter of the block, 0 while nothing was published."""
+        state = self._read()
+        return None if state is None else state.sequence
+
+    @property
+    def published(self):
+        """Whether a sample was published since the block was created."""
+        return self._read_sample() is not None
+
+    @property
+    def timestamp(self):
+        """time.monotonic() of the latest sample, in the publishing process."""
+        state = self._read_sample()
+        return None if state is None else state.timestamp
+
+    @property
+    def age(self):
+        """Seconds since the latest sample was read from the device."""
+        state = self._read_sample()
+        return None if state is None else time.monotonic() - state.timestamp
+
+    @property
+    def sample_count(self):
+        state = self._read()
+        return None if state is None else state.sample_count
+
+    @property
+    def error_count(self):
+        state = self._read()
+        return None if state is None else state.error_count
+
+    @property
+    def pin_info(self):
+        snapshot = self.snapshot()
+        return None if snapshot is None else snapshot.pin_info
+
+    def snapshot(self) -> JrkVariablesSnapshot:
+        state = self._read_sample()
+        return None if state is None else jrk_variables_to_snapshot(state.variables)
+
+
+def _variable_property(field_name):
+    def getter(self):
+        state = self._read_sample()
+        return None if state is None else getattr(state.variables, field_name)
+
+    return property(getter)
+
+
+for _field_name, _ in jrk_variables._fields_:
+    if _field_name != "pin_info":
+        setattr(JrkSharedVariables, _field_name, _variable_property(_field_name))
+
+
+class JrkStatePublisher:
+    """Publishes the variables of a device in a named shared memory segment.
+
+    Once attached, every successful read of the PyJrkVariables object, made
+    by any of its users, is written to the segment, so other local processes
+    can follow the device with a JrkStateReader without opening it. With
+    rate_hz set, a background thread also reads the variables at that rate;
+    it shares the handle with the other users of the PyJrkVariables, so do
+    not read them from other threads at the same time.
+
+    Only one publisher can use a name: a second one raises FileExistsError
+    while the first is open. replace takes over the segment left behind by
+    a publisher that did not close, e.g. a crashed process; readers attached
+    to the old segment must be reopened.
+    """
+
+    def __init__(self, variables, name, rate_hz=0, replace=False):
+        self._variables = variables
+        self._shared = SharedSeqlock(JrkSharedState, name, create=True, replace=replace)
+        self.name = self._shared.name
+        variables._state_publisher = self
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        if rate_hz:
+            self.period = 1.0 / rate_hz
+            self._thread = threading.Thread(
+                target=self._run, name="JrkStatePublisher", daemon=True
+            )
+            self._thread.start()
+
+    def publish(self, variables: jrk_variables, timestamp):
+        publish_variables(self._shared, variables, timestamp)
+
+    def publish_error(self):
+        publish_error(self._shared)
+
+    def _run(self):
+        variables = self._variables
+        next_deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            delay = next_deadline - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+            variables.invalidate()
+            variables._refresh_jrk_variables()
+            next_deadline += self.period
+            now = time.monotonic()
+            if now > next_deadline:
+                next_deadline = now
+
+    def close(self):
+        """Stop publishing and remove the segment."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._variables._state_publisher is self:
+            self._variables._state_publisher = None
+        self._shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JrkStateReader(JrkSharedVariables):
+    """Reads the variables a JrkStatePublisher publishes, from any local
+    process, e.g. JrkStateReader("00123456").snapshot()."""
+
+    def __init__(self, serial_number=None, name=None):
+        if name is None:
+            name = state_segment_name(serial_number)
+        super().__init__(SharedSeqlock(JrkSharedState, name, untrack=True))
+
+    def close(self):
+        self._shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,222 @@
+import threading
+import time
+from bisect import bisect_left
+from ctypes import c_void_p
+
+from pyjrk.pyjrk_native import JRK_PROTOTYPES, LIBUSBP_PROTOTYPES
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    1e-6,
+    2e-6,
+    5e-6,
+    1e-5,
+    2e-5,
+    5e-5,
+    1e-4,
+    2e-4,
+    5e-4,
+    1e-3,
+    2e-3,
+    5e-3,
+    1e-2,
+    2e-2,
+    5e-2,
+    1e-1,
+    2e-1,
+    5e-1,
+    1.0,
+)
+_BUCKET_BOUNDS_NS = tuple(int(bound * 1e9) for bound in LATENCY_BUCKETS)
+
+# Functions returning a jrk_error * or libusbp_error *, which fail when non-NULL
+_ERROR_RETURNING = {
+    func_name
+    for func_name, (restype, _) in {**JRK_PROTOTYPES, **LIBUSBP_PROTOTYPES}.items()
+    if restype is c_void_p
+}
+
+
+class CallStats:
+    """Call count, error count and latency histogram of one C function."""
+
+    __slots__ = ("calls", "errors", "total_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        # One count per LATENCY_BUCKETS bound, plus one for slower calls
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def to_dict(self):
+        cumulative = 0
+        histogram = {}
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self.buckets):
+            cumulative += count
+            histogram[bound] = cumulative
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_s": self.total_ns / 1e9,
+            "mean_s": self.total_ns / self.calls / 1e9 if self.calls else 0.0,
+            "max_s": self.max_ns / 1e9,
+            # Cumulative counts keyed by the upper bound in seconds
+            "histogram": histogram,
+        }
+
+
+class NativeCallStats:
+    """Statistics of the native calls made through instrumented libraries."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, func_name, elapsed_ns, error):
+        with self._lock:
+            stats = self._calls.get(func_name)
+            if stats is None:
+                stats = self._calls[func_name] = CallStats()
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+            stats.total_ns += elapsed_ns
+            if elapsed_ns > stats.max_ns:
+                stats.max_ns = elapsed_ns
+            stats.buckets[bisect_left(_BUCKET_BOUNDS_NS, elapsed_ns)] += 1
+
+    def snapshot(self):
+        """Return the statistics keyed by C function name."""
+        with self._lock:
+            return {
+                func_name: stats.to_dict()
+                for func_name, stats in sorted(self._calls.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+
+
+class InstrumentedLibrary:
+    """Wraps the C functions of a driver handle so that every call is timed
+    and recorded in a NativeCallStats. Other attributes fall through to the
+    wrapped library.
+
+    Only libraries of PyJrk objects created with stats enabled are wrapped,
+    so the calls of every other object keep going straight to ctypes.
+    """
+
+    def __init__(self, library, stats: NativeCallStats):
+        self._library = library
+        for func_name in dir(library):
+            if not func_name.startswith(("jrk_", "libusbp_")):
+                continue
+            func = getattr(library, func_name, None)
+            if callable(func):
+                setattr(self, func_name, self._instrument(func_name, func, stats))
+
+    @staticmethod
+    def _instrument(func_name, func, stats: NativeCallStats):
+        record = stats.record
+        perf_counter_ns = time.perf_counter_ns
+        returns_error = func_name in _ERROR_RETURNING
+
+        def func_wrapper(*args):
+            start = perf_counter_ns()
+            result = func(*args)
+            record(
+                func_name,
+                perf_counter_ns() - start,
+                returns_error and bool(result),
+            )
+            return result
+
+        return func_wrapper
+
+    def __getattr__(self, name):
+        return getattr(self._library, name)
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def prometheus_text(sources):
+    """Render native call statistics in the Prometheus text format.
+
+    sources is an iterable of (labels dict, stats snapshot) pairs, e.g. one
+    per device labelled with its serial number.
+    """
+    calls = []
+    errors = []
+    latency = []
+    for labels, snapshot in sources:
+        for func_name, stats in snapshot.items():
+            base = _labels({**labels, "function": func_name})
+            calls.append(f"pyjrk_native_calls_total{{{base}}} {stats['calls']}")
+            errors.append(f"pyjrk_native_errors_total{{{base}}} {stats['errors']}")
+            for bound, count in stats["histogram"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                latency.append(
+                    f'pyjrk_native_call_seconds_bucket{{{base},le="{le}"}} {count}'
+                )
+            latency.append(
+                f"pyjrk_native_call_seconds_sum{{{base}}} {stats['total_s']}"
+            )
+            latency.append(
+                f"pyjrk_native_call_seconds_count{{{base}}} {stats['calls']}"
+            )
+
+    lines = [
+        "# HELP pyjrk_native_calls_total Native calls per C function.",
+        "# TYPE pyjrk_native_calls_total counter",
+        *calls,
+        "# HELP pyjrk_native_errors_total Native calls that returned an error.",
+        "# TYPE pyjrk_native_errors_total counter",
+        *errors,
+        "# HELP pyjrk_native_call_seconds Latency of the native calls.",
+        "# TYPE pyjrk_native_call_seconds histogram",
+        *latency,
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def start_prometheus_exporter(jrks, port=9464, address=""):
+    """Serve the statistics of the given PyJrk objects on /metrics from a
+    daemon thread. jrks can be a list or a callable returning one. Returns
+    the server; call shutdown() on it to stop."""
+    # Imported here so that importing pyjrk does not pay for http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    def collect():
+        sources = []
+        for jrk in jrks() if callable(jrks) else jrks:
+            labels = {}
+            if jrk.device is not None:
+                labels["serial_number"] = jrk.device.serial_number.decode()
+            sources.append((labels, jrk.stats()))
+        return prometheus_text(sources)
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = collect().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    threading.Thread(
+        target=server.serve_forever, name="PyJrkPrometheus", daemon=True
+    ).start()
+    return server
@@ -1,3 +1,4 @@
+from collections import namedtuple
 from ctypes import *
 
 from pyjrk.pyjrk_protocol import jrk_constant as j_const
@@ -167,6 +168,338 @@ class jrk_variables(Structure):
     ]
 
 
+# Wire layout of the variables block read with JRK_CMD_GET_VARIABLES:
+# jrk_variables field name -> (offset, ctype, bit mask or None)
+jrk_variables_layout = {
+    "input": (j_const["JRK_VAR_INPUT"], c_uint16, None),
+    "target": (j_const["JRK_VAR_TARGET"], c_uint16, None),
+    "feedback": (j_const["JRK_VAR_FEEDBACK"], c_uint16, None),
+    "scaled_feedback": (j_const["JRK_VAR_SCALED_FEEDBACK"], c_uint16, None),
+    "integral": (j_const["JRK_VAR_INTEGRAL"], c_int16, None),
+    "duty_cycle_target": (j_const["JRK_VAR_DUTY_CYCLE_TARGET"], c_int16, None),
+    "duty_cycle": (j_const["JRK_VAR_DUTY_CYCLE"], c_int16, None),
+    "current_low_res": (j_const["JRK_VAR_CURRENT_LOW_RES"], c_uint8, None),
+    "pid_period_exceeded": (j_const["JRK_VAR_PID_PERIOD_EXCEEDED"], c_uint8, 0x01),
+    "pid_period_count": (j_const["JRK_VAR_PID_PERIOD_COUNT"], c_uint16, None),
+    "error_flags_halting": (j_const["JRK_VAR_ERROR_FLAGS_HALTING"], c_uint16, None),
+    "error_flags_occurred": (
+        j_const["JRK_VAR_ERROR_FLAGS_OCCURRED"],
+        c_uint16,
+        None,
+    ),
+    "force_mode": (j_const["JRK_VAR_FLAG_BYTE1"], c_uint8, 0x03),
+    "vin_voltage": (j_const["JRK_VAR_VIN_VOLTAGE"], c_uint16, None),
+    "current": (j_const["JRK_VAR_CURRENT"], c_uint16, None),
+    "device_reset": (j_const["JRK_VAR_DEVICE_RESET"], c_uint8, None),
+    "up_time": (j_const["JRK_VAR_UP_TIME"], c_uint32, None),
+    "rc_pulse_width": (j_const["JRK_VAR_RC_PULSE_WIDTH"], c_uint16, None),
+    "fbt_reading": (j_const["JRK_VAR_FBT_READING"], c_uint16, None),
+    "raw_current": (j_const["JRK_VAR_RAW_CURRENT"], c_uint16, None),
+    "encoded_hard_current_limit": (
+        j_const["JRK_VAR_ENCODED_HARD_CURRENT_LIMIT"],
+        c_uint16,
+        None,
+    ),
+    "last_duty_cycle": (j_const["JRK_VAR_LAST_DUTY_CYCLE"], c_int16, None),
+    "current_chopping_consecutive_count": (
+        j_const["JRK_VAR_CURRENT_CHOPPING_CONSECUTIVE_COUNT"],
+        c_uint8,
+        None,
+    ),
+    "current_chopping_occurrence_count": (
+        j_const["JRK_VAR_CURRENT_CHOPPING_OCCURRENCE_COUNT"],
+        c_uint8,
+        None,
+    ),
+}
+
+
+def jrk_variables_from_buffer(buffer, variables: jrk_variables):
+    """Decode a raw JRK_VARIABLES_SIZE variables block into a jrk_variables
+    structure, the same way jrk_get_variables does."""
+    for field_name, (offset, c_type, mask) in jrk_variables_layout.items():
+        value = c_type.from_buffer_copy(buffer, offset).value
+        setattr(variables, field_name, value & mask if mask is not None else value)
+
+    digital_readings = buffer[j_const["JRK_VAR_DIGITAL_READINGS"]]
+    for pin_num, pin in enumerate(variables.pin_info):
+        pin.analog_reading = 0xFFFF
+        pin.digital_reading = (digital_readings >> pin_num) & 1
+    variables.pin_info[j_const["JRK_PIN_NUM_SDA"]].analog_reading = (
+        c_uint16.from_buffer_copy(buffer, j_const["JRK_VAR_ANALOG_READING_SDA"]).value
+    )
+    variables.pin_info[j_const["JRK_PIN_NUM_FBA"]].analog_reading = (
+        c_uint16.from_buffer_copy(buffer, j_const["JRK_VAR_ANALOG_READING_FBA"]).value
+    )
+
+
+def jrk_variables_to_buffer(variables: jrk_variables) -> bytearray:
+    """Encode a jrk_variables structure into a raw variables block, the
+    inverse of jrk_variables_from_buffer."""
+    buffer = bytearray(j_const["JRK_VARIABLES_SIZE"])
+    for field_name, (offset, c_type, mask) in jrk_variables_layout.items():
+        value = getattr(variables, field_name)
+        if mask is not None:
+            value = (buffer[offset] & ~mask) | (value & mask)
+        c_type.from_buffer(buffer, offset).value = value
+
+    digital_readings = 0
+    for pin_num, pin in enumerate(variables.pin_info):
+        digital_readings |= bool(pin.digital_reading) << pin_num
+    buffer[j_const["JRK_VAR_DIGITAL_READINGS"]] = digital_readings
+    c_uint16.from_buffer(buffer, j_const["JRK_VAR_ANALOG_READING_SDA"]).value = (
+        variables.pin_info[j_const["JRK_PIN_NUM_SDA"]].analog_reading
+    )
+    c_uint16.from_buffer(buffer, j_const["JRK_VAR_ANALOG_READING_FBA"]).value = (
+        variables.pin_info[j_const["JRK_PIN_NUM_FBA"]].analog_reading
+    )
+    return buffer
+
+
+# EEPROM layout of the settings written with JRK_CMD_SET_EEPROM_SETTING:
+# jrk_settings field name -> (offset, ctype) for settings stored as plain values
+jrk_settings_layout = {
+    field_name: (j_const["JRK_SETTING_" + field_name.upper()], field_type)
+    for field_name, field_type in [
+        ("input_mode", c_uint8),
+        ("input_error_minimum", c_uint16),
+        ("input_error_maximum", c_uint16),
+        ("input_minimum", c_uint16),
+        ("input_maximum", c_uint16),
+        ("input_neutral_minimum", c_uint16),
+        ("input_neutral_maximum", c_uint16),
+        ("output_minimum", c_uint16),
+        ("output_neutral", c_uint16),
+        ("output_maximum", c_uint16),
+        ("input_scaling_degree", c_uint8),
+        ("input_analog_samples_exponent", c_uint8),
+        ("feedback_mode", c_uint8),
+        ("feedback_error_minimum", c_uint16),
+        ("feedback_error_maximum", c_uint16),
+        ("feedback_minimum", c_uint16),
+        ("feedback_maximum", c_uint16),
+        ("feedback_dead_zone", c_uint8),
+        ("feedback_analog_samples_exponent", c_uint8),
+        ("serial_mode", c_uint8),
+        ("serial_device_number", c_uint16),
+        ("error_enable", c_uint16),
+        ("error_latch", c_uint16),
+        ("error_hard", c_uint16),
+        ("vin_calibration", c_int16),
+        ("pwm_frequency", c_uint8),
+        ("current_samples_exponent", c_uint8),
+        ("current_offset_calibration", c_int16),
+        ("current_scale_calibration", c_int16),
+        ("fbt_method", c_uint8),
+        ("fbt_timing_timeout", c_uint16),
+        ("fbt_samples", c_uint8),
+        ("fbt_divider_exponent", c_uint8),
+        ("integral_divider_exponent", c_uint8),
+        ("proportional_multiplier", c_uint16),
+        ("proportional_exponent", c_uint8),
+        ("integral_multiplier", c_uint16),
+        ("integral_exponent", c_uint8),
+        ("derivative_multiplier", c_uint16),
+        ("derivative_exponent", c_uint8),
+        ("pid_period", c_uint16),
+        ("integral_limit", c_uint16),
+        ("max_duty_cycle_while_feedback_out_of_range", c_uint16),
+        ("max_acceleration_forward", c_uint16),
+        ("max_acceleration_reverse", c_uint16),
+        ("max_deceleration_forward", c_uint16),
+        ("max_deceleration_reverse", c_uint16),
+        ("max_duty_cycle_forward", c_uint16),
+        ("max_duty_cycle_reverse", c_uint16),
+        ("soft_current_limit_forward", c_uint16),
+        ("soft_current_limit_reverse", c_uint16),
+    ]
+}
+
+# Settings only stored by the products with a hard current limit (not UMC06A)
+jrk_settings_hard_current_layout = {
+    "hard_overcurrent_threshold": (
+        j_const["JRK_SETTING_HARD_OVERCURRENT_THRESHOLD"],
+        c_uint8,
+    ),
+    "encoded_hard_current_limit_forward": (
+        j_const["JRK_SETTING_ENCODED_HARD_CURRENT_LIMIT_FORWARD"],
+        c_uint16,
+    ),
+    "encoded_hard_current_limit_reverse": (
+        j_const["JRK_SETTING_ENCODED_HARD_CURRENT_LIMIT_REVERSE"],
+        c_uint16,
+    ),
+}
+
+# Settings only stored by the UMC06A
+jrk_settings_umc06a_layout = {
+    "soft_current_regulation_level_forward": (
+        j_const["JRK_SETTING_SOFT_CURRENT_REGULATION_LEVEL_FORWARD"],
+        c_uint16,
+    ),
+    "soft_current_regulation_level_reverse": (
+        j_const["JRK_SETTING_SOFT_CURRENT_REGULATION_LEVEL_REVERSE"],
+        c_uint16,
+    ),
+}
+
+# jrk_settings field name -> (offset name, bit name) of the option bits
+_jrk_settings_option_bit_names = {
+    "never_sleep": ("JRK_SETTING_OPTIONS_BYTE1", "JRK_OPTIONS_BYTE1_NEVER_SLEEP"),
+    "serial_enable_crc": (
+        "JRK_SETTING_OPTIONS_BYTE1",
+        "JRK_OPTIONS_BYTE1_SERIAL_ENABLE_CRC",
+    ),
+    "serial_enable_14bit_device_number": (
+        "JRK_SETTING_OPTIONS_BYTE1",
+        "JRK_OPTIONS_BYTE1_SERIAL_ENABLE_14BIT_DEVICE_NUMBER",
+    ),
+    "serial_disable_compact_protocol": (
+        "JRK_SETTING_OPTIONS_BYTE1",
+        "JRK_OPTIONS_BYTE1_SERIAL_DISABLE_COMPACT_PROTOCOL",
+    ),
+    "disable_i2c_pullups": (
+        "JRK_SETTING_OPTIONS_BYTE1",
+        "JRK_OPTIONS_BYTE1_DISABLE_I2C_PULLUPS",
+    ),
+    "analog_sda_pullup": (
+        "JRK_SETTING_OPTIONS_BYTE1",
+        "JRK_OPTIONS_BYTE1_ANALOG_SDA_PULLUP",
+    ),
+    "always_analog_sda": (
+        "JRK_SETTING_OPTIONS_BYTE1",
+        "JRK_OPTIONS_BYTE1_ALWAYS_ANALOG_SDA",
+    ),
+    "always_analog_fba": (
+        "JRK_SETTING_OPTIONS_BYTE1",
+        "JRK_OPTIONS_BYTE1_ALWAYS_ANALOG_FBA",
+    ),
+    "input_invert": ("JRK_SETTING_OPTIONS_BYTE2", "JRK_OPTIONS_BYTE2_INPUT_INVERT"),
+    "input_detect_disconnect": (
+        "JRK_SETTING_OPTIONS_BYTE2",
+        "JRK_OPTIONS_BYTE2_INPUT_DETECT_DISCONNECT",
+    ),
+    "feedback_invert": (
+        "JRK_SETTING_OPTIONS_BYTE2",
+        "JRK_OPTIONS_BYTE2_FEEDBACK_INVERT",
+    ),
+    "feedback_detect_disconnect": (
+        "JRK_SETTING_OPTIONS_BYTE2",
+        "JRK_OPTIONS_BYTE2_FEEDBACK_DETECT_DISCONNECT",
+    ),
+    "feedback_wraparound": (
+        "JRK_SETTING_OPTIONS_BYTE2",
+        "JRK_OPTIONS_BYTE2_FEEDBACK_WRAPAROUND",
+    ),
+    "motor_invert": ("JRK_SETTING_OPTIONS_BYTE2", "JRK_OPTIONS_BYTE2_MOTOR_INVERT"),
+    "reset_integral": (
+        "JRK_SETTING_OPTIONS_BYTE3",
+        "JRK_OPTIONS_BYTE3_RESET_INTEGRAL",
+    ),
+    "coast_when_off": (
+        "JRK_SETTING_OPTIONS_BYTE3",
+        "JRK_OPTIONS_BYTE3_COAST_WHEN_OFF",
+    ),
+    "fbt_timing_polarity": (
+        "JRK_SETTING_FBT_OPTIONS",
+        "JRK_FBT_OPTIONS_TIMING_POLARITY",
+    ),
+}
+
+# jrk_settings field name -> (offset, bit) for settings stored as option bits
+jrk_settings_option_bits = {
+    field_name: (j_const[offset_name], j_const[bit_name])
+    for field_name, (offset_name, bit_name) in _jrk_settings_option_bit_names.items()
+}
+
+
+def jrk_settings_to_buffer(settings: jrk_settings) -> bytearray:
+    """Encode a jrk_settings structure into the JRK_SETTINGS_SIZE byte image
+    the device keeps in its EEPROM, the same way jrk_set_eeprom_settings does."""
+    buffer = bytearray(j_const["JRK_SETTINGS_SIZE"])
+
+    def write(offset, ctype, value):
+        ctype.from_buffer(buffer, offset).value = value
+
+    for field_name, (offset, field_type) in jrk_settings_layout.items():
+        write(offset, field_type, getattr(settings, field_name))
+    if settings.product == j_const["JRK_PRODUCT_UMC06A"]:
+        product_layout = jrk_settings_umc06a_layout
+    else:
+        product_layout = jrk_settings_hard_current_layout
+    for field_name, (offset, field_type) in product_layout.items():
+        write(offset, field_type, getattr(settings, field_name))
+
+    for field_name, (offset, bit) in jrk_settings_option_bits.items():
+        if getattr(settings, field_name):
+            buffer[offset] |= 1 << bit
+
+    baud_rate = settings.serial_baud_rate
+    if baud_rate:
+        write(
+            j_const["JRK_SETTING_SERIAL_BAUD_RATE_GENERATOR"],
+            c_uint16,
+            (j_const["JRK_BAUD_RATE_GENERATOR_FACTOR"] + baud_rate // 2) // baud_rate
+            - 1,
+        )
+    write(
+        j_const["JRK_SETTING_SERIAL_TIMEOUT"],
+        c_uint16,
+        settings.serial_timeout // j_const["JRK_SERIAL_TIMEOUT_UNITS"],
+    )
+    for field_name in ("brake_duration_forward", "brake_duration_reverse"):
+        write(
+            j_const["JRK_SETTING_" + field_name.upper()],
+            c_uint8,
+            getattr(settings, field_name) // j_const["JRK_BRAKE_DURATION_UNITS"],
+        )
+    buffer[j_const["JRK_SETTING_FBT_OPTIONS"]] |= (
+        settings.fbt_timing_clock & j_const["JRK_FBT_OPTIONS_TIMING_CLOCK_MASK"]
+    ) << j_const["JRK_FBT_OPTIONS_TIMING_CLOCK"]
+    return buffer
+
+
+def jrk_settings_from_buffer(buffer, settings: jrk_settings):
+    """Decode a JRK_SETTINGS_SIZE byte EEPROM image into a jrk_settings
+    structure, the inverse of jrk_settings_to_buffer. product and
+    firmware_version are not part of the image and are left unchanged."""
+
+    def read(offset, ctype):
+        return ctype.from_buffer_copy(buffer, offset).value
+
+    for field_name, (offset, field_type) in jrk_settings_layout.items():
+        setattr(settings, field_name, read(offset, field_type))
+    if settings.product == j_const["JRK_PRODUCT_UMC06A"]:
+        product_layout = jrk_settings_umc06a_layout
+    else:
+        product_layout = jrk_settings_hard_current_layout
+    for field_name, (offset, field_type) in product_layout.items():
+        setattr(settings, field_name, read(offset, field_type))
+
+    for field_name, (offset, bit) in jrk_settings_option_bits.items():
+        setattr(settings, field_name, (buffer[offset] >> bit) & 1)
+
+    brg = read(j_const["JRK_SETTING_SERIAL_BAUD_RATE_GENERATOR"], c_uint16)
+    settings.serial_baud_rate = (
+        j_const["JRK_BAUD_RATE_GENERATOR_FACTOR"] + (brg + 1) // 2
+    ) // (brg + 1)
+    settings.serial_timeout = (
+        read(j_const["JRK_SETTING_SERIAL_TIMEOUT"], c_uint16)
+        * j_const["JRK_SERIAL_TIMEOUT_UNITS"]
+    )
+    for field_name in ("brake_duration_forward", "brake_duration_reverse"):
+        setattr(
+            settings,
+            field_name,
+            read(j_const["JRK_SETTING_" + field_name.upper()], c_uint8)
+            * j_const["JRK_BRAKE_DURATION_UNITS"],
+        )
+    fbt_options = buffer[j_const["JRK_SETTING_FBT_OPTIONS"]]
+    settings.fbt_timing_clock = (
+        fbt_options >> j_const["JRK_FBT_OPTIONS_TIMING_CLOCK"]
+    ) & j_const["JRK_FBT_OPTIONS_TIMING_CLOCK_MASK"]
+
+
 class jrk_error(Structure):
     _fields_ = [
         ("do_not_free", c_bool),
@@ -174,3 +507,32 @@ class jrk_error(Structure):
         ("code_count", c_size_t),
         ("code_array", POINTER(c_uint32)),
     ]
+
+
+# Immutable, fully decoded views of a jrk_variables block
+PinInfoSnapshot = namedtuple(
+    "PinInfoSnapshot", [field_name for field_name, _ in pin_info._fields_]
+)
+
+JrkVariablesSnapshot = namedtuple(
+    "JrkVariablesSnapshot", [field_name for field_name, _ in jrk_variables._fields_]
+)
+
+
+def jrk_variables_to_snapshot(variables: jrk_variables) -> JrkVariablesSnapshot:
+    """Decode every field of a jrk_variables structure, including all pin_info
+    entries, into a JrkVariablesSnapshot."""
+    values = []
+    for field_name, _ in jrk_variables._fields_:
+        if field_name == "pin_info":
+            values.append(
+                tuple(
+                    PinInfoSnapshot._make(
+                        getattr(pin, pin_field) for pin_field, _ in pin_info._fields_
+                    )
+                    for pin in variables.pin_info
+                )
+            )
+        else:
+            values.append(getattr(variables, field_name))
+    return JrkVariablesSnapshot._make(values)
@@ -0,0 +1,20 @@
+import time
+
+# Time before a deadline spent spin-waiting instead of sleeping, which covers
+# the wake-up latency of time.sleep on common kernels
+DEFAULT_SPIN_TIME = 0.0005
+
+
+def wait_until(deadline, spin_time=DEFAULT_SPIN_TIME, event=None):
+    """Sleep until spin_time before deadline, a time.perf_counter() value, and
+    spin-wait the rest. With a threading.Event given, the wait ends as soon
+    as it is set; returns whether it is set."""
+    delay = deadline - spin_time - time.perf_counter()
+    if event is None:
+        if delay > 0:
+            time.sleep(delay)
+    elif delay > 0 and event.wait(delay):
+        return True
+    while time.perf_counter() < deadline:
+        pass
+    return event is not None and event.is_set()
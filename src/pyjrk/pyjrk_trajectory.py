@@ -0,0 +1,186 @@
+import threading
+import time
+
+import numpy as np
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_timing import DEFAULT_SPIN_TIME, wait_until
+
+
+class TrajectoryResult:
+    """Outcome of a trajectory run.
+
+    send_times holds the time each target was sent, in seconds since the
+    start of the run, with NaN for targets that were skipped or not reached.
+    lateness is send_times - times.
+    """
+
+    def __init__(self, times, send_times, missed_deadlines, aborted, error):
+        self.times = times
+        self.send_times = send_times
+        # Targets skipped because a later deadline had already passed
+        self.missed_deadlines = missed_deadlines
+        self.aborted = aborted
+        self.error = error
+
+    @property
+    def completed(self):
+        return not self.aborted and not self.error
+
+    @property
+    def sent_count(self):
+        return int(np.count_nonzero(~np.isnan(self.send_times)))
+
+    @property
+    def lateness(self):
+        return self.send_times - self.times
+
+    def jitter_stats(self):
+        """Return the mean, standard deviation, p99 and max of the lateness of
+        the targets that were sent, in seconds."""
+        lateness = self.lateness
+        lateness = lateness[~np.isnan(lateness)]
+        if lateness.size == 0:
+            return {"mean": 0.0, "std": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "mean": float(lateness.mean()),
+            "std": float(lateness.std()),
+            "p99": float(np.percentile(lateness, 99)),
+            "max": float(lateness.max()),
+        }
+
+    def __repr__(self):
+        return (
+            f"TrajectoryResult(sent={self.sent_count}/{self.times.size}, "
+            f"missed_deadlines={self.missed_deadlines}, "
+            f"aborted={self.aborted}, error={self.error})"
+        )
+
+
+class TrajectoryPlayer:
+    """Sends a precomputed target profile on absolute deadlines.
+
+    targets[i] is sent at times[i] seconds after the start of the run. Every
+    deadline is computed from the start time, so delays never accumulate.
+    The player sleeps until spin_time before a deadline and spin-waits the
+    rest. When it falls behind, targets whose successor is already due are
+    skipped and counted as missed deadlines.
+
+    On abort(), which also ends the wait for the next deadline, on a failed
+    set_target when stop_on_error is set, and when set_target raises, the
+    run ends with stop_motor.
+    """
+
+    def __init__(
+        self,
+        jrk: PyJrk,
+        targets,
+        times,
+        spin_time=DEFAULT_SPIN_TIME,
+        stop_on_error=True,
+    ):
+        targets = np.asarray(targets)
+        times = np.asarray(times, dtype=np.float64)
+        if targets.ndim != 1 or targets.shape != times.shape:
+            raise ValueError("targets and times must be 1-D arrays of equal length")
+        if np.any(np.diff(times) < 0):
+            raise ValueError("times must be non-decreasing")
+        if np.any((targets < 0) | (targets > 4095)):
+            raise ValueError("targets must be between 0 and 4095")
+
+        self._jrk = jrk
+        self._logger = jrk._logger
+        # Plain Python values, so the send loop does no NumPy conversions
+        self._targets = targets.astype(np.int64).tolist()
+        self._deadlines = times.tolist()
+        self.times = times
+        self.spin_time = spin_time
+        self.stop_on_error = stop_on_error
+
+        self._abort_event = threading.Event()
+        self._thread = None
+        self.result: TrajectoryResult = None
+
+    def abort(self):
+        """Stop the run before its next target. Safe to call from any thread;
+        an abort() before the run starts ends it before its first target."""
+        self._abort_event.set()
+
+    def play(self) -> TrajectoryResult:
+        """Run the trajectory in the calling thread and return its result."""
+        set_target = self._jrk.set_target
+        targets = self._targets
+        deadlines = self._deadlines
+        count = len(targets)
+        spin_time = self.spin_time
+        abort_event = self._abort_event
+        perf_counter = time.perf_counter
+
+        send_times = np.full(count, np.nan)
+        send_times_list = [None] * count
+        missed_deadlines = 0
+        aborted = False
+        error = False
+
+        completed = False
+        start = perf_counter()
+        try:
+            i = 0
+            while i < count:
+                # Skip targets that are already superseded by a due successor
+                now = perf_counter() - start
+                while i + 1 < count and deadlines[i + 1] <= now:
+                    missed_deadlines += 1
+                    i += 1
+
+                if wait_until(start + deadlines[i], spin_time, abort_event):
+                    aborted = True
+                    break
+
+                send_time = perf_counter() - start
+                if set_target(targets[i]):
+                    error = True
+                    if self.stop_on_error:
+                        break
+                else:
+                    send_times_list[i] = send_time
+                i += 1
+            completed = True
+        finally:
+            if not completed or aborted or (error and self.stop_on_error):
+                self._jrk.stop_motor()
+                self._logger.debug(
+                    "Trajectory aborted" if aborted else "Trajectory stopped on error"
+                )
+            # Cleared only once the run is over, so no abort() is lost
+            abort_event.clear()
+
+        for index, send_time in enumerate(send_times_list):
+            if send_time is not None:
+                send_times[index] = send_time
+
+        self.result = TrajectoryResult(
+            self.times, send_times, missed_deadlines, aborted, error
+        )
+        return self.result
+
+    def start(self):
+        """Run the trajectory on a background thread; see wait() and abort()."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self.play, name="PyJrkTrajectory", daemon=True
+        )
+        self._thread.start()
+
+    def wait(self, timeout=None) -> TrajectoryResult:
+        """Wait for a run started with start() and return its result."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.result
+
+
+def play_trajectory(jrk: PyJrk, targets, times, **kwargs) -> TrajectoryResult:
+    """Send targets[i] at times[i] seconds from now and return the result.
+    Keyword arguments are passed to TrajectoryPlayer."""
+    return TrajectoryPlayer(jrk, targets, times, **kwargs).play()
@@ -0,0 +1,42 @@
+import logging
+
+import pytest
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_emulator import JrkEmulator
+
+SERIAL_NUMBER = "00000001"
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger("PyJrk.tests")
+    logger.setLevel(logging.CRITICAL)
+    return logger
+
+
+@pytest.fixture
+def emulator():
+    emulator = JrkEmulator()
+    emulator.add_device(SERIAL_NUMBER)
+    return emulator
+
+
+@pytest.fixture
+def jrk(emulator, logger):
+    jrk = PyJrk(logger, emulator.drivers)
+    assert jrk.connect_to_serial_number(SERIAL_NUMBER) == 0
+    yield jrk
+    jrk.close()
+
+
+@pytest.fixture(scope="session")
+def native_jrklib():
+    """The jrk2 library shipped with the package, for tests that compare
+    against it. Skipped where it can not be loaded."""
+    from pyjrk.pyjrk_native import load_drivers
+
+    try:
+        return load_drivers()[1]
+    except OSError as e:
+        pytest.skip(f"jrk2 library not available: {e}")
@@ -0,0 +1,78 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "benchmarks", "bench_api.py")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline_emulator.json")
+
+
+@pytest.fixture(scope="module")
+def bench_api(tmp_path_factory):
+    # The module points the profile cache at a scratch directory on import
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(
+            "PYJRK_PROFILE_CACHE", str(tmp_path_factory.mktemp("profile-cache"))
+        )
+        spec = importlib.util.spec_from_file_location("bench_api", SCRIPT)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+def _results(**p50_us):
+    return {name: {"p50_us": value} for name, value in p50_us.items()}
+
+
+def test_compare_flags_regressions_beyond_tolerance(bench_api):
+    baseline = {"benchmarks": _results(fast=10.0, slow=100.0)}
+    results = _results(fast=12.0, slow=130.0)
+    regressions = bench_api.compare(results, baseline, 0.25, 1.0)
+    assert [regression.split(":")[0] for regression in regressions] == ["slow"]
+
+
+def test_compare_scales_the_baseline(bench_api):
+    baseline = {"calibration_us": 2.0, "benchmarks": _results(slow=100.0)}
+    report = {"calibration_us": 3.0, "benchmarks": _results(slow=130.0)}
+    scale = bench_api.calibration_scale(report, baseline)
+    assert scale == 1.5
+    assert bench_api.compare(report["benchmarks"], baseline, 0.25, 1.0) != []
+    assert bench_api.compare(report["benchmarks"], baseline, 0.25, 1.0, 0, scale) == []
+
+
+def test_compare_needs_min_delta_and_floor(bench_api):
+    baseline = {"benchmarks": _results(tiny=0.5)}
+    assert bench_api.compare(_results(tiny=1.2), baseline, 0.25, 1.0) == []
+    assert bench_api.compare(_results(tiny=1.6), baseline, 0.25, 1.0) != []
+    assert bench_api.compare(_results(tiny=1.6), baseline, 0.25, 1.0, 2.0) == []
+
+
+def test_no_regression_against_the_emulator_baseline():
+    with open(BASELINE) as f:
+        assert json.load(f)["backend"] == "emulator"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.join(ROOT, "src"), env.get("PYTHONPATH")])
+    )
+    result = subprocess.run(
+        [
+            sys.executable,
+            SCRIPT,
+            "--baseline",
+            BASELINE,
+            "--iterations",
+            "1000",
+            "--processes",
+            "5",
+        ],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=600,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "No regression" in result.stdout
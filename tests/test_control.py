@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_control import ControlLoop, PIDController
+from pyjrk.pyjrk_errors import JrkErrorFlags
+
+from conftest import SERIAL_NUMBER
+
+
+@pytest.fixture
+def jrk(emulator, logger):
+    jrk = PyJrk(logger, emulator.drivers, stats=True)
+    jrk.connect_to_serial_number(SERIAL_NUMBER)
+    jrk.reset_stats()
+    yield jrk
+    jrk.close()
+
+
+def _calls(jrk, func_name):
+    return jrk.stats().get(func_name, {"calls": 0})["calls"]
+
+
+def _stopped(jrk):
+    return bool(jrk.variables.error_flags_halting & JrkErrorFlags.AWAITING_COMMAND)
+
+
+def test_pid_proportional_and_offset():
+    pid = PIDController(kp=2, setpoint=100, output_offset=5)
+    assert pid(90, 0.001) == 25
+
+
+def test_pid_output_is_clamped_without_windup():
+    pid = PIDController(kp=1, ki=100, setpoint=1000, output_max=600)
+    for _ in range(100):
+        assert pid(0, 0.01) == 600
+    # The integral did not grow while saturated, so the output recovers at once
+    assert pid(1000, 0.01) < 600
+
+
+def test_pid_derivative_ignores_setpoint_changes():
+    pid = PIDController(kp=0, kd=1, setpoint=0)
+    pid(10, 0.01)
+    pid.setpoint = 500
+    assert pid(10, 0.01) == 0
+    assert pid(12, 0.01) == -200
+
+
+def test_loop_writes_the_controller_output(jrk, emulator):
+    feedback_values = []
+
+    def controller(feedback, dt):
+        feedback_values.append(feedback)
+        return 250
+
+    loop = ControlLoop(jrk, controller, rate_hz=1000)
+    loop.run(iterations=20)
+    assert loop.iteration_count == 20
+    assert len(feedback_values) == 20
+    assert loop.last_output == 250
+    assert _calls(jrk, "jrk_force_duty_cycle_target") == 20
+    assert _calls(jrk, "jrk_get_variable_segment") == 20
+    # The motor is stopped when the loop ends
+    assert _stopped(jrk)
+
+
+def test_none_output_skips_the_write(jrk):
+    loop = ControlLoop(jrk, lambda feedback, dt: None, rate_hz=1000)
+    loop.run(iterations=5)
+    assert _calls(jrk, "jrk_force_duty_cycle_target") == 0
+    assert loop.last_output is None
+
+
+def test_output_is_clamped_to_the_command_range(jrk):
+    loop = ControlLoop(jrk, lambda feedback, dt: 10000, output="set_target")
+    loop.run(iterations=1)
+    assert loop.last_output == 4095
+
+
+def test_failed_read_ends_the_loop(jrk, emulator):
+    emulator.unplug(SERIAL_NUMBER)
+    loop = ControlLoop(jrk, lambda feedback, dt: 0, rate_hz=1000)
+    loop.run(iterations=10)
+    assert loop.error_count == 1
+    assert loop.iteration_count == 0
+
+
+def test_failed_read_is_counted_without_stop_on_error(jrk, emulator):
+    emulator.unplug(SERIAL_NUMBER)
+    loop = ControlLoop(jrk, lambda feedback, dt: 0, stop_on_error=False)
+    loop.run(iterations=3)
+    assert loop.error_count == 3
+    assert loop.iteration_count == 3
+
+
+def test_duration_and_stats(jrk):
+    loop = ControlLoop(jrk, lambda feedback, dt: 0, rate_hz=500, history=16)
+    loop.run(duration=0.1)
+    stats = loop.stats()
+    assert 40 <= stats["iterations"] <= 51
+    assert stats["errors"] == 0
+    assert stats["period"]["mean"] == pytest.approx(0.002, rel=0.25)
+    assert 0 < stats["latency"]["min"] <= stats["latency"]["max"]
+
+
+def test_stop_right_after_start_ends_the_loop(jrk):
+    loop = ControlLoop(jrk, lambda feedback, dt: 0, rate_hz=1000)
+    stopper = threading.Thread(target=lambda: (loop.start(), loop.stop()))
+    stopper.start()
+    stopper.join(5)
+    assert not stopper.is_alive()
+    # The stop is spent, so the loop can run again
+    loop.run(iterations=3)
+    assert loop.iteration_count >= 3
+
+
+def test_stop_ends_a_background_loop(jrk):
+    with ControlLoop(jrk, lambda feedback, dt: 0, rate_hz=1000) as loop:
+        threading.Event().wait(0.05)
+    count = loop.iteration_count
+    assert count > 10
+    threading.Event().wait(0.02)
+    assert loop.iteration_count == count
+    assert _stopped(jrk)
+
+
+def test_unknown_output_is_refused(jrk):
+    with pytest.raises(ValueError):
+        ControlLoop(jrk, lambda feedback, dt: 0, output="reinitialize")
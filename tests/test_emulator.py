@@ -0,0 +1,131 @@
+import gc
+import time
+
+import pytest
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_emulator import JrkEmulator
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+
+from conftest import SERIAL_NUMBER
+
+AWAITING_COMMAND = 1 << jc["JRK_ERROR_AWAITING_COMMAND"]
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock()
+
+
+@pytest.fixture
+def emulator(clock):
+    emulator = JrkEmulator()
+    emulator.add_device(SERIAL_NUMBER, clock=clock)
+    return emulator
+
+
+def test_enumeration(emulator, logger):
+    emulator.add_device("00000002")
+    jrk = PyJrk(logger, emulator.drivers)
+    assert sorted(jrk.list_connected_device_serial_numbers()) == [
+        SERIAL_NUMBER,
+        "00000002",
+    ]
+    emulator.unplug("00000002")
+    assert jrk.list_connected_device_serial_numbers(refresh=True) == [SERIAL_NUMBER]
+    jrk.close()
+
+
+def test_power_up_state(jrk):
+    variables = jrk.variables
+    assert variables.target == 2048
+    assert variables.duty_cycle == 0
+    assert variables.error_flags_halting == AWAITING_COMMAND
+
+
+def test_open_loop_target_drives_motor(jrk, emulator, clock):
+    device = emulator.devices[SERIAL_NUMBER]
+    start_position = device.position
+    assert jrk.set_target(4095) == 0
+    clock.now += 1.0
+    variables = jrk.variables
+    assert variables.error_flags_halting == 0
+    assert variables.duty_cycle_target == 599
+    assert variables.duty_cycle == 599
+    assert device.position > start_position
+
+
+def test_stop_motor_halts(jrk, clock):
+    jrk.set_target(4095)
+    clock.now += 1.0
+    assert jrk.stop_motor() == 0
+    clock.now += 0.1
+    variables = jrk.variables
+    assert variables.duty_cycle == 0
+    assert variables.error_flags_halting == AWAITING_COMMAND
+
+
+def test_forced_duty_cycle(jrk, clock):
+    assert jrk.force_duty_cycle(-250) == 0
+    clock.now += 0.1
+    assert jrk.variables.duty_cycle == -250
+    assert jrk.variables.force_mode == jc["JRK_FORCE_MODE_DUTY_CYCLE"]
+
+
+def test_latched_error_is_cleared_by_full_read(jrk, emulator):
+    jrk.set_target(2048)
+    emulator.devices[SERIAL_NUMBER].inject_error(jc["JRK_ERROR_MOTOR_DRIVER"])
+    motor_driver = 1 << jc["JRK_ERROR_MOTOR_DRIVER"]
+    # The read that clears the latched flags still reports them
+    assert jrk.variables.error_flags_halting == motor_driver
+    assert jrk.variables.error_flags_halting == 0
+    assert jrk.variables.error_flags_occurred & motor_driver
+
+
+def test_reinitialize_reloads_ram_settings_from_eeprom(jrk):
+    jrk.ram_settings.pid_period = 20
+    assert jrk.ram_settings.pid_period == 20
+    assert jrk.eeprom_settings.pid_period == 10
+    assert jrk.reinitialize(0) == 0
+    assert jrk.ram_settings.pid_period == 10
+
+
+def test_unplugged_device_fails_calls(jrk, emulator):
+    emulator.unplug(SERIAL_NUMBER)
+    assert jrk.set_target(100) == 1
+    assert jrk.variables.snapshot() is None
+    emulator.plug(SERIAL_NUMBER)
+    assert jrk.set_target(100) == 0
+    assert jrk.variables.target == 100
+
+
+def test_latency_is_added_to_calls(logger):
+    emulator = JrkEmulator(latency={"jrk_set_target": 0.02})
+    emulator.add_device(SERIAL_NUMBER)
+    jrk = PyJrk(logger, emulator.drivers)
+    jrk.connect_to_serial_number(SERIAL_NUMBER)
+    start = time.perf_counter()
+    jrk.set_target(100)
+    assert time.perf_counter() - start >= 0.02
+    jrk.close()
+
+
+def test_close_frees_every_allocation(emulator, logger):
+    jrk = PyJrk(logger, emulator.drivers)
+    jrk.connect_to_serial_number(SERIAL_NUMBER)
+    jrk.variables.snapshot()
+    jrk.ram_settings.pid_period
+    jrk.device_index(refresh=True)
+    jrk.close()
+    del jrk
+    gc.collect()
+    assert emulator.jrklib._allocations == {}
+    assert emulator.usblib._allocations == {}
@@ -0,0 +1,98 @@
+from pyjrk.pyjrk_errors import ErrorFlagsPublisher, JrkErrorFlags, decode_error_flags
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+
+from conftest import SERIAL_NUMBER
+
+MOTOR_DRIVER = JrkErrorFlags.MOTOR_DRIVER
+
+
+def _inject(emulator, latched=True):
+    emulator.devices[SERIAL_NUMBER].inject_error(
+        jc["JRK_ERROR_MOTOR_DRIVER"], latched=latched
+    )
+
+
+def _motor_driver_events(events):
+    return [
+        (event.field_name, bool(event.set & MOTOR_DRIVER))
+        for event in events
+        if (event.set | event.cleared) & MOTOR_DRIVER
+    ]
+
+
+def test_unknown_bits_are_ignored():
+    assert decode_error_flags(int(MOTOR_DRIVER) | 1 << 15) == MOTOR_DRIVER
+
+
+def test_read_error_flags_leaves_them_latched(jrk, emulator):
+    jrk.set_target(2048)
+    _inject(emulator)
+    for _ in range(2):
+        halting, occurred = jrk.variables.read_error_flags()
+        assert halting == MOTOR_DRIVER
+        assert occurred & MOTOR_DRIVER
+    # A full read clears the latched flags
+    assert jrk.variables.error_flags_halting == MOTOR_DRIVER
+    halting, _ = jrk.variables.read_error_flags()
+    assert halting == 0
+
+
+def test_full_reads_can_leave_the_flags_latched(jrk, emulator):
+    jrk.set_target(2048)
+    jrk.variables.clear_error_flags_halting = False
+    _inject(emulator)
+    assert jrk.variables.error_flags_halting == MOTOR_DRIVER
+    assert jrk.variables.error_flags_halting == MOTOR_DRIVER
+
+
+def test_set_and_clear_events_reach_subscribers(jrk, emulator):
+    jrk.set_target(2048)
+    events = []
+    jrk.variables.subscribe_error_flags(events.append)
+    jrk.variables.read_error_flags()
+
+    _inject(emulator, latched=False)
+    jrk.variables.read_error_flags()
+    assert _motor_driver_events(events) == [
+        ("error_flags_halting", True),
+        ("error_flags_occurred", True),
+    ]
+
+    events.clear()
+    emulator.devices[SERIAL_NUMBER].clear_error(jc["JRK_ERROR_MOTOR_DRIVER"])
+    jrk.variables.read_error_flags()
+    assert _motor_driver_events(events) == [("error_flags_halting", False)]
+    assert events[0].flags == 0
+
+
+def test_full_reads_publish_events(jrk, emulator):
+    jrk.set_target(2048)
+    events = []
+    jrk.variables.subscribe_error_flags(events.append)
+    _inject(emulator)
+    jrk.variables.snapshot()
+    assert ("error_flags_halting", True) in _motor_driver_events(events)
+
+
+def test_unsubscribe_stops_events(jrk, emulator):
+    jrk.set_target(2048)
+    events = []
+    unsubscribe = jrk.variables.subscribe_error_flags(events.append)
+    unsubscribe()
+    _inject(emulator)
+    jrk.variables.read_error_flags()
+    assert events == []
+
+
+def test_publisher_reports_changes_only():
+    publisher = ErrorFlagsPublisher()
+    events = []
+    publisher.subscribe(events.append)
+    publisher.publish(0, 0, timestamp=1.0)
+    assert events == []
+    publisher.publish(int(MOTOR_DRIVER), 0, timestamp=2.0)
+    publisher.publish(int(MOTOR_DRIVER), 0, timestamp=3.0)
+    assert len(events) == 1
+    assert events[0].timestamp == 2.0
+    assert events[0].set == MOTOR_DRIVER
+    assert events[0].cleared == 0
@@ -0,0 +1,85 @@
+import pytest
+
+from pyjrk.pyjrk_emulator import JrkEmulator
+from pyjrk.pyjrk_fleet import JrkFleet
+
+SERIAL_NUMBERS = ["00000001", "00000002", "00000003"]
+
+
+@pytest.fixture
+def emulator():
+    emulator = JrkEmulator()
+    for serial_number in SERIAL_NUMBERS:
+        emulator.add_device(serial_number)
+    return emulator
+
+
+@pytest.fixture
+def fleet(emulator, logger):
+    fleet = JrkFleet(logger=logger, backend=emulator.drivers)
+    yield fleet
+    fleet.close()
+
+
+def test_every_connected_device_is_opened(fleet):
+    assert sorted(fleet.serial_numbers) == SERIAL_NUMBERS
+    assert fleet["00000002"].variables.target == 2048
+
+
+def test_missing_devices_are_skipped(emulator, logger):
+    with JrkFleet(["00000001", "12345678"], logger, backend=emulator.drivers) as fleet:
+        assert fleet.serial_numbers == ["00000001"]
+
+
+def test_commands_and_reads_are_keyed_by_serial_number(fleet):
+    targets = {"00000001": 100, "00000003": 3000}
+    assert fleet.set_target(targets) == {"00000001": 0, "00000003": 0}
+    snapshots = fleet.snapshots()
+    assert snapshots["00000001"].target == 100
+    assert snapshots["00000002"].target == 2048
+    assert snapshots["00000003"].target == 3000
+    assert fleet.read_partial(["target"], ["00000003"]) == {
+        "00000003": {"target": 3000}
+    }
+
+
+def test_apply_ram_settings_returns_each_result(fleet, emulator):
+    results = fleet.apply_ram_settings({"pid_period": 20, "integral_limit": 500})
+    assert results == {serial_number: 0 for serial_number in SERIAL_NUMBERS}
+    for serial_number in SERIAL_NUMBERS:
+        device_settings = emulator.devices[serial_number].ram_settings
+        assert device_settings.pid_period == 20
+        assert device_settings.integral_limit == 500
+
+
+def test_apply_settings_per_device(fleet, emulator):
+    results = fleet.apply_ram_settings(
+        {"00000001": {"pid_period": 20}, "00000002": {"pid_period": 30}},
+        per_device=True,
+    )
+    assert results == {"00000001": 0, "00000002": 0}
+    assert emulator.devices["00000001"].ram_settings.pid_period == 20
+    assert emulator.devices["00000002"].ram_settings.pid_period == 30
+    assert emulator.devices["00000003"].ram_settings.pid_period == 10
+
+
+def test_settings_named_like_serial_numbers_are_shared(fleet):
+    # Without per_device the keys are always setting names
+    results = fleet.apply_ram_settings({"00000001": {"pid_period": 20}})
+    assert results == {serial_number: 1 for serial_number in SERIAL_NUMBERS}
+
+
+def test_failed_apply_is_reported_per_device(fleet, emulator):
+    emulator.unplug("00000002")
+    results = fleet.apply_ram_settings({"pid_period": 20})
+    assert results == {"00000001": 0, "00000002": 1, "00000003": 0}
+
+
+def test_apply_eeprom_settings(fleet, emulator):
+    results = fleet.apply_eeprom_settings({"pid_period": 25})
+    assert results == {serial_number: 0 for serial_number in SERIAL_NUMBERS}
+    for serial_number in SERIAL_NUMBERS:
+        device = emulator.devices[serial_number]
+        assert device.get_eeprom_settings().pid_period == 25
+        # Reinitialized, so the RAM settings follow
+        assert device.ram_settings.pid_period == 25
@@ -0,0 +1,94 @@
+import time
+from functools import partial
+
+import pytest
+
+from pyjrk.pyjrk_emulator import emulated_backend
+from pyjrk.pyjrk_process import JrkProcessPool, JrkWorkerError
+
+from conftest import SERIAL_NUMBER
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = JrkProcessPool(
+        [SERIAL_NUMBER], backend_factory=partial(emulated_backend, SERIAL_NUMBER)
+    )
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def proxy(pool):
+    return pool[SERIAL_NUMBER]
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_first_sample_is_published_before_startup_returns(pool):
+    assert pool.serial_numbers == [SERIAL_NUMBER]
+    snapshots = pool.snapshots()
+    assert snapshots[SERIAL_NUMBER] is not None
+    assert snapshots[SERIAL_NUMBER].target == 2048
+
+
+def test_commands_are_forwarded(proxy):
+    assert proxy.set_target(1000) == 0
+    assert proxy.exchange(1500).target == 1500
+    _wait_for(lambda: proxy.variables.target == 1500)
+    assert proxy.variables.sample_count > 0
+
+
+def test_settings_are_forwarded(proxy):
+    proxy.ram_settings.pid_period = 20
+    assert proxy.ram_settings.pid_period == 20
+    assert proxy.ram_settings.to_dict()["pid_period"] == 20
+    proxy.ram_settings.pid_period = 10
+
+
+def test_callable_marker_strings_are_values(proxy):
+    proxy.ram_settings.note = "<callable>"
+    assert proxy.ram_settings.note == "<callable>"
+
+
+def test_worker_errors_are_raised(proxy):
+    with pytest.raises(JrkWorkerError, match="AttributeError"):
+        proxy.ram_settings.no_such_setting
+    with pytest.raises(JrkWorkerError, match="FileNotFoundError"):
+        proxy.ram_settings.load_config("/nonexistent/settings.yaml")
+    # A context manager can not be pickled back
+    with pytest.raises(JrkWorkerError, match="Could not send the result"):
+        proxy.ram_settings.batch()
+    assert proxy.set_target(2048) == 0
+
+
+def test_missing_devices_are_skipped(logger):
+    with JrkProcessPool(
+        [SERIAL_NUMBER, "12345678"],
+        logger=logger,
+        backend_factory=partial(emulated_backend, SERIAL_NUMBER),
+    ) as pool:
+        assert pool.serial_numbers == [SERIAL_NUMBER]
+
+
+def test_connected_devices_are_enumerated():
+    backend_factory = partial(emulated_backend, "00000001", "00000002")
+    with JrkProcessPool(backend_factory=backend_factory) as pool:
+        assert sorted(pool.serial_numbers) == ["00000001", "00000002"]
+        assert all(snapshot is not None for snapshot in pool.snapshots().values())
+
+
+def test_requests_fail_once_the_worker_is_gone():
+    with JrkProcessPool(
+        [SERIAL_NUMBER], backend_factory=partial(emulated_backend, SERIAL_NUMBER)
+    ) as pool:
+        proxy = pool[SERIAL_NUMBER]
+        proxy._process.terminate()
+        proxy._process.join()
+        with pytest.raises(JrkWorkerError, match="gone"):
+            proxy.set_target(100)
@@ -0,0 +1,128 @@
+import os
+from functools import partial
+
+import pytest
+
+from pyjrk import pyjrk_base, pyjrk_profile
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_profile import clear_profile_cache, compile_profile, load_profile
+from pyjrk.pyjrk_structures import jrk_settings
+
+from conftest import SERIAL_NUMBER
+
+CONFIG = """\
+jrk_settings:
+  input_mode: JRK_INPUT_MODE_SERIAL
+  pid_period: {pid_period}
+  integral_limit: 700
+"""
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_profile_cache()
+    yield
+    clear_profile_cache()
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def _write_config(path, pid_period=15):
+    path.write_text(CONFIG.format(pid_period=pid_period))
+    return str(path)
+
+
+def test_profile_overlays_only_its_settings():
+    profile = compile_profile(CONFIG.format(pid_period=15))
+    settings = jrk_settings()
+    settings.proportional_multiplier = 9
+    profile.apply_to(settings)
+    assert settings.pid_period == 15
+    assert settings.integral_limit == 700
+    assert settings.proportional_multiplier == 9
+
+
+def test_memory_cache_hit(tmp_path, cache_dir):
+    config_file = _write_config(tmp_path / "config.yml")
+    profile = load_profile(config_file, cache_dir)
+    assert load_profile(config_file, cache_dir) is profile
+
+
+def test_changed_file_is_recompiled(tmp_path, cache_dir):
+    config_file = _write_config(tmp_path / "config.yml", pid_period=15)
+    profile = load_profile(config_file, cache_dir)
+    _write_config(tmp_path / "config.yml", pid_period=250)
+    reloaded = load_profile(config_file, cache_dir)
+    assert reloaded.digest != profile.digest
+    settings = jrk_settings()
+    reloaded.apply_to(settings)
+    assert settings.pid_period == 250
+
+
+def test_disk_cache_skips_yaml(tmp_path, cache_dir, monkeypatch):
+    config_file = _write_config(tmp_path / "config.yml")
+    profile = load_profile(config_file, cache_dir)
+    clear_profile_cache()
+
+    def fail(source):
+        raise AssertionError("compiled again")
+
+    monkeypatch.setattr(pyjrk_profile, "compile_profile", fail)
+    assert load_profile(config_file, cache_dir).digest == profile.digest
+
+
+def test_corrupt_disk_cache_is_recompiled(tmp_path, cache_dir):
+    config_file = _write_config(tmp_path / "config.yml")
+    profile = load_profile(config_file, cache_dir)
+    clear_profile_cache()
+    for name in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, name), "wb") as cache_file:
+            cache_file.write(b"garbage")
+    assert load_profile(config_file, cache_dir).digest == profile.digest
+
+
+@pytest.fixture
+def jrk(emulator, logger, cache_dir, monkeypatch):
+    monkeypatch.setattr(
+        pyjrk_base, "load_profile", partial(load_profile, cache_dir=cache_dir)
+    )
+    jrk = PyJrk(logger, emulator.drivers, stats=True)
+    jrk.connect_to_serial_number(SERIAL_NUMBER)
+    jrk.reset_stats()
+    yield jrk
+    jrk.close()
+
+
+def _writes(jrk):
+    return jrk.stats().get("jrk_set_ram_settings", {"calls": 0})["calls"]
+
+
+def test_applied_profile_is_skipped(jrk, tmp_path, emulator):
+    config_file = _write_config(tmp_path / "config.yml")
+    jrk.ram_settings.load_config(config_file)
+    assert _writes(jrk) == 1
+    assert emulator.devices[SERIAL_NUMBER].ram_settings.pid_period == 15
+    jrk.ram_settings.load_config(config_file)
+    assert _writes(jrk) == 1
+
+
+def test_profile_is_applied_again_after_invalidation(jrk, tmp_path):
+    config_file = _write_config(tmp_path / "config.yml")
+    jrk.ram_settings.load_config(config_file)
+    # Reloads the RAM settings from EEPROM, undoing the profile
+    jrk.reinitialize(0)
+    jrk.ram_settings.load_config(config_file)
+    assert _writes(jrk) == 2
+    assert jrk.ram_settings.pid_period == 15
+
+
+def test_profile_is_applied_again_after_local_change(jrk, tmp_path):
+    config_file = _write_config(tmp_path / "config.yml")
+    jrk.ram_settings.load_config(config_file)
+    jrk.ram_settings.pid_period = 40
+    jrk.ram_settings.load_config(config_file)
+    assert _writes(jrk) == 3
+    assert jrk.ram_settings.pid_period == 15
@@ -0,0 +1,145 @@
+import logging
+import threading
+
+import pytest
+
+from pyjrk.pyjrk_queue import JrkCommandQueue
+
+
+class GatedJrk:
+    """Stands in for a PyJrk and records the commands it is sent. While
+    closed, the gate holds the worker inside its first command."""
+
+    def __init__(self, result=0):
+        self._logger = logging.getLogger("PyJrk.tests")
+        self.calls = []
+        self.result = result
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def _command(self, command_name, *args):
+        self.calls.append((command_name, *args))
+        self.entered.set()
+        self.gate.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    def set_target(self, target):
+        return self._command("set_target", target)
+
+    def force_duty_cycle(self, duty_cycle):
+        return self._command("force_duty_cycle", duty_cycle)
+
+    def stop_motor(self):
+        return self._command("stop_motor")
+
+    def reinitialize(self, flags):
+        return self._command("reinitialize", flags)
+
+
+@pytest.fixture
+def gated():
+    return GatedJrk()
+
+
+@pytest.fixture
+def queue(gated):
+    queue = JrkCommandQueue(gated)
+    yield queue
+    gated.gate.set()
+    queue.close()
+
+
+def _hold_worker(queue, gated):
+    """Queue set_target(1) and wait until the worker is sending it."""
+    assert queue.set_target(1) == 0
+    assert gated.entered.wait(5)
+
+
+def test_motion_commands_coalesce(queue, gated):
+    _hold_worker(queue, gated)
+    for target in (2, 3, 4):
+        queue.set_target(target)
+    queue.force_duty_cycle(-100)
+    assert queue.depth == 1
+    gated.gate.set()
+    assert queue.flush(5)
+    assert gated.calls == [("set_target", 1), ("force_duty_cycle", -100)]
+    metrics = queue.metrics()
+    assert metrics["sent"] == 2
+    assert metrics["coalesced"] == 3
+    assert metrics["depth"] == 0
+    assert metrics["errors"] == 0
+    assert 0 < metrics["mean_send_latency"] <= metrics["max_send_latency"]
+
+
+def test_safety_commands_jump_motion(queue, gated):
+    _hold_worker(queue, gated)
+    queue.set_target(2)
+    queue.reinitialize(0)
+    assert queue.depth == 2
+    gated.gate.set()
+    assert queue.flush(5)
+    assert gated.calls == [("set_target", 1), ("reinitialize", 0), ("set_target", 2)]
+
+
+def test_stop_motor_drops_pending_motion(queue, gated):
+    _hold_worker(queue, gated)
+    queue.set_target(2)
+    queue.stop_motor()
+    gated.gate.set()
+    assert queue.flush(5)
+    assert gated.calls == [("set_target", 1), ("stop_motor",)]
+    assert queue.metrics()["coalesced"] == 1
+
+
+def test_motion_queued_after_stop_motor_is_sent(queue, gated):
+    _hold_worker(queue, gated)
+    queue.stop_motor()
+    queue.set_target(3)
+    gated.gate.set()
+    assert queue.flush(5)
+    assert gated.calls == [("set_target", 1), ("stop_motor",), ("set_target", 3)]
+
+
+@pytest.mark.parametrize("result", [1, RuntimeError("transfer failed")])
+def test_failed_commands_are_counted(result):
+    gated = GatedJrk(result)
+    gated.gate.set()
+    with JrkCommandQueue(gated) as queue:
+        queue.set_target(1)
+        assert queue.flush(5)
+        queue.stop_motor()
+        assert queue.flush(5)
+        assert queue.metrics()["errors"] == 2
+        assert queue.metrics()["sent"] == 2
+
+
+def test_values_are_checked_when_queued(queue):
+    with pytest.raises(TypeError):
+        queue.set_target(1.5)
+    with pytest.raises(KeyError):
+        queue.reinitialize("JRK_NOT_A_CONSTANT")
+    assert queue.depth == 0
+
+
+def test_close_sends_pending_commands_then_refuses_new_ones(gated):
+    queue = JrkCommandQueue(gated)
+    _hold_worker(queue, gated)
+    queue.set_target(2)
+    gated.gate.set()
+    queue.close()
+    assert gated.calls == [("set_target", 1), ("set_target", 2)]
+    assert queue.set_target(3) == 1
+    assert queue.stop_motor() == 1
+    assert queue.reinitialize(0) == 1
+    assert queue.depth == 0
+    assert len(gated.calls) == 2
+
+
+def test_commands_reach_the_emulator(jrk):
+    with JrkCommandQueue(jrk) as queue:
+        assert queue.set_target(1234) == 0
+        assert queue.flush(5)
+    assert jrk.variables.target == 1234
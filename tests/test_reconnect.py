@@ -0,0 +1,96 @@
+import threading
+import time
+
+from pyjrk.pyjrk import PyJrk
+
+from conftest import SERIAL_NUMBER
+
+
+def test_reconnect_needs_a_device(logger, emulator):
+    jrk = PyJrk(logger, emulator.drivers)
+    assert jrk.reconnect() == 1
+
+
+def test_reconnect_fails_while_unplugged(jrk, emulator):
+    emulator.unplug(SERIAL_NUMBER)
+    start = time.monotonic()
+    assert jrk.reconnect(timeout=0.1, interval=0.02) == 1
+    assert time.monotonic() - start >= 0.1
+    assert jrk.set_target(100) == 1
+    assert jrk.down_since is not None
+
+
+def test_reconnect_after_replug(jrk, emulator):
+    old_handle = jrk.handle
+    emulator.unplug(SERIAL_NUMBER)
+    jrk.notify_hotplug(SERIAL_NUMBER, added=False)
+    down_since = jrk.down_since
+    assert down_since is not None
+    time.sleep(0.01)
+    emulator.plug(SERIAL_NUMBER)
+
+    assert jrk.reconnect() == 0
+    assert jrk.handle is not old_handle
+    assert jrk.down_since is None
+    assert jrk.last_downtime >= 0.01
+    assert jrk.set_target(100) == 0
+    assert jrk.variables.target == 100
+
+
+def test_reconnect_drops_the_settings_caches(jrk, emulator):
+    assert jrk.ram_settings.pid_period == 10
+    # A replugged device reloads its RAM settings from EEPROM
+    emulator.devices[SERIAL_NUMBER].ram_settings.pid_period = 33
+    assert jrk.ram_settings.pid_period == 10
+    assert jrk.reconnect() == 0
+    assert jrk.ram_settings.pid_period == 33
+
+
+def test_repeated_reconnects_release_the_old_handles(jrk, emulator):
+    jrk.reconnect()
+    allocations = len(emulator.jrklib._allocations)
+    for _ in range(5):
+        assert jrk.reconnect() == 0
+    assert len(emulator.jrklib._allocations) == allocations
+
+
+def test_add_event_retries_until_the_device_opens(jrk, emulator):
+    jrk.auto_reconnect = True
+    emulator.unplug(SERIAL_NUMBER)
+    jrk.notify_hotplug(SERIAL_NUMBER, added=False)
+    # The add event comes in before the device can be opened
+    timer = threading.Timer(0.2, emulator.plug, (SERIAL_NUMBER,))
+    timer.start()
+    jrk.notify_hotplug(SERIAL_NUMBER, added=True)
+    timer.join()
+    assert jrk.last_downtime >= 0.2
+    assert jrk.set_target(100) == 0
+
+
+def test_add_event_gives_up_after_the_timeout(jrk, emulator):
+    jrk.auto_reconnect = True
+    jrk.hotplug_reconnect_timeout = 0.1
+    emulator.unplug(SERIAL_NUMBER)
+    jrk.notify_hotplug(SERIAL_NUMBER, added=True)
+    assert jrk.set_target(100) == 1
+
+
+def test_device_index_is_cached_until_a_hotplug_event(jrk, emulator):
+    index = jrk.device_index()
+    assert jrk.device_index() is index
+    emulator.add_device("00000002")
+    assert "00000002" not in jrk.device_index()
+    jrk.notify_hotplug("00000002", added=True)
+    assert sorted(jrk.device_index()) == [SERIAL_NUMBER, "00000002"]
+    # Events of other devices never reconnect this one
+    assert jrk.down_since is None
+
+
+def test_device_index_entries_outlive_a_refresh(logger, emulator, jrk):
+    entry = jrk.device_index()[SERIAL_NUMBER]
+    jrk.device_index(refresh=True)
+    assert entry.serial_number.decode() == SERIAL_NUMBER
+    other = PyJrk(logger, emulator.drivers)
+    assert other.connect_to_device(entry) == 0
+    assert other.variables.target == 2048
+    other.close()
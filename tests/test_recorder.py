@@ -0,0 +1,106 @@
+import os
+
+from pyjrk.pyjrk_errors import JrkErrorFlags
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+from pyjrk.pyjrk_recorder import (
+    RECORDING_EXTENSION,
+    PyJrkRecorder,
+    list_recordings,
+    read_recording,
+)
+from pyjrk.pyjrk_structures import jrk_variables
+
+from conftest import SERIAL_NUMBER
+
+
+def _variables(target):
+    variables = jrk_variables()
+    variables.target = target
+    variables.feedback = 4095 - target
+    variables.pin_info[2].analog_reading = target * 2
+    return variables
+
+
+def test_round_trip(tmp_path):
+    with PyJrkRecorder(str(tmp_path)) as recorder:
+        for target in range(10):
+            recorder.record(_variables(target), timestamp=target / 10)
+        path = recorder.path
+    records = read_recording(path)
+    assert len(records) == 10
+    assert list(records["target"]) == list(range(10))
+    assert list(records["feedback"]) == [4095 - t for t in range(10)]
+    assert list(records["pin_info"]["analog_reading"][:, 2]) == [
+        2 * t for t in range(10)
+    ]
+    assert records["timestamp"][3] == 0.3
+
+
+def test_unclosed_recording_is_readable(tmp_path):
+    recorder = PyJrkRecorder(str(tmp_path))
+    recorder.record(_variables(1))
+    recorder.record(_variables(2))
+    recorder.flush()
+    # The preallocated chunk is still mapped, past the last record
+    assert list(read_recording(recorder.path)["target"]) == [1, 2]
+    recorder.close()
+
+
+def test_rotation_at_max_file_size(tmp_path):
+    probe = PyJrkRecorder(str(tmp_path / "probe"))
+    header_size = len(probe._header)
+    probe.close()
+
+    recorder = PyJrkRecorder(
+        str(tmp_path), max_file_size=header_size + 3 * probe.record_size
+    )
+    for target in range(7):
+        recorder.record(_variables(target))
+    recorder.close()
+
+    paths = list_recordings(str(tmp_path))
+    assert [os.path.getsize(path) for path in paths[:2]] == [
+        header_size + 3 * probe.record_size
+    ] * 2
+    assert [list(read_recording(path)["target"]) for path in paths] == [
+        [0, 1, 2],
+        [3, 4, 5],
+        [6],
+    ]
+    assert recorder.total_record_count == 7
+
+
+def test_numbering_continues_after_existing_recordings(tmp_path):
+    with PyJrkRecorder(str(tmp_path)) as recorder:
+        recorder.record(_variables(1))
+        first = recorder.path
+    with PyJrkRecorder(str(tmp_path)) as recorder:
+        recorder.record(_variables(2))
+    assert list(read_recording(first)["target"]) == [1]
+    assert len(list_recordings(str(tmp_path))) == 2
+
+
+def test_recordings_are_listed_by_index(tmp_path):
+    for name in ("jrk_9999", "jrk_10000", "jrk_0002", "jrk_extra_0001", "jrkx_0001"):
+        (tmp_path / (name + RECORDING_EXTENSION)).touch()
+    names = [os.path.basename(path) for path in list_recordings(str(tmp_path))]
+    assert names == [
+        "jrk_0002" + RECORDING_EXTENSION,
+        "jrk_9999" + RECORDING_EXTENSION,
+        "jrk_10000" + RECORDING_EXTENSION,
+    ]
+    with PyJrkRecorder(str(tmp_path)) as recorder:
+        assert recorder.file_index == 10001
+
+
+def test_record_variables_publishes_the_read(jrk, emulator, tmp_path):
+    events = []
+    jrk.variables.subscribe_error_flags(events.append)
+    jrk.set_target(2048)
+    emulator.devices[SERIAL_NUMBER].inject_error(jc["JRK_ERROR_MOTOR_DRIVER"])
+    with PyJrkRecorder(str(tmp_path)) as recorder:
+        assert recorder.record_variables(jrk.variables) == 0
+        path = recorder.path
+    motor_driver = 1 << jc["JRK_ERROR_MOTOR_DRIVER"]
+    assert read_recording(path)["error_flags_halting"][0] == motor_driver
+    assert any(event.set & JrkErrorFlags.MOTOR_DRIVER for event in events)
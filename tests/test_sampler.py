@@ -0,0 +1,109 @@
+import threading
+import time
+
+import numpy as np
+
+from pyjrk.pyjrk import PyJrk
+from pyjrk.pyjrk_emulator import JrkEmulator
+from pyjrk.pyjrk_errors import JrkErrorFlags
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+from pyjrk.pyjrk_sampler import PyJrkSampler
+
+from conftest import SERIAL_NUMBER
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
+
+
+def test_latest_is_empty_before_the_first_sample(jrk):
+    sampler = PyJrkSampler(jrk.variables, rate_hz=1000, capacity=4)
+    assert len(sampler.latest()) == 0
+    assert len(sampler.latest(3)) == 0
+
+
+def test_ring_wraps_around(jrk):
+    sampler = PyJrkSampler(jrk.variables, rate_hz=2000, capacity=4)
+    with sampler:
+        _wait_for(lambda: sampler.sample_count >= 11)
+    count = sampler.sample_count
+    assert count > sampler.capacity
+
+    latest = sampler.latest()
+    assert len(latest) == sampler.capacity
+    assert np.all(np.diff(latest["timestamp"]) > 0)
+    # The newest sample is in the slot of the last write and its mirror
+    slot = (count - 1) % sampler.capacity
+    assert latest["timestamp"][-1] == sampler._ring["timestamp"][slot]
+    assert np.array_equal(
+        sampler._ring[: sampler.capacity], sampler._ring[sampler.capacity :]
+    )
+
+
+def test_latest_n_is_the_tail(jrk):
+    sampler = PyJrkSampler(jrk.variables, rate_hz=2000, capacity=8)
+    with sampler:
+        _wait_for(lambda: sampler.sample_count >= 5)
+    latest = sampler.latest()
+    assert np.array_equal(sampler.latest(3), latest[-3:])
+    assert len(sampler.latest(100)) == len(latest)
+    # A view of the ring, not a copy
+    assert sampler.latest(1).base is sampler._ring
+
+
+def test_samples_hold_the_variables(jrk):
+    jrk.set_target(1234)
+    sampler = PyJrkSampler(jrk.variables, rate_hz=1000, capacity=4)
+    with sampler:
+        _wait_for(lambda: sampler.sample_count >= 1)
+    assert sampler.latest(1)["target"][0] == 1234
+
+
+def test_slow_reads_count_overruns_and_missed_deadlines(logger):
+    emulator = JrkEmulator(latency={"jrk_get_variables": 0.025})
+    emulator.add_device(SERIAL_NUMBER)
+    jrk = PyJrk(logger, emulator.drivers)
+    jrk.connect_to_serial_number(SERIAL_NUMBER)
+    sampler = PyJrkSampler(jrk.variables, rate_hz=100, capacity=4)
+    with sampler:
+        _wait_for(lambda: sampler.sample_count >= 3)
+    jrk.close()
+    assert sampler.overruns >= 2
+    assert sampler.missed_deadlines >= 2
+    assert sampler.error_count == 0
+
+
+def test_failed_reads_are_counted(jrk, emulator):
+    emulator.unplug(SERIAL_NUMBER)
+    sampler = PyJrkSampler(jrk.variables, rate_hz=1000, capacity=4)
+    with sampler:
+        _wait_for(lambda: sampler.error_count >= 2)
+    assert sampler.sample_count == 0
+
+
+def test_sampler_reads_reach_error_subscribers(jrk, emulator):
+    events = []
+    seen = threading.Event()
+
+    def on_event(event):
+        events.append(event)
+        if event.set & JrkErrorFlags.MOTOR_DRIVER:
+            seen.set()
+
+    jrk.variables.subscribe_error_flags(on_event)
+    jrk.set_target(2048)
+    sampler = PyJrkSampler(jrk.variables, rate_hz=1000, capacity=4)
+    with sampler:
+        _wait_for(lambda: sampler.sample_count >= 1)
+        emulator.devices[SERIAL_NUMBER].inject_error(jc["JRK_ERROR_MOTOR_DRIVER"])
+        assert seen.wait(5)
+    assert any(
+        event.field_name == "error_flags_halting"
+        and event.set & JrkErrorFlags.MOTOR_DRIVER
+        for event in events
+    )
+
@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+from pyjrk.pyjrk_serial import (
+    POLOLU_PROTOCOL_START,
+    JrkSerialBus,
+    JrkSerialDeviceState,
+    JrkSerialError,
+    JrkSerialResponder,
+    PyJrkSerial,
+    crc7,
+)
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "openpty"), reason="needs a pseudo-terminal"
+)
+
+
+@pytest.fixture
+def pty():
+    controller_fd, host_fd = os.openpty()
+    yield controller_fd, host_fd
+    os.close(host_fd)
+    os.close(controller_fd)
+
+
+def _serve(pty, devices, crc=False, enable_14bit_device_number=False):
+    controller_fd, host_fd = pty
+    responder = JrkSerialResponder(
+        controller_fd, devices, crc, enable_14bit_device_number
+    )
+    bus = JrkSerialBus(
+        host_fd,
+        crc=crc,
+        enable_14bit_device_number=enable_14bit_device_number,
+        timeout=0.5,
+    )
+    return responder, bus
+
+
+def test_crc7_matches_protocol_example():
+    assert crc7(bytes((0x83, 0x01))) == 0x17
+
+
+def test_packet_encoding(pty):
+    bus = JrkSerialBus(pty[1])
+    command = jc["JRK_CMD_STOP_MOTOR_SERIAL"]
+    assert bus.packet(None, command) == bytes((command,))
+    assert bus.packet(11, command) == bytes((POLOLU_PROTOCOL_START, 11, command & 0x7F))
+
+    bus.crc = True
+    assert bus.packet(None, command) == bytes((command, crc7(bytes((command,)))))
+
+    bus.crc = False
+    bus.enable_14bit_device_number = True
+    assert bus.packet(300, command) == bytes(
+        (POLOLU_PROTOCOL_START, 300 & 0x7F, 300 >> 7, command & 0x7F)
+    )
+
+
+@pytest.mark.parametrize("crc", [False, True])
+def test_compact_protocol(pty, logger, crc):
+    device = JrkSerialDeviceState()
+    responder, bus = _serve(pty, {11: device}, crc=crc)
+    with responder:
+        jrk = PyJrkSerial(bus, logger=logger)
+        assert jrk.set_target(1234) == 0
+        assert jrk.variables.target == 1234
+        assert jrk.force_duty_cycle(-300) == 0
+        assert jrk.variables.duty_cycle_target == -300
+        assert jrk.variables.force_mode == jc["JRK_FORCE_MODE_DUTY_CYCLE"]
+
+
+@pytest.mark.parametrize("crc", [False, True])
+@pytest.mark.parametrize("enable_14bit_device_number", [False, True])
+def test_pololu_protocol_addresses_one_device(
+    pty, logger, crc, enable_14bit_device_number
+):
+    device_numbers = (11, 300) if enable_14bit_device_number else (11, 12)
+    devices = {number: JrkSerialDeviceState() for number in device_numbers}
+    responder, bus = _serve(pty, devices, crc, enable_14bit_device_number)
+    with responder:
+        first, second = (
+            PyJrkSerial(bus, number, logger=logger) for number in device_numbers
+        )
+        assert first.set_target(100) == 0
+        assert second.set_target(3000) == 0
+        assert first.variables.target == 100
+        assert second.variables.target == 3000
+
+
+def test_exchange_pipelines_command_and_read(pty, logger):
+    responder, bus = _serve(pty, {11: JrkSerialDeviceState()}, crc=True)
+    with responder:
+        jrk = PyJrkSerial(bus, 11, logger=logger)
+        snapshot = jrk.exchange(2500)
+        assert snapshot.target == 2500
+        assert jrk.last_exchange_rtt is not None
+
+
+def test_error_flags_are_read_and_cleared(pty, logger):
+    responder, bus = _serve(pty, {11: JrkSerialDeviceState()})
+    with responder:
+        jrk = PyJrkSerial(bus, 11, logger=logger)
+        awaiting_command = 1 << jc["JRK_ERROR_AWAITING_COMMAND"]
+        assert jrk.get_error_flags_halting() == awaiting_command
+        assert jrk.get_error_flags_halting() == 0
+
+
+def test_crc_mismatch_raises(pty):
+    controller_fd, host_fd = pty
+    bus = JrkSerialBus(host_fd, crc=True, timeout=0.5)
+    reply = b"\x01\x02"
+    os.write(controller_fd, reply + bytes((crc7(reply) ^ 1,)))
+    with pytest.raises(JrkSerialError, match="CRC mismatch"):
+        bus.query(bus.packet(11, jc["JRK_CMD_GET_ERROR_FLAGS_HALTING_SERIAL"]), 2)
+
+
+def test_crc_mismatch_is_reported_as_failure(pty, logger):
+    controller_fd, host_fd = pty
+    jrk = PyJrkSerial(JrkSerialBus(host_fd, crc=True, timeout=0.5), 11, logger)
+    reply = b"\x01\x02"
+    os.write(controller_fd, reply + bytes((crc7(reply) ^ 1,)))
+    assert jrk.get_error_flags_halting() is None
+
+
+def test_short_reply_times_out(pty):
+    controller_fd, host_fd = pty
+    bus = JrkSerialBus(host_fd, timeout=0.05)
+    os.write(controller_fd, b"\x01")
+    with pytest.raises(JrkSerialError, match="got 1 of 2 bytes"):
+        bus.query(bus.packet(11, jc["JRK_CMD_GET_ERROR_FLAGS_HALTING_SERIAL"]), 2)
+
+
+def test_missing_device_fails_reads(pty, logger):
+    responder, bus = _serve(pty, {11: JrkSerialDeviceState()})
+    bus.timeout = 0.05
+    with responder:
+        jrk = PyJrkSerial(bus, 12, logger=logger)
+        # Commands are not acknowledged, so only the read fails
+        assert jrk.set_target(100) == 0
+        assert jrk.variables.snapshot() is None
+        assert jrk.exchange(100) is None
@@ -0,0 +1,86 @@
+import pytest
+
+from pyjrk.pyjrk import PyJrk
+
+from conftest import SERIAL_NUMBER
+
+
+@pytest.fixture
+def jrk(emulator, logger):
+    # With stats, every native call is counted
+    jrk = PyJrk(logger, emulator.drivers, stats=True)
+    jrk.connect_to_serial_number(SERIAL_NUMBER)
+    jrk.reset_stats()
+    yield jrk
+    jrk.close()
+
+
+def _writes(jrk):
+    return jrk.stats().get("jrk_set_ram_settings", {"calls": 0})["calls"]
+
+
+def test_assignments_without_batch_write_each(jrk):
+    jrk.ram_settings.pid_period = 20
+    jrk.ram_settings.integral_limit = 500
+    assert _writes(jrk) == 2
+
+
+def test_batch_commits_once(jrk, emulator):
+    with jrk.ram_settings.batch():
+        jrk.ram_settings.pid_period = 20
+        jrk.ram_settings.integral_limit = 500
+        jrk.ram_settings.proportional_multiplier = 3
+        assert _writes(jrk) == 0
+    assert _writes(jrk) == 1
+    device_settings = emulator.devices[SERIAL_NUMBER].ram_settings
+    assert device_settings.pid_period == 20
+    assert device_settings.integral_limit == 500
+    assert device_settings.proportional_multiplier == 3
+
+
+def test_batch_without_changes_is_skipped(jrk):
+    with jrk.ram_settings.batch():
+        jrk.ram_settings.pid_period = jrk.ram_settings.pid_period
+    assert _writes(jrk) == 0
+
+
+def test_nested_batches_commit_with_the_outermost(jrk):
+    settings = jrk.ram_settings
+    with settings.batch():
+        settings.pid_period = 20
+        with settings.batch():
+            settings.integral_limit = 500
+        assert _writes(jrk) == 0
+    assert _writes(jrk) == 1
+
+
+def test_failed_batch_rolls_back(jrk, emulator):
+    settings = jrk.ram_settings
+    with pytest.raises(RuntimeError):
+        with settings.batch():
+            settings.pid_period = 20
+            raise RuntimeError("abandon")
+    assert _writes(jrk) == 0
+    assert settings._local_settings.pid_period == 10
+    assert emulator.devices[SERIAL_NUMBER].ram_settings.pid_period == 10
+
+
+def test_update_writes_once_and_returns_the_result(jrk, emulator):
+    assert jrk.ram_settings.update({"pid_period": 20, "integral_limit": 500}) == 0
+    assert _writes(jrk) == 1
+    assert emulator.devices[SERIAL_NUMBER].ram_settings.integral_limit == 500
+    assert jrk.ram_settings.update({"pid_period": 20}) == 0
+    assert _writes(jrk) == 1
+
+
+def test_update_with_unknown_setting_changes_nothing(jrk):
+    assert jrk.ram_settings.update({"pid_period": 20, "pid_perid": 30}) == 1
+    assert _writes(jrk) == 0
+    assert jrk.ram_settings._local_settings.pid_period == 10
+
+
+def test_update_inside_a_batch_commits_with_it(jrk):
+    with jrk.ram_settings.batch():
+        assert jrk.ram_settings.update({"pid_period": 20}) == 0
+        assert _writes(jrk) == 0
+    assert _writes(jrk) == 1
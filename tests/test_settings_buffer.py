@@ -0,0 +1,154 @@
+from ctypes import byref, c_bool, c_char_p
+
+import pytest
+import yaml
+
+from pyjrk.pyjrk_protocol import jrk_constant as jc
+from pyjrk.pyjrk_structures import (
+    jrk_settings,
+    jrk_settings_from_buffer,
+    jrk_settings_hard_current_layout,
+    jrk_settings_option_bits,
+    jrk_settings_to_buffer,
+    jrk_settings_umc06a_layout,
+)
+
+PRODUCTS = [jc["JRK_PRODUCT_UMC04A_40V"], jc["JRK_PRODUCT_UMC06A"]]
+# Not part of the EEPROM image
+UNSTORED_FIELDS = ("product", "firmware_version")
+# Values that survive the unit conversions of the image
+SPECIAL_VALUES = {
+    "serial_baud_rate": 115385,
+    "serial_timeout": 3 * jc["JRK_SERIAL_TIMEOUT_UNITS"],
+    "brake_duration_forward": 3 * jc["JRK_BRAKE_DURATION_UNITS"],
+    "brake_duration_reverse": 4 * jc["JRK_BRAKE_DURATION_UNITS"],
+    "fbt_timing_clock": jc["JRK_FBT_OPTIONS_TIMING_CLOCK_MASK"],
+}
+
+
+def _settings(product):
+    settings = jrk_settings()
+    settings.product = product
+    # A zero baud rate generator decodes to the fastest rate, so start valid
+    settings.serial_baud_rate = 9600
+    return settings
+
+
+def _round_trip(settings):
+    decoded = jrk_settings()
+    decoded.product = settings.product
+    jrk_settings_from_buffer(jrk_settings_to_buffer(settings), decoded)
+    return decoded
+
+
+def _stored_fields(product):
+    if product == jc["JRK_PRODUCT_UMC06A"]:
+        other_product_layout = jrk_settings_hard_current_layout
+    else:
+        other_product_layout = jrk_settings_umc06a_layout
+    return [
+        (field_name, field_type)
+        for field_name, field_type in jrk_settings._fields_
+        if field_name not in UNSTORED_FIELDS and field_name not in other_product_layout
+    ]
+
+
+def _test_value(field_name, field_type):
+    if field_name in SPECIAL_VALUES:
+        return SPECIAL_VALUES[field_name]
+    if field_name in jrk_settings_option_bits or field_type is c_bool:
+        return 1
+    return 5
+
+
+@pytest.mark.parametrize("product", PRODUCTS)
+def test_zero_settings_round_trip(product):
+    settings = _settings(product)
+    assert bytes(_round_trip(settings)) == bytes(settings)
+
+
+@pytest.mark.parametrize(
+    "product, field_name, field_type",
+    [
+        (product, field_name, field_type)
+        for product in PRODUCTS
+        for field_name, field_type in _stored_fields(product)
+    ],
+)
+def test_every_field_round_trips(product, field_name, field_type):
+    settings = _settings(product)
+    setattr(settings, field_name, _test_value(field_name, field_type))
+    decoded = _round_trip(settings)
+    assert getattr(decoded, field_name) == getattr(settings, field_name)
+    # No other field is touched by this one
+    assert bytes(decoded) == bytes(settings)
+
+
+def test_field_offsets_match_protocol():
+    settings = _settings(PRODUCTS[0])
+    settings.proportional_multiplier = 0x1234
+    settings.motor_invert = True
+    settings.serial_timeout = 7 * jc["JRK_SERIAL_TIMEOUT_UNITS"]
+    buffer = jrk_settings_to_buffer(settings)
+    offset = jc["JRK_SETTING_PROPORTIONAL_MULTIPLIER"]
+    assert buffer[offset : offset + 2] == b"\x34\x12"
+    assert buffer[jc["JRK_SETTING_OPTIONS_BYTE2"]] & (
+        1 << jc["JRK_OPTIONS_BYTE2_MOTOR_INVERT"]
+    )
+    assert buffer[jc["JRK_SETTING_SERIAL_TIMEOUT"]] == 7
+
+
+def _library_settings_dict(jrklib, settings):
+    settings_str = c_char_p()
+    assert not jrklib.jrk_settings_to_string(byref(settings), byref(settings_str))
+    return yaml.safe_load(settings_str.value.decode())
+
+
+@pytest.mark.parametrize(
+    "field_name, offset_name, raw, expected",
+    [
+        ("input_maximum", "JRK_SETTING_INPUT_MAXIMUM", b"\xb0\x0e", 3760),
+        ("serial_timeout", "JRK_SETTING_SERIAL_TIMEOUT", b"\x0c\x00", 120),
+        ("brake_duration_forward", "JRK_SETTING_BRAKE_DURATION_FORWARD", b"\x06", 30),
+        ("pid_period", "JRK_SETTING_PID_PERIOD", b"\x0a\x00", 10),
+        ("serial_device_number", "JRK_SETTING_SERIAL_DEVICE_NUMBER", b"\x2a", 42),
+    ],
+)
+def test_decoded_image_matches_library(
+    native_jrklib, field_name, offset_name, raw, expected
+):
+    buffer = jrk_settings_to_buffer(_settings(PRODUCTS[0]))
+    offset = jc[offset_name]
+    buffer[offset : offset + len(raw)] = raw
+    settings = _settings(PRODUCTS[0])
+    jrk_settings_from_buffer(buffer, settings)
+    assert _library_settings_dict(native_jrklib, settings)[field_name] == expected
+
+
+def test_decoded_baud_rate_and_options_match_library(native_jrklib):
+    settings = _settings(PRODUCTS[0])
+    settings.motor_invert = True
+    settings.serial_baud_rate = 9600
+    decoded = _round_trip(settings)
+    library_settings = _library_settings_dict(native_jrklib, decoded)
+    assert library_settings["serial_baud_rate"] == 9600
+    assert library_settings["motor_invert"] is True
+    assert library_settings["feedback_invert"] is False
+
+
+def test_apply_changes_writes_only_changed_offsets(jrk):
+    settings = jrk.eeprom_settings
+    settings.proportional_multiplier = 7
+    assert settings.apply_changes() == [jc["JRK_SETTING_PROPORTIONAL_MULTIPLIER"]]
+    assert settings.apply_changes() == []
+    assert jrk.eeprom_settings.proportional_multiplier == 7
+
+
+def test_apply_changes_writes_option_bits(jrk):
+    settings = jrk.eeprom_settings
+    settings.motor_invert = True
+    settings.serial_timeout = 5 * jc["JRK_SERIAL_TIMEOUT_UNITS"]
+    assert settings.apply_changes() == sorted(
+        [jc["JRK_SETTING_OPTIONS_BYTE2"], jc["JRK_SETTING_SERIAL_TIMEOUT"]]
+    )
+    assert settings.apply_changes() == []
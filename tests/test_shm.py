@@ -0,0 +1,117 @@
+import os
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import pytest
+
+from pyjrk.pyjrk_shm import (
+    JrkSharedState,
+    JrkSharedVariables,
+    JrkStatePublisher,
+    JrkStateReader,
+    SharedSeqlock,
+    publish_error,
+    publish_variables,
+    state_segment_name,
+)
+
+from conftest import SERIAL_NUMBER
+
+
+@pytest.fixture
+def segment_name():
+    return f"pyjrk_test_{os.getpid()}_{time.monotonic_ns()}"
+
+
+@pytest.fixture
+def shared():
+    with SharedSeqlock(JrkSharedState) as shared:
+        yield shared
+
+
+def test_nothing_is_read_before_the_first_sample(shared):
+    view = JrkSharedVariables(shared)
+    assert view.sequence == 0
+    assert not view.published
+    assert view.snapshot() is None
+    assert view.target is None
+    publish_error(shared)
+    assert view.error_count == 1
+    assert view.snapshot() is None
+
+
+def test_published_variables_round_trip(jrk, shared):
+    jrk.set_target(1234)
+    variables = jrk.variables
+    variables._update_jrk_variables()
+    publish_variables(shared, variables._jrk_variables, 12.5)
+    with SharedSeqlock(JrkSharedState, shared.name, untrack=True) as attached:
+        view = JrkSharedVariables(attached)
+        assert view.sequence == 2
+        assert view.timestamp == 12.5
+        assert view.sample_count == 1
+        assert view.target == 1234
+        assert view.snapshot() == variables.snapshot()
+
+
+def test_read_into_times_out_while_the_writer_is_busy(shared):
+    state = JrkSharedState()
+    shared.write_begin()
+    start = time.monotonic()
+    assert shared.read_into(state, timeout=0.05) is None
+    assert time.monotonic() - start >= 0.05
+    assert JrkSharedVariables(shared).sample_count is None
+    shared.write_end()
+    assert shared.read_into(state) == 2
+
+
+def test_reader_follows_the_publisher(jrk):
+    with jrk.publish_state() as publisher:
+        assert publisher.name.lstrip("/") == state_segment_name(SERIAL_NUMBER)
+        with JrkStateReader(SERIAL_NUMBER) as reader:
+            assert not reader.published
+            jrk.set_target(1000)
+            jrk.variables.invalidate()
+            assert jrk.variables.target == 1000
+            assert reader.target == 1000
+            assert reader.age >= 0
+
+
+def test_background_publishing(jrk, segment_name):
+    with JrkStatePublisher(jrk.variables, segment_name, rate_hz=500):
+        with JrkStateReader(name=segment_name) as reader:
+            deadline = time.monotonic() + 5
+            while (reader.sample_count or 0) < 3:
+                assert time.monotonic() < deadline
+                time.sleep(0.005)
+            assert reader.target == 2048
+
+
+def test_second_publisher_on_a_name_is_refused(jrk, segment_name):
+    with JrkStatePublisher(jrk.variables, segment_name) as publisher:
+        with pytest.raises(FileExistsError):
+            JrkStatePublisher(jrk.variables, segment_name)
+        # Even with replace, a segment this process publishes is kept
+        with pytest.raises(FileExistsError):
+            JrkStatePublisher(jrk.variables, segment_name, replace=True)
+        assert jrk.variables._state_publisher is publisher
+        with JrkStateReader(name=segment_name) as reader:
+            jrk.variables.invalidate()
+            jrk.variables.target
+            assert reader.published
+
+
+def test_replace_takes_over_a_stale_segment(jrk, segment_name):
+    # Left behind by a publisher that never closed
+    stale = SharedMemory(segment_name, create=True, size=64)
+    stale.close()
+    with pytest.raises(FileExistsError):
+        JrkStatePublisher(jrk.variables, segment_name)
+    with JrkStatePublisher(jrk.variables, segment_name, replace=True):
+        with JrkStateReader(name=segment_name) as reader:
+            assert not reader.published
+            jrk.variables.invalidate()
+            jrk.variables.target
+            assert reader.target == 2048
+    with pytest.raises(FileNotFoundError):
+        JrkStateReader(name=segment_name)
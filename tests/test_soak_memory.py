@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "benchmarks", "soak_memory.py")
+
+
+def test_rss_stays_flat_over_emulated_reads():
+    # A separate process, so the measured RSS is only that of the soak
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.join(ROOT, "src"), env.get("PYTHONPATH")])
+    )
+    result = subprocess.run(
+        [
+            sys.executable,
+            SCRIPT,
+            "--emulated",
+            "--reads",
+            "150000",
+            "--warmup",
+            "5000",
+            "--report-every",
+            "50000",
+            "--max-growth-kib",
+            "1024",
+        ],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=600,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "OK: rss grew" in result.stdout
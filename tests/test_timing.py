@@ -0,0 +1,31 @@
+import threading
+import time
+
+from pyjrk.pyjrk_timing import wait_until
+
+
+def test_wait_until_reaches_the_deadline():
+    deadline = time.perf_counter() + 0.01
+    assert wait_until(deadline) is False
+    assert time.perf_counter() >= deadline
+
+
+def test_wait_until_past_deadline_returns_at_once():
+    start = time.perf_counter()
+    wait_until(start - 1)
+    assert time.perf_counter() - start < 0.01
+
+
+def test_event_ends_the_wait():
+    event = threading.Event()
+    threading.Timer(0.02, event.set).start()
+    start = time.perf_counter()
+    assert wait_until(start + 5, event=event) is True
+    assert time.perf_counter() - start < 1
+
+
+def test_unset_event_waits_for_the_deadline():
+    event = threading.Event()
+    deadline = time.perf_counter() + 0.01
+    assert wait_until(deadline, event=event) is False
+    assert time.perf_counter() >= deadline
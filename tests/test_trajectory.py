@@ -0,0 +1,112 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pyjrk.pyjrk_errors import JrkErrorFlags
+from pyjrk.pyjrk_trajectory import TrajectoryPlayer, play_trajectory
+
+
+def _stopped(jrk):
+    return bool(jrk.variables.error_flags_halting & JrkErrorFlags.AWAITING_COMMAND)
+
+
+def test_every_target_is_sent_on_its_deadline(jrk):
+    times = np.arange(10) * 0.005
+    targets = np.linspace(1000, 3000, 10)
+    result = play_trajectory(jrk, targets, times)
+    assert result.completed
+    assert result.sent_count == 10
+    assert result.missed_deadlines == 0
+    assert np.all(result.lateness >= 0)
+    assert jrk.variables.target == 3000
+    assert not _stopped(jrk)
+
+
+def test_due_targets_are_skipped(jrk):
+    result = play_trajectory(jrk, [100, 200, 300, 400], [0, 0, 0, 0])
+    assert result.missed_deadlines == 3
+    assert result.sent_count == 1
+    assert np.isnan(result.send_times[:3]).all()
+    assert jrk.variables.target == 400
+
+
+def test_abort_during_the_run_stops_the_motor(jrk):
+    player = TrajectoryPlayer(jrk, [1000, 2000, 3000], [0, 0.05, 10])
+    player.start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    player.abort()
+    result = player.wait(5)
+    assert time.perf_counter() - start < 1
+    assert result.aborted
+    assert result.sent_count == 2
+    assert _stopped(jrk)
+
+
+def test_abort_before_the_run_is_kept(jrk):
+    jrk.set_target(2048)
+    player = TrajectoryPlayer(jrk, [1000, 2000], [0, 0.01])
+    player.abort()
+    player.start()
+    result = player.wait(5)
+    assert result.aborted
+    assert result.sent_count == 0
+    assert _stopped(jrk)
+    # The abort is spent, so the next run goes through
+    assert player.play().completed
+
+
+def test_failed_target_stops_the_run(jrk):
+    jrk.set_target(2048)
+    player = TrajectoryPlayer(jrk, [1000, 2000], [0, 0.01])
+    jrk.set_target = lambda target: 1
+    result = player.play()
+    assert result.error and not result.completed
+    assert result.sent_count == 0
+    assert _stopped(jrk)
+
+
+def test_failed_target_continues_without_stop_on_error(jrk):
+    calls = []
+
+    def set_target(target):
+        calls.append(target)
+        return 1 if target == 2000 else 0
+
+    jrk.set_target = set_target
+    result = TrajectoryPlayer(
+        jrk, [1000, 2000, 3000], [0, 0.002, 0.004], stop_on_error=False
+    ).play()
+    assert calls == [1000, 2000, 3000]
+    assert result.error
+    assert result.sent_count == 2
+
+
+def test_raising_set_target_stops_the_motor(jrk):
+    jrk.set_target(2048)
+
+    def set_target(target):
+        raise RuntimeError("transfer failed")
+
+    jrk.set_target = set_target
+    with pytest.raises(RuntimeError):
+        TrajectoryPlayer(jrk, [1000], [0]).play()
+    assert _stopped(jrk)
+
+
+@pytest.mark.parametrize(
+    "targets, times",
+    [([1, 2], [0]), ([1, 2], [0.1, 0]), ([5000], [0]), ([[1]], [[0]])],
+)
+def test_invalid_profiles_are_refused(jrk, targets, times):
+    with pytest.raises(ValueError):
+        TrajectoryPlayer(jrk, targets, times)
+
+
+def test_jitter_stats(jrk):
+    result = play_trajectory(jrk, [1000] * 5, np.arange(5) * 0.002)
+    stats = result.jitter_stats()
+    assert 0 <= stats["mean"] <= stats["max"]
+    assert stats["p99"] <= stats["max"]